@@ -0,0 +1,4137 @@
+#################
+#   APOCRYPHA   #
+#    V.1.9.5    #
+#################
+"""
+-=#=- Administrative Distribution Internal Documentation [ADID] -=#=-
+    Apocrypha:
+        I. from ecclesiastical Latin "Apocrypha (scripta)" meaning "hidden (writings)".
+        II. the plane of Oblivion belonging to Hermaeus Mora, the Daedric Prince of Fate, Knowledge and Memory
+"""
+import os
+import re
+import sys
+import time
+import json
+import mmap
+import random
+import threading
+import hashlib as h
+from array import array
+from pathlib import Path
+from math import floor, sqrt
+from functools import lru_cache, wraps
+from string import ascii_letters
+from blake3 import blake3 as bl3
+from base64 import b64encode as b64e
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+_MESSAGE_TOKEN = re.compile(r"'([^']*)'|(-?\d+)")  # Key hash element or a single location
+APOC_MAGIC = b"APOC"
+APOC_VERSION = 1
+APOC_HASHES = {0: None, 1: "sha256", 2: "merkle"}  # Hash algorithm ids stored in the .apoc header
+APOC_SEGMENTED = 2  # .apoc format version of segmented messages, see pack_segments
+SEGMENTED_TAG = "segmented"  # First element of a segmented message as printed, see SegmentedCiphertext
+MERKLE_PREFIX = "merkle:"  # Start of a 'merkle' key hash as printed, sha256 key hashes are printed bare
+KEY_TREE_LEAF = 4096  # Characters of the whole key hashed by each leaf of a KeyTree
+KEY_TREE_PARALLEL = 1024  # Leaves below which a KeyTree isn't worth hashing over several threads
+MAP_CHUNK = 1 << 24  # Bytes of a mapped key file copied at once when it has to be scanned
+KEY_INDEX_SUFFIX = ".apocidx"  # Added to the name of a key file for its index sidecar, see write_key_index
+KEY_INDEX_MAGIC = b"APIX"
+KEY_INDEX_VERSION = 2
+MSG_KEY_MARGIN = 256  # Spare 'msg' key characters derived beyond the length of the message
+EXPANDING_HASH_ROUND = 176  # Characters of key made by each expand_round, expanding_hash returns whole rounds
+BULK_MESSAGES = 8  # Messages below which encrypt_many isn't worth starting processes for
+SEGMENT_CHARS = 1 << 16  # Message characters in each segment of a segmented message, see encrypt_segmented
+BATCH_DECODE = 16384  # Locations (or removed key characters) from which NumPy is worth importing, see decode_batch
+SAMPLER_BATCH = 4096  # 8 byte words a Sampler draws from its source at once
+_WORD_SPACE = 1 << 64  # Number of distinct 8 byte words drawn by a Sampler
+BABEL_URL = os.environ.get("APOCRYPHA_BABEL_URL", "https://libraryofbabel.info").rstrip("/")  # Env var for stand-ins
+_BABEL_LOCATION = re.compile(r"([0-9a-z]+)-w([1-4])-s([1-5])-v(\d{1,2})(?::(\d{1,3}))?")  # hex-wN-sN-vN:page
+KEY_STORE_BYTES = 1 << 30  # Total size of the key books a KeyStore keeps before deleting the least recently used
+LOCAL_BOOK_CHARS = 1312000  # 410 pages of 40 lines of 80 characters, the size of a Library of Babel book
+BABEL_ALPHABET = "abcdefghijklmnopqrstuvwxyz ,."
+_LOCAL_BOOK_TABLE = bytes(ord(BABEL_ALPHABET[b % 29]) for b in range(256))  # Only bytes < 232 kept, 232 = 8 * 29
+_PRE_BLOCK = re.compile(r"<pre[^>]*>(.*?)</pre>", re.I | re.S)  # Book text of a Library of Babel HTML page
+_NO_LETTERS = {ord(c): None for c in ascii_letters}  # str.translate table keeping only the digits of a hexdigest
+DAEMON_ADDRESS = os.environ.get("APOCRYPHA_DAEMON", str(Path.home() / ".apocrypha.sock") if os.name == "posix" else
+                                "127.0.0.1:7394")  # Unix socket path, or 'host:port' of a loopback TCP port
+DAEMON_JOBS = 4  # Requests a daemon runs at once, further requests wait for one to finish
+DAEMON_KEYS = 16  # Keys a daemon keeps loaded before the least recently loaded are dropped
+DAEMON_IDLE = 300  # Seconds a daemon keeps an idle connection open
+DAEMON_TOKEN = os.environ.get("APOCRYPHA_DAEMON_TOKEN", str(Path.home() / ".apocrypha.token"))  # Token of a TCP daemon
+METRICS_PATH = os.environ.get("APOCRYPHA_METRICS")  # Env var, file metrics are written to, .prom for Prometheus
+SAMPLER_SEED = None  # Seeds every default Sampler when set by a benchmark, never read from the environment
+_NO_SPAN = nullcontext()  # What span returns while metrics are disabled
+
+
+class Metrics:
+    """
+    Timings of the phases of a run and counters of what it did, see enable_metrics.
+
+    spans: dict of phase -> [times entered, total seconds, longest seconds], timed with time.perf_counter. Phases are
+        config_load, key_acquisition (loading a key not already loaded, includes index_load and newline_strip),
+        index_load, newline_strip, index_build, index_write, index_copy, index_symbol (indexing a symbol on first use,
+        see KeyIndex.symbol_tree), key_tree, encode, decode, and final_hash.
+    counters: dict of name -> total, such as fallback_chars (message characters not found in the key, written as a
+        negative location), special_chars ('.', '$', and '^'), key_chars (characters of the keys used),
+        index_sidecars_loaded (keys opened from their index sidecar), and ciphertext_bytes.
+    path: file write writes to, as Prometheus text if it ends in '.prom' and as JSON otherwise.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.spans = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    @contextmanager
+    def span(self, phase: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self.lock:
+                entry = self.spans.setdefault(phase, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        """
+        :return: Dict; 'spans' with count, seconds, and max_seconds per phase, 'counters', and 'key_utilization', the
+            share of the characters of the keys used which were used up by messages, one per message character
+        """
+        with self.lock:
+            spans = {phase: {'count': n, 'seconds': total, 'max_seconds': longest}
+                     for phase, (n, total, longest) in self.spans.items()}
+            counters = dict(self.counters)
+        used, total = counters.get('message_chars', 0), counters.get('key_chars', 0)
+        return {'uptime': time.time() - self.started, 'spans': spans, 'counters': counters,
+                'key_utilization': used / total if total else None}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Str; The metrics in the Prometheus text exposition format, names prefixed with 'apocrypha_'
+        """
+        metrics = self.as_dict()
+        lines = ["# HELP apocrypha_phase_seconds Time spent in each phase.", "# TYPE apocrypha_phase_seconds summary"]
+        for phase, span in sorted(metrics['spans'].items()):
+            lines.append('apocrypha_phase_seconds_sum{phase="' + phase + '"} ' + repr(span['seconds']))
+            lines.append('apocrypha_phase_seconds_count{phase="' + phase + '"} ' + str(span['count']))
+        lines += ["# HELP apocrypha_phase_max_seconds Longest time spent in each phase.",
+                  "# TYPE apocrypha_phase_max_seconds gauge"]
+        for phase, span in sorted(metrics['spans'].items()):
+            lines.append('apocrypha_phase_max_seconds{phase="' + phase + '"} ' + repr(span['max_seconds']))
+        for name, value in sorted(metrics['counters'].items()):
+            lines += ["# TYPE apocrypha_" + name + "_total counter", "apocrypha_" + name + "_total " + str(value)]
+        if metrics['key_utilization'] is not None:
+            lines += ["# TYPE apocrypha_key_utilization gauge",
+                      "apocrypha_key_utilization " + repr(metrics['key_utilization'])]
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        """
+        Writes the metrics to path, if there is one.
+        """
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'w', encoding='utf-8') as file:
+                file.write(self.to_prometheus() if self.path[-5:] == ".prom" else self.to_json())
+        except OSError:
+            pass
+
+
+_METRICS = Metrics(METRICS_PATH) if METRICS_PATH else None  # None while disabled
+
+
+def enable_metrics(path: str = None) -> Metrics:
+    """
+    Starts recording metrics, which are otherwise disabled unless the APOCRYPHA_METRICS environment variable is set.
+    :param path: Str; Optional, file the metrics are written to at the end of each run, see Metrics.write
+    :return: Metrics; The metrics being recorded
+    """
+    global _METRICS
+    _METRICS = Metrics(path)
+    return _METRICS
+
+
+def disable_metrics() -> Metrics or None:
+    """
+    :return: Metrics or None; The metrics recorded until now
+    """
+    global _METRICS
+    metrics, _METRICS = _METRICS, None
+    return metrics
+
+
+def metrics() -> Metrics or None:
+    """
+    :return: Metrics or None; The metrics being recorded, None while disabled
+    """
+    return _METRICS
+
+
+def span(phase: str):
+    """
+    :param phase: Str; Phase of a run, see Metrics.spans
+    :return: Context manager timing the phase, doing nothing while metrics are disabled
+    """
+    return _NO_SPAN if _METRICS is None else _METRICS.span(phase)
+
+
+def timed(phase: str):
+    """
+    Decorator timing every call of a function as a phase, see span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def timed_func(*args, **kwargs):
+            if _METRICS is None:
+                return func(*args, **kwargs)
+            with _METRICS.span(phase):
+                return func(*args, **kwargs)
+        return timed_func
+    return decorator
+
+
+class Config:
+    """
+    The Config class object is used to create an easy library of attributes.
+    These dictate the functions of the Apocrypha program.
+
+    multi_in: default False. Dictates whether or not multiple runs of Apoc will be run on a single file
+        containing commands for each separate result. When True, main() asks for a job file (see batch_main).
+    output: default 'print'. Dictates what form the output of Apoc will be given as. Currently,
+        supports printing the output and writing a binary .apoc file (see pack_message).
+        Future support for .txt and .json formats.
+    hash_cache: default None. Folder in which 'msg' keys derived by expanding_hash are kept, encrypted, between runs
+        so that the same passphrase doesn't have to be expanded again. None keeps them in memory for the run only.
+    key_store: default 'keys'. Folder in which key books downloaded from Library of Babel links are kept, so that the
+        same book is never downloaded twice (see KeyStore). None turns it off.
+    key_hash: default 'sha256'. Final key hash written with encrypted messages, 'sha256' of the whole remaining key or
+        'merkle', a tree hash which only rehashes the parts of the key a message used (see KeyTree). Decryption
+        always follows the key hash the message came with.
+    key_index: default True. Whether key files get an index sidecar ('<key file>.apocidx') holding the positions of
+        every symbol, so encrypting with the same key file again starts without scanning it (see write_key_index).
+    """
+    multi_in: bool = False
+    output: str = "print"  # in ['print', '.txt', '.json', '.apoc']
+    hash_cache: str = None
+    key_store: str = "keys"
+    key_hash: str = "sha256"  # in ['sha256', 'merkle']
+    key_index: bool = True
+
+    def __init__(self, multi_in: bool, output: str, hash_cache: str = None, key_store: str = "keys",
+                 key_hash: str = "sha256", key_index: bool = True):
+        self.multi_in = multi_in
+        self.output = output
+        self.hash_cache = hash_cache
+        self.key_store = key_store
+        self.key_hash = key_hash
+        self.key_index = key_index
+
+
+def config_subsys(cf: dict) -> dict:
+    """
+    The subsystem in charge of taking in and modifying a dictionary according to user
+    input. Constantly runs in the subsystem until the user enters the command to quit/exit.
+    :param cf: Dictionary; This dictionary with config options is modified and returned
+    :return: Dictionary; Modified cf dictionary post-user processing.
+    """
+    stay = True
+    default = {'multi_in': False, 'output': 'print', 'hash_cache': None, 'key_store': "keys", 'key_hash': "sha256",
+               'key_index': True}
+    print("Config Handler Subsystem. Type 'help' for commands.")
+    while stay:
+        inp = input("> ").lower()
+        if inp == "help":
+            print("The Config Handler Subsystem allows you to modify and save config settings within\n"
+                  "the program itself to then return and use upon an automatic restart of the program.\n")
+            print("Commands:\n"
+                  "help: prints out this list\n"
+                  "default: Returns all values to their defaults\n"
+                  "multi_in: Allows you to edit the 'multi_in' config option\n"
+                  "output: Allows you to edit the 'output' config option\n"
+                  "hash_cache: Allows you to edit the 'hash_cache' config option\n"
+                  "key_store: Allows you to edit the 'key_store' config option\n"
+                  "key_hash: Allows you to edit the 'key_hash' config option\n"
+                  "key_index: Allows you to edit the 'key_index' config option\n"
+                  "exit/quit: Exits the Config Handler Subsystem\n")
+        elif inp in ["exit", "quit"]:
+            stay = False
+        elif inp == "default":
+            cf = default
+            stay = False
+        elif inp == "multi_in":
+            print("multi_in is currently: "+str(cf['multi_in']))
+            print("Valid options: True, False")
+            opt = input(">>> ")
+            if opt in ["True", "False"]:
+                cf['multi_in'] = opt == "True"
+            else:
+                print("Invalid Input.")
+        elif inp == "output":
+            print("output is currently: "+cf['output'])
+            print("Valid options: print, .txt, .json, .apoc")
+            opt = input(">>> ")
+            if opt in ["print", ".txt", ".json", ".apoc"]:
+                cf['output'] = opt
+            else:
+                print("Invalid Input.")
+        elif inp == "hash_cache":
+            print("hash_cache is currently: "+str(cf.get('hash_cache')))
+            print("Valid options: None, or the path of a folder to keep derived 'msg' keys in")
+            opt = input(">>> ").strip()
+            if opt == "None":
+                cf['hash_cache'] = None
+            elif opt != "" and not Path(opt).is_file():
+                cf['hash_cache'] = opt
+            else:
+                print("Invalid Input.")
+        elif inp == "key_store":
+            print("key_store is currently: "+str(cf.get('key_store', "keys")))
+            print("Valid options: None, or the path of a folder to keep downloaded key books in")
+            opt = input(">>> ").strip()
+            if opt == "None":
+                cf['key_store'] = None
+            elif opt != "" and not Path(opt).is_file():
+                cf['key_store'] = opt
+            else:
+                print("Invalid Input.")
+        elif inp == "key_hash":
+            print("key_hash is currently: "+str(cf.get('key_hash', "sha256")))
+            print("Valid options: sha256, merkle")
+            opt = input(">>> ").strip()
+            if opt in ["sha256", "merkle"]:
+                cf['key_hash'] = opt
+            else:
+                print("Invalid Input.")
+        elif inp == "key_index":
+            print("key_index is currently: "+str(cf.get('key_index', True)))
+            print("Valid options: True, False")
+            opt = input(">>> ")
+            if opt in ["True", "False"]:
+                cf['key_index'] = opt == "True"
+            else:
+                print("Invalid Input.")
+    return cf
+
+
+@timed("config_load")
+def config_handler(fileloc: str = '', cfSUBSYS: bool = None) -> Config:
+    """
+    Looks for an existing config file to read from and set up, otherwise creates a config
+    with default values and returns the resulting configuration from the file.
+    :param fileloc: Str; Valid Path of file named "config.json"
+    :param cfSUBSYS: bool; None by default, if not None, allows the user to change config options
+    :returns: Config object
+    """
+    cd = {'multi_in': False, 'output': 'print', 'hash_cache': None, 'key_store': "keys", 'key_hash': "sha256",
+          'key_index': True}
+    cc = json.dumps(cd, sort_keys=True, indent=4)
+    if Path('config.json').exists() or (fileloc == '' and Path('config.json').exists()):
+        with open('config.json') as file:
+            cc = json.load(file)
+        try:
+            if cfSUBSYS is not None:
+                cc = config_subsys(cc)
+                with open('config.json', 'w') as file:
+                    file.write(json.dumps(cc, sort_keys=True, indent=4))
+            return Config(cc['multi_in'], cc['output'], cc.get('hash_cache'), cc.get('key_store', "keys"),
+                          cc.get('key_hash', "sha256"), cc.get('key_index', True))
+        except KeyError:
+            print("Error [I.C1]: Invalid config file, you can retry and specify a different JSON file.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    config_fileloc = input("cA_filepath: ")
+                    if cfSUBSYS is not None:
+                        return config_handler(config_fileloc, True)
+                    return config_handler(config_fileloc)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+    elif Path(fileloc).exists() and fileloc != '' and fileloc[-5:] == ".json":
+        with open(fileloc) as file:
+            cc = json.load(file)
+        try:
+            if cfSUBSYS is not None:
+                cc = config_subsys(cc)
+                with open('config.json', 'w') as file:
+                    file.write(json.dumps(cc, sort_keys=True, indent=4))
+            return Config(cc['multi_in'], cc['output'], cc.get('hash_cache'), cc.get('key_store', "keys"),
+                          cc.get('key_hash', "sha256"), cc.get('key_index', True))
+        except KeyError:
+            print("Error [I.C2]: Invalid config file, you can retry and specify a different file location.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    config_fileloc = input("cA_filepath: ")
+                    if cfSUBSYS is not None:
+                        return config_handler(config_fileloc, True)
+                    return config_handler(config_fileloc)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+    else:
+        with open('config.json', 'w') as file:
+            file.write(cc)
+        cc = json.loads(cc)
+        if cfSUBSYS is not None:
+            cc = config_subsys(cc)
+            with open('config.json', 'w') as file:
+                file.write(json.dumps(cc, sort_keys=True, indent=4))
+        return Config(bool(cc['multi_in']), cc['output'], cc.get('hash_cache'), cc.get('key_store', "keys"),
+                      cc.get('key_hash', "sha256"), cc.get('key_index', True))
+
+
+@lru_cache(maxsize=None)
+def cursed_num(ch: str) -> int:
+    """
+    The number expand_segment moves the ',' around by, which only ever depends on the middle character of a segment.
+    :param ch: Str; Middle character of the segment being expanded
+    :return: NonNegInteger; Middle 2 digits of the cursed number, before being brought into scope
+    """
+    orignum = floor(sqrt(int(h.blake2b(ch.encode('utf-8')).hexdigest().translate(
+        _NO_LETTERS))))  # Cursed pseudo-random large number generated via hashing
+    return int(str(orignum)[len(str(orignum)) // 2:len(str(orignum)) // 2 + 2])  # Take the middle 2 numbers
+
+
+def expand_segment(segment: str) -> str:
+    """
+    A single step of expanding_hash, hashing a string into the next 44 characters of key material.
+    :param segment: Str; Non-empty string, either the expanding_hash input or one segment of the previous step
+    :return: Str; 44 characters, containing upper and lowercase letters, numbers, periods, spaces, and commas.
+    """
+    # Use this as a way to move around the {= --> ,} in a regularly irregular way in the final expanded key
+    num = cursed_num(segment[len(segment) // 2])
+    knew = b64e(bl3(segment.encode('utf-8')).digest()).decode('utf-8').replace(
+        '+', '.').replace('/', ' ').replace('=', ',')
+    if num // 2 > len(knew) - 1:  # Checks if middle 2 nums from cursed num is within the scope, otherwise mods it
+        num = num // 3
+    elif num > len(knew) - 1:
+        num = num // 2
+    return knew[:num] + knew[len(knew) - 1] + knew[num:len(knew) - 1]  # Moves the ',' around by the num gen'd above
+
+
+def expand_start(invar: str) -> list:
+    """
+    First step of expanding_hash.
+    :param invar: String to be expanded into a hash used for Apocrypha method encryption as the key.
+    :return: List; The 4 segments the first round of expanding_hash starts from
+    """
+    k1 = expand_segment(invar)  # Generates the first iteration
+    return [k1[i:i + len(k1) // 4] for i in range(0, len(k1), len(k1) // 4)]  # Divides each iteration into 4 segments
+
+
+def expand_round(item: list) -> tuple:
+    """
+    One round of expanding_hash.
+    :param item: List; The 4 segments the round starts from, from expand_start or the previous round
+    :return: Tuple; (Str EXPANDING_HASH_ROUND characters of key, List the 4 segments the next round starts from)
+    """
+    k = ''
+    itemlist = item
+    for i in range(0, len(item)):
+        knew = expand_segment(item[i])
+        k += ''.join(itemlist)
+        itemlist = [knew[j:j + len(knew) // 4] for j in range(0, len(knew), len(knew) // 4)]
+    return k, itemlist
+
+
+def expanding_hash_stream(invar: str):
+    """
+    Generator form of expanding_hash, yielding the expanded key one round (176 characters) at a time, forever.
+    Every expanding_hash output is a prefix of this stream, so only as much key as is needed has to be derived.
+    :param invar: String to be expanded into a hash used for Apocrypha method encryption as the key.
+    """
+    item = expand_start(invar)
+    while True:
+        k, item = expand_round(item)
+        yield k
+
+
+def expanding_hash(invar: str, length: int = 5000) -> str:
+    """
+    Iteratively increases a given string into a hash containing characters specified below in the return docstring.
+    :param invar: String to be expanded into a hash used for Apocrypha method encryption as the key.
+    :param length: NonNegInteger; Defaults to 5000
+    :return: k; Final key, string, contains upper and lowercase letters, numbers, periods, numbers, spaces, and commas.
+    """
+    # Extends invar a ton to make a key similar to the txt file from Apocrypha
+    k = []
+    total = 0
+    if length > 0:
+        for block in expanding_hash_stream(invar):
+            k.append(block)
+            total += len(block)
+            if total >= length:
+                break
+    return ''.join(k)  # Returns the final key after a sufficient number of iterations to reach length :length:
+
+
+def msg_key_length(passphrase: str, count: int) -> int:
+    """
+    Length of expanding_hash key to derive from a 'msg' passphrase for a message of count characters.
+    Each character encrypted removes exactly one key character, MSG_KEY_MARGIN and an eighth are kept spare.
+    :param passphrase: Str; The passphrase, without the appended '.msg'
+    :param count: NonNegInteger; Number of characters in the message
+    :return: NonNegInteger; Key length to pass to expanding_hash
+    """
+    return max(1, len(passphrase), count + count // 8 + MSG_KEY_MARGIN)
+
+
+class ExpandingHashCache:
+    """
+    LRU memoization of expanding_hash. Entries are keyed by a salted blake2b fingerprint of the passphrase, never the
+    passphrase itself, and hold the key derived so far along with the segments the next round starts from, so a longer
+    key for the same passphrase only has to derive the rounds it doesn't have yet.
+
+    When given a folder, entries are also kept there between runs, sealed with ChaCha20-Poly1305 from the cryptography
+    library under a key derived from the passphrase (see aead_module), so an entry can't be read or altered without
+    the passphrase which made it. Without the cryptography library, entries are only kept in memory. Anyone who can
+    read the folder can still test guesses of a passphrase against its entry, so weak passphrases are no safer there.
+
+    max_chars: total characters of key kept in memory before the least recently used entries are dropped.
+    max_disk_bytes: total size of the entry files kept in the folder before the least recently used are deleted.
+    hits/extended/misses: counters for keys served entirely from the cache, served after deriving more rounds,
+        and derived from scratch.
+
+    One cache can be shared by several threads, keys are derived one at a time.
+    """
+    def __init__(self, directory: str = None, max_chars: int = 1 << 24, max_disk_bytes: int = 1 << 28):
+        self.directory = directory
+        self.max_chars = max_chars
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # fingerprint -> [key derived so far, segments of the next round]
+        self.chars = 0
+        self.hits = self.extended = self.misses = 0
+        self.lock = threading.Lock()
+        if directory is None:
+            self.salt = os.urandom(16)
+        else:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            saltfile = Path(directory) / "salt"
+            if not saltfile.exists():
+                saltfile.write_bytes(os.urandom(16))
+            self.salt = saltfile.read_bytes()
+
+    def _derive(self, passphrase: str, purpose: bytes) -> bytes:
+        return h.blake2b(passphrase.encode('utf-8'), key=self.salt, person=purpose).digest()
+
+    def fingerprint(self, passphrase: str) -> str:
+        """
+        :param passphrase: Str; The passphrase, without the appended '.msg'
+        :return: Str; Hex fingerprint the passphrase's entry is kept under
+        """
+        return self._derive(passphrase, b"apoc-hc-id").hex()
+
+    def get(self, passphrase: str, length: int) -> str:
+        """
+        :param passphrase: Str; The passphrase, without the appended '.msg'
+        :param length: NonNegInteger; Same as for expanding_hash
+        :return: Str; The same key expanding_hash(passphrase, length) returns
+        """
+        size = -(-length // EXPANDING_HASH_ROUND) * EXPANDING_HASH_ROUND  # expanding_hash only returns whole rounds
+        fp = self.fingerprint(passphrase)
+        with self.lock:
+            entry = self.entries.pop(fp, None)
+            if entry is None and self.directory is not None:
+                entry = self._load(passphrase, fp)
+            else:
+                self.chars -= len(entry[0]) if entry is not None else 0
+            if entry is None:
+                self.misses += 1
+                entry = ['', expand_start(passphrase)]
+            elif len(entry[0]) >= size:
+                self.hits += 1
+            else:
+                self.extended += 1
+            grew = len(entry[0]) < size
+            if grew:
+                blocks = [entry[0]]
+                total = len(entry[0])
+                while total < size:
+                    k, entry[1] = expand_round(entry[1])
+                    blocks.append(k)
+                    total += len(k)
+                entry[0] = ''.join(blocks)
+            self.entries[fp] = entry
+            self.chars += len(entry[0])
+            while self.chars > self.max_chars and len(self.entries) > 1:
+                self.chars -= len(self.entries.popitem(last=False)[1][0])
+            if grew and self.directory is not None:
+                self._save(passphrase, fp, entry)
+            return entry[0][:size]
+
+    def stats(self) -> dict:
+        """
+        :return: Dict; hits, extended, misses, number of entries and characters of key held in memory
+        """
+        return {'hits': self.hits, 'extended': self.extended, 'misses': self.misses,
+                'entries': len(self.entries), 'chars': self.chars}
+
+    def _cipher(self, passphrase: str):
+        """
+        :return: ChaCha20Poly1305 or None; AEAD keyed by the passphrase, None if cryptography isn't installed
+        """
+        aead = aead_module()
+        return None if aead is None else aead(self._derive(passphrase, b"apoc-hc-enc")[:32])
+
+    def _save(self, passphrase: str, fp: str, entry: list) -> None:
+        cipher = self._cipher(passphrase)
+        if cipher is None:
+            return
+        payload = ("\n".join(entry[1]) + "\n" + entry[0]).encode('utf-8')  # Segments never contain newlines
+        nonce = os.urandom(12)
+        entryfile = Path(self.directory) / (fp + ".ehc")
+        try:
+            tmp = entryfile.with_suffix(".tmp")
+            tmp.write_bytes(nonce + cipher.encrypt(nonce, payload, bytes.fromhex(fp)))  # Bound to its own entry file
+            os.replace(tmp, entryfile)
+        except OSError:
+            return
+        files = sorted(Path(self.directory).glob("*.ehc"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        while total > self.max_disk_bytes and len(files) > 1:
+            total -= files[0].stat().st_size
+            files.pop(0).unlink()
+
+    def _load(self, passphrase: str, fp: str) -> list or None:
+        cipher = self._cipher(passphrase)
+        if cipher is None:
+            return None
+        entryfile = Path(self.directory) / (fp + ".ehc")
+        try:
+            data = entryfile.read_bytes()
+            os.utime(entryfile)
+        except OSError:
+            return None
+        from cryptography.exceptions import InvalidTag
+        try:  # Damaged entries, or entries sealed any other way, are derived again
+            payload = cipher.decrypt(data[:12], data[12:], bytes.fromhex(fp)).decode('utf-8').split("\n", 4)
+        except (InvalidTag, ValueError):
+            return None
+        return [payload[4], payload[:4]]
+
+
+_HASH_CACHES = {}
+_AEAD = []  # ChaCha20Poly1305 once aead_module has tried to import it, None if cryptography isn't installed
+
+
+def aead_module():
+    """
+    :return: Class or None; cryptography's ChaCha20Poly1305, only imported on first use as only runs with a hash_cache
+        folder need it, None if cryptography isn't installed
+    """
+    if not _AEAD:
+        try:
+            from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+        except ImportError:
+            ChaCha20Poly1305 = None
+        _AEAD.append(ChaCha20Poly1305)
+    return _AEAD[0]
+
+
+def hash_cache(directory: str = None) -> ExpandingHashCache:
+    """
+    :param directory: Str or None; Folder of a persistent cache, see Config.hash_cache
+    :return: ExpandingHashCache; The cache shared by the whole run for that folder
+    """
+    if directory not in _HASH_CACHES:
+        _HASH_CACHES[directory] = ExpandingHashCache(directory)
+    return _HASH_CACHES[directory]
+
+
+class Fenwick:
+    """
+    Binary indexed (Fenwick) tree over a row of alive flags, every slot starting out alive.
+    Lets the key shrink one character at a time without ever rebuilding the key string itself.
+
+    Only removals are stored, as node -> number of slots removed under that node, a node of an all-alive row holding
+    the lowest set bit of its index. A tree over millions of slots is free to build, and copying it only copies what
+    has been removed, so short messages never pay for the length of the key.
+
+    count: number of slots still alive.
+    removed: dict of node -> slots removed under it, nodes with nothing removed are left out.
+    flags: alive flags of a tree made by from_flags whose removed isn't built yet, None once it is.
+    delete/rank/select: all O(log n), see each method.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.count = size
+        self.removed = {}
+        self.flags = None
+        self.top = 1 << (size.bit_length() - 1) if size else 0
+
+    def build(self) -> dict:
+        """
+        Builds removed from the flags given to from_flags, in one vectorized pass.
+        :return: Dict; removed
+        """
+        if self.flags is not None:
+            np = numpy_module()
+            sums = np.zeros(self.size + 1, np.int64)
+            np.cumsum(~self.flags, out=sums[1:])
+            slots = np.arange(self.size + 1, dtype=np.int64)
+            counts = sums - sums[slots - (slots & -slots)]  # Node i sums the removals of the lowest set bit of i slots
+            nodes = np.flatnonzero(counts)
+            self.removed = dict(zip(nodes.tolist(), counts[nodes].tolist()))
+            self.flags = None
+        return self.removed
+
+    def delete(self, slot: int) -> None:
+        """
+        Marks a slot as no longer alive.
+        :param slot: NonNegInteger; 0-based slot index, must currently be alive
+        """
+        removed = self.removed if self.flags is None else self.build()
+        i = slot + 1
+        while i <= self.size:
+            removed[i] = removed.get(i, 0) + 1
+            i += i & -i
+        self.count -= 1
+
+    def rank(self, slot: int) -> int:
+        """
+        :param slot: NonNegInteger; 0-based slot index
+        :return: NonNegInteger; Number of alive slots strictly before the given slot
+        """
+        removed = self.removed if self.flags is None else self.build()
+        gone = 0
+        i = slot
+        while i > 0:
+            gone += removed.get(i, 0)
+            i -= i & -i
+        return slot - gone
+
+    def select(self, k: int) -> int:
+        """
+        :param k: NonNegInteger; 0-based rank among the alive slots
+        :return: NonNegInteger; 0-based slot index of the k-th alive slot
+        """
+        if not 0 <= k < self.count:
+            raise IndexError("Fenwick select out of range")
+        removed = self.removed if self.flags is None else self.build()
+        if not removed:
+            return k
+        pos = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size:
+                alive = step - removed.get(nxt, 0)  # pos is a multiple of 2 * step, so node nxt spans step slots
+                if alive <= k:
+                    pos = nxt
+                    k -= alive
+            step >>= 1
+        return pos
+
+    def copy(self) -> 'Fenwick':
+        """
+        :return: Fenwick; Independent tree with the same slots alive
+        """
+        tree = Fenwick.__new__(Fenwick)
+        tree.size = self.size
+        tree.count = self.count
+        tree.removed = self.build().copy()
+        tree.flags = None
+        tree.top = self.top
+        return tree
+
+    @classmethod
+    def from_flags(cls, flags) -> 'Fenwick':
+        """
+        Makes a tree over slots of which only some are alive, rather than a delete per slot. Its nodes are only built,
+        all at once, when it's first used (see build), as a decryption done with decode_batch never uses it again.
+        :param flags: NumPy bool array; Whether each slot is alive
+        :return: Fenwick; Tree with the same slots alive as flags
+        """
+        tree = Fenwick(len(flags))
+        tree.count = int(numpy_module().count_nonzero(flags))
+        tree.flags = flags
+        return tree
+
+
+class MappedKey:
+    """
+    Read-only memory-mapped key file presenting its newline-stripped view, the only view encryption and decryption
+    ever use, without building that stripped string. Newlines ('\n' and '\r') are recorded once as raw offsets,
+    which is all that's needed to map a position of the stripped key back to the file.
+    Only ASCII key files are mapped, see open_key.
+
+    data: the mmap of the whole key file, or any other bytes-like buffer such as a block of shared memory.
+    newlines: array of the raw offsets of every newline byte, ascending.
+    shifted: array of newlines[j] - j, the stripped position each newline would have had, used with bisect.
+    index: dict of symbol -> ascending positions of that symbol, mapped from the key's index sidecar, None if the key
+        wasn't opened from one (see read_key_index).
+    complete: whether index holds every symbol of the key, a sidecar may only hold the symbols encrypted with so far.
+    path: key file this key was opened from, set only when open_key is asked to keep an index sidecar.
+    stamp: fingerprint of the key file when it was opened, see key_fingerprint.
+    """
+    def __init__(self, data: mmap.mmap, newlines=None, shifted=None, crlf: bool = None):
+        self.data = data
+        if newlines is None:
+            newlines = array('q', [m.start() for m in re.finditer(rb"[\r\n]", data)])
+            shifted = array('q', [offset - j for j, offset in enumerate(newlines)])
+        self.newlines = newlines
+        self.shifted = shifted
+        self.crlf = re.search(rb"\r", data) is not None if crlf is None else crlf
+        self.index = None
+        self.complete = False
+        self.path = None
+        self.stamp = None
+
+    def __len__(self) -> int:
+        return len(self.data) - len(self.newlines)
+
+    def raw(self, position: int) -> int:
+        """
+        :param position: NonNegInteger; position in the newline-stripped key
+        :return: NonNegInteger; Offset of that character in the key file
+        """
+        return position + bisect_right(self.shifted, position)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            start, stop, _ = position.indices(len(self))
+            return ''.join(bytes(segment).decode('ascii') for segment in self.segments(start, stop))
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("MappedKey index out of range")
+        return chr(self.data[self.raw(position)])
+
+    def segments(self, start: int, stop: int):
+        """
+        Yields the newline-stripped key between two positions as memoryviews into the mapped file, newlines excluded.
+        :param start: NonNegInteger; first position of the stripped key
+        :param stop: NonNegInteger; position of the stripped key to stop before
+        """
+        view = memoryview(self.data)
+        offset = self.raw(start)
+        count = stop - start
+        j = bisect_left(self.newlines, offset)
+        while count > 0:
+            end = self.newlines[j] if j < len(self.newlines) else len(self.data)
+            take = min(end - offset, count)
+            if take > 0:
+                yield view[offset:offset + take]
+                count -= take
+            offset = end + 1
+            j += 1
+
+    def stripped(self, start: int, stop: int) -> bytes:
+        """
+        :param start: NonNegInteger; first position of the stripped key
+        :param stop: NonNegInteger; position of the stripped key to stop before
+        :return: Bytes; The newline-stripped key between two positions, copied from the mapped file in one go
+        """
+        if stop <= start:
+            return b""
+        return bytes(self.data[self.raw(start):self.raw(stop - 1) + 1]).translate(None, b"\r\n")
+
+    def symbols(self) -> set:
+        """
+        :return: Set; Every character found in the newline-stripped key
+        """
+        found = set()
+        for i in range(0, len(self.data), MAP_CHUNK):
+            found.update(self.data[i:i + MAP_CHUNK])
+        return {chr(b) for b in found} - {"\r", "\n"}
+
+    def positions(self, ch: str) -> list:
+        """
+        :param ch: Str; single character
+        :return: List; Ascending positions of ch in the newline-stripped key
+        """
+        if len(ch) != 1 or ord(ch) > 127 or ch in "\r\n":
+            return []
+        pattern = re.compile(re.escape(ch.encode('ascii')))
+        found = []
+        base = 0
+        for i in range(0, len(self.data), MAP_CHUNK):  # Searched one newline-stripped chunk at a time
+            chunk = bytes(self.data[i:i + MAP_CHUNK]).translate(None, b"\r\n")
+            starts = [m.start() for m in pattern.finditer(chunk)]
+            found.extend([base + start for start in starts] if base else starts)
+            base += len(chunk)
+        return found
+
+    def file_hash(self) -> str:
+        """
+        :return: Str; Hex sha256 of the key file as Python reads it in text mode, universal newlines included
+        """
+        if self.crlf:
+            return h.sha256(bytes(self.data).replace(b"\r\n", b"\n").replace(b"\r", b"\n")).hexdigest()
+        return h.sha256(self.data).hexdigest()
+
+
+def open_key(fileloc: str, sidecar: bool = False) -> tuple:
+    """
+    Opens a key file, memory-mapping it when possible so the key is never held in memory twice.
+    Key files which are empty or aren't plain ASCII are read and newline-stripped as a str instead.
+    :param fileloc: Str; Valid Path of the key file
+    :param sidecar: Bool; Whether to open the key from its index sidecar, when one is found that still matches the
+        key file, without scanning the key at all. Keys opened without one are written one by save_key_index.
+    :return: Tuple; (MappedKey or newline-stripped str key, Str hex sha256 of the key file as read in text mode)
+    """
+    with open(fileloc, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files can't be mapped
+            data = None
+    if data is not None and sidecar:
+        with span("index_load"):
+            found = read_key_index(fileloc, data, stat)
+        if found is not None:
+            if _METRICS is not None:
+                _METRICS.count('index_sidecars_loaded')
+            return found
+    if data is not None and all(data[i:i + MAP_CHUNK].isascii() for i in range(0, len(data), MAP_CHUNK)):
+        with span("newline_strip"):
+            key = MappedKey(data)
+        if sidecar:
+            key.path, key.stamp = fileloc, key_fingerprint(stat)
+        return key, key.file_hash()
+    with open(fileloc) as file:
+        origstrfile = file.read()
+    with span("newline_strip"):
+        strfile = origstrfile.replace("\n", "")
+    return strfile, h.sha256(origstrfile.encode('utf-8')).hexdigest()
+
+
+_KEY_INDEX_LOCKS = {}  # Sidecar path -> Lock held while writing it, see write_key_index
+
+
+def key_index_path(fileloc: str) -> Path:
+    """
+    :param fileloc: Str; Path of a key file
+    :return: Path; Path of its index sidecar, the key file's name followed by KEY_INDEX_SUFFIX
+    """
+    return Path(str(fileloc) + KEY_INDEX_SUFFIX)
+
+
+def key_fingerprint(stat: os.stat_result) -> list:
+    """
+    :param stat: os.stat_result; Of a key file
+    :return: List; Size, modification time in nanoseconds, and inode of the key file. An index sidecar is only used
+        while all three still match, so editing or replacing the key file makes its sidecar stale. As a fingerprint
+        can be kept through an edit (restoring the modification time), the sha256 of the key is checked as well.
+    """
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def write_key_index(key: MappedKey, filehash: str, positions: dict, complete: bool = False) -> bool:
+    """
+    Writes the index sidecar of a key file, everything open_key and KeyIndex would otherwise scan the key for.
+    The sidecar is KEY_INDEX_MAGIC, its version, whether the key has '\r' newlines, whether it holds every symbol of
+    the key, 1 padding byte, then 8 byte integers: the key's fingerprint (3), length of the stripped key, number of
+    newlines N, number of symbols S, the key's sha256 (4), the N newline offsets, their N shifted positions,
+    S (symbol, start, stop) triples, and last the positions of every symbol, from start to stop of its triple.
+    :param key: MappedKey; Key opened by open_key with sidecar=True
+    :param filehash: Str; Hex sha256 of the key file, as returned by open_key
+    :param positions: Dict; Symbol -> ascending positions of it in the key, as in KeyIndex.positions
+    :param complete: Bool; Whether positions holds every symbol of the key, see KeyIndex.complete
+    :return: Bool; Whether the sidecar was written, it isn't if its folder can't be written to
+    """
+    path = key_index_path(key.path)
+    with _KEY_INDEX_LOCKS.setdefault(str(path), threading.Lock()):  # One writer of a sidecar at a time per process
+        return _write_key_index(key, filehash, positions, complete, path)
+
+
+def _write_key_index(key: MappedKey, filehash: str, positions: dict, complete: bool, path: Path) -> bool:
+    """
+    write_key_index, writing to a part file of this process and thread which then replaces the sidecar in one go, so
+    that a sidecar is never read or replaced half written.
+    """
+    table = []
+    start = 0
+    for ch, found in positions.items():
+        table += [ord(ch), start, start + len(found)]
+        start += len(found)
+    part = path.with_name("{}.{}.{}.part".format(path.name, os.getpid(), threading.get_ident()))
+    try:
+        with open(part, 'wb') as file:
+            file.write(KEY_INDEX_MAGIC + bytes([KEY_INDEX_VERSION, key.crlf, complete, 0]))
+            file.write(array('q', key.stamp + [len(key), len(key.newlines), len(positions)]).tobytes())
+            file.write(bytes.fromhex(filehash))
+            file.write(memoryview(key.newlines).tobytes() + memoryview(key.shifted).tobytes())
+            file.write(array('q', table).tobytes())
+            for found in positions.values():  # Positions mapped from the sidecar being replaced are 8 byte integers
+                file.write((found if isinstance(found, memoryview) else array('q', found)).tobytes())
+        os.replace(part, path)
+    except OSError:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def read_key_index(fileloc: str, data: mmap.mmap, stat: os.stat_result) -> tuple or None:
+    """
+    Opens a key from its index sidecar (see write_key_index), mapping the sidecar so that nothing in it is copied.
+    :param fileloc: Str; Path of the key file
+    :param data: mmap; The mapped key file
+    :param stat: os.stat_result; Of the key file, taken when it was mapped
+    :return: Tuple or None; As open_key, None if there's no sidecar or it no longer matches the key file, either its
+        fingerprint or the sha256 of its contents
+    """
+    try:
+        with open(key_index_path(fileloc), 'rb') as file:
+            index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(index) < 88 or len(index) % 8 or index[:5] != KEY_INDEX_MAGIC + bytes([KEY_INDEX_VERSION]):
+        return None
+    ints = memoryview(index)[8:].cast('q')
+    size, mtime, inode, length, newlines, symbols = ints[:6]
+    first = 10 + 2 * newlines + 3 * symbols  # Where the positions start, after the header, hash, newlines and table
+    if [size, mtime, inode] != key_fingerprint(stat) or length != len(data) - newlines or len(ints) < first:
+        return None
+    table = ints[10 + 2 * newlines:first]
+    if len(ints) != first + (table[-1] if symbols else 0):
+        return None
+    key = MappedKey(data, ints[10:10 + newlines], ints[10 + newlines:10 + 2 * newlines])
+    filehash = bytes(index[56:88]).hex()
+    if key.crlf != bool(index[5]) or key.file_hash() != filehash:  # Edited without changing the fingerprint
+        return None
+    key.index = {chr(table[i]): ints[first + table[i + 1]:first + table[i + 2]] for i in range(0, len(table), 3)}
+    key.complete = bool(index[6])
+    key.path, key.stamp = fileloc, key_fingerprint(stat)  # So that symbols indexed later are added, see save_key_index
+    return key, filehash
+
+
+def babel_location(link: str) -> str or None:
+    """
+    :param link: Str; book.cgi link, its query, or a location
+    :return: Str or None; Normalized location 'hex-wN-sN-vN:page', page 1 if not given, None if there isn't one
+    """
+    m = _BABEL_LOCATION.search(link.rsplit("?", 1)[-1].lower())
+    if m is None:
+        return None
+    hexloc, wall, shelf, volume, page = m.groups()
+    return hexloc + "-w" + wall + "-s" + shelf + "-v" + str(int(volume)) + ":" + str(int(page or 1))
+
+
+def local_book(location: str, length: int = LOCAL_BOOK_CHARS) -> str:
+    """
+    Deterministically expands a location into a book-sized key over the Library of Babel alphabet, entirely offline.
+    The location is normalized first (see babel_location) and fed to shake_256, whose output bytes are mapped onto
+    BABEL_ALPHABET. Bytes of 232 and over are dropped so every character is equally likely.
+    :param location: Str; Location such as '<hex>-w1-s1-v1:1', as printed by the 'local' gen type
+    :param length: NonNegInteger; Characters of key to make, a whole book by default
+    :return: Str; Newline-free key, always the same for the same location and length
+    """
+    xof = h.shake_256(b"apoc-local-book\x00" + (babel_location(location) or location.strip()).encode('utf-8'))
+    size = length + length // 8 + 1024  # 232 of every 256 bytes are kept, so this is nearly always enough
+    book = xof.digest(size).translate(_LOCAL_BOOK_TABLE, bytes(range(232, 256)))
+    while len(book) < length:  # Longer digests of an XOF start with the shorter ones, so the key doesn't change
+        size *= 2
+        book = xof.digest(size).translate(_LOCAL_BOOK_TABLE, bytes(range(232, 256)))
+    return book[:length].decode('ascii')
+
+
+def random_location(digits: int = 64) -> str:
+    """
+    :param digits: PosInteger; Hex digits of the room, as in the python{INT} and local{INT} gen types
+    :return: Str; Random location '<hex>-wN-sN-vN:page' of a book, as made by Aencode1
+    """
+    import secrets as s
+    return s.token_hex(max(1, digits // 2)) + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + \
+        "-v" + str(random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+
+
+class KeyFetcher:
+    """
+    Fetches key books from the Library of Babel over one pooled requests.Session, so every request after the first
+    reuses the same kept-alive connection. Failed connections and 429/5xx responses are retried with backoff.
+
+    base_url: site to fetch from, BABEL_URL by default, which can be pointed at a local stand-in server.
+    timeout: (connect, read) timeout in seconds of every request.
+    validators: dict of link -> conditional request headers (ETag, Last-Modified) of its last successful check.
+    """
+    def __init__(self, base_url: str = BABEL_URL, timeout: tuple = (5, 30), retries: int = 3):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.validators = {}
+        import requests
+        from urllib3.util.retry import Retry
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        # allowed_methods=None retries every method, the POSTs to download.cgi are idempotent
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=None)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def check(self, link: str) -> bool:
+        """
+        Checks a link with a HEAD request, made conditional on the last check of the same link. Servers which don't
+        answer HEAD get a streamed GET instead, closed without reading its body.
+        :param link: Str; Link to check
+        :return: Bool; Whether the link answered 200, or 304 Not Modified since its last check
+        """
+        headers = self.validators.get(link, {})
+        response = self.session.head(link, headers=headers, timeout=self.timeout, allow_redirects=True)
+        if response.status_code in [405, 501]:
+            with self.session.get(link, headers=headers, timeout=self.timeout, stream=True) as response:
+                pass
+        if response.status_code == 200:
+            self.validators[link] = {}
+            if 'ETag' in response.headers:
+                self.validators[link]['If-None-Match'] = response.headers['ETag']
+            if 'Last-Modified' in response.headers:
+                self.validators[link]['If-Modified-Since'] = response.headers['Last-Modified']
+        return response.status_code in [200, 304]
+
+    def random_link(self) -> str:
+        """
+        :return: Str; book.cgi link of a random book, where the redirect of random.cgi leads to
+        """
+        response = self.session.head(self.base_url + "/random.cgi", timeout=self.timeout, allow_redirects=True)
+        response.raise_for_status()
+        return response.url
+
+    def download(self, link: str, directory: str = ".") -> str:
+        """
+        Downloads the whole book of a link straight into a key file, with a single POST to download.cgi.
+        The key file is written in full before being moved into place, so a failed download never leaves half a key.
+        :param link: Str; book.cgi link, its query, or a location such as '<hex>-w1-s1-v1:1'
+        :param directory: Str; Folder to write the key file in
+        :return: Str; Path of the key file, 'babel_<first 16 hex digits of the sha256 of the book location>.txt'
+        """
+        location = babel_location(link)
+        if location is None:
+            raise ValueError("Not a Library of Babel location: " + link)
+        book, page = location.split(":")
+        hexloc, wall, shelf, volume = book.split("-")
+        path = Path(directory) / ("babel_" + h.sha256(book.encode('utf-8')).hexdigest()[:16] + ".txt")
+        part = path.with_suffix(".part")
+        data = {'hex': hexloc, 'wall': wall[1:], 'shelf': shelf[1:], 'volume': volume[1:].zfill(2), 'page': page,
+                'title': "startofthetext"}
+        with self.session.post(self.base_url + "/download.cgi", data=data, timeout=self.timeout,
+                               stream=True) as response:
+            response.raise_for_status()
+            if "html" in response.headers.get('Content-Type', ""):
+                blocks = _PRE_BLOCK.findall(response.text)
+                if not blocks:
+                    raise ValueError("No book text found at: " + link)
+                import html
+                with open(part, 'w', encoding='utf-8') as file:
+                    file.write("\n".join(html.unescape(block).strip("\n") for block in blocks))
+            else:
+                with open(part, 'wb') as file:
+                    for chunk in response.iter_content(1 << 16):
+                        file.write(chunk)
+        os.replace(part, path)
+        return str(path)
+
+
+_KEY_FETCHERS = {}
+
+
+def key_fetcher(base_url: str = BABEL_URL) -> KeyFetcher:
+    """
+    :param base_url: Str; Site to fetch from, BABEL_URL by default
+    :return: KeyFetcher; The one KeyFetcher of that site, shared by the whole run
+    """
+    if base_url not in _KEY_FETCHERS:
+        _KEY_FETCHERS[base_url] = KeyFetcher(base_url)
+    return _KEY_FETCHERS[base_url]
+
+
+def download_key(link: str, code: str, config: Config = None) -> str or None:
+    """
+    Downloads the key book of a link with key_fetcher, printing the given error code if it can't.
+    Books already in the key store of the config are never downloaded again, see stored_key.
+    :param link: Str; book.cgi link
+    :param code: Str; Error code to print if the download fails, such as "II.H1"
+    :param config: Config obj; Optional, the key_store config option is used when given
+    :return: Str or None; Path of the key file, None if it has to be downloaded manually instead
+    """
+    fileloc = stored_key(config, link)
+    if fileloc is not None:
+        return fileloc
+    import sqlite3
+    import requests
+    try:
+        fileloc = fetch_key(link, config)
+    except (requests.RequestException, ValueError, OSError, sqlite3.Error):
+        print("Error [" + code + "]: Couldn't download the key file, it will have to be downloaded manually.")
+        return None
+    print("Key file downloaded to: " + fileloc)
+    return fileloc
+
+
+def fetch_key(link: str, config: Config = None) -> str:
+    """
+    Finds the key book of a link in the key store of the config, or downloads it with key_fetcher, without printing.
+    :param link: Str; book.cgi link
+    :param config: Config obj; Optional, the key_store config option is used when given
+    :return: Str; Path of the key file, raises requests.RequestException, ValueError, OSError, or sqlite3.Error
+    """
+    store = key_store(config.key_store) if config is not None and config.key_store is not None else None
+    location = babel_location(link)
+    fileloc = store.get(location) if store is not None and location is not None else None
+    if fileloc is not None:
+        return fileloc
+    fileloc = key_fetcher().download(link, "." if store is None else store.directory)
+    if store is not None and location is not None:
+        fileloc = store.put(location, fileloc)
+    return fileloc
+
+
+class KeyStore:
+    """
+    Local store of the key books downloaded from Library of Babel links, so a book is only ever downloaded once.
+    Books are kept newline-stripped in files named by the sha256 of their text, so a book reached through several
+    locations (other pages of the same book) is kept once. A SQLite table maps each normalized location (see
+    babel_location) to its book file, sha256 and blake3 fingerprints, size, modification time, and when it was last
+    used. A lookup only checks the size and modification time of the book file, its blake3 is checked when the file
+    has changed since it was stored, or when asked to verify.
+
+    directory: folder holding the book files and 'index.sqlite3'.
+    max_bytes: total size of the book files kept before the least recently used are deleted.
+
+    One store can be shared by several threads, the table is used by one at a time.
+    """
+    def __init__(self, directory: str, max_bytes: int = KEY_STORE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        import sqlite3
+        self.db = sqlite3.connect(str(Path(directory) / "index.sqlite3"), check_same_thread=False)
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS books (location TEXT PRIMARY KEY, sha256 TEXT NOT NULL, "
+                            "blake3 TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL, "
+                            "mtime_ns INTEGER NOT NULL DEFAULT 0)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS books_last_used ON books (last_used)")
+            if "mtime_ns" not in [column[1] for column in self.db.execute("PRAGMA table_info(books)")]:
+                self.db.execute("ALTER TABLE books ADD COLUMN mtime_ns INTEGER NOT NULL DEFAULT 0")
+
+    def path(self, sha256: str) -> Path:
+        """
+        :param sha256: Str; Hex sha256 of a newline-stripped book
+        :return: Path; The file that book is kept in
+        """
+        return Path(self.directory) / (sha256 + ".txt")
+
+    def get(self, location: str, verify: bool = False) -> str or None:
+        """
+        :param location: Str; Normalized location, see babel_location
+        :param verify: Bool; Whether to check the blake3 of the book file even if it hasn't changed since it was stored
+        :return: Str or None; Path of the stored book, None if it isn't stored or its file no longer matches
+        """
+        with self.lock:
+            row = self.db.execute("SELECT sha256, blake3, size, mtime_ns FROM books WHERE location = ?",
+                                  (location,)).fetchone()
+            if row is None:
+                return None
+            bookfile = self.path(row[0])
+            try:
+                stat = bookfile.stat()
+                unchanged = stat.st_size == row[2] and stat.st_mtime_ns == row[3]
+                intact = unchanged and not verify or \
+                    stat.st_size == row[2] and bl3(bookfile.read_bytes()).hexdigest() == row[1]
+            except OSError:
+                intact = False
+            with self.db:
+                if not intact:
+                    self.db.execute("DELETE FROM books WHERE location = ?", (location,))
+                    return None
+                self.db.execute("UPDATE books SET last_used = ?, mtime_ns = ? WHERE location = ?",
+                                (time.time(), stat.st_mtime_ns, location))
+            return str(bookfile)
+
+    def put(self, location: str, fileloc: str) -> str:
+        """
+        Moves a downloaded book into the store, then deletes the least recently used books past max_bytes.
+        :param location: Str; Normalized location, see babel_location
+        :param fileloc: Str; Path of the downloaded book, removed once stored
+        :return: Str; Path of the stored book
+        """
+        with open(fileloc, encoding='utf-8') as file:
+            data = file.read().replace("\n", "").encode('utf-8')
+        sha256 = h.sha256(data).hexdigest()
+        bookfile = self.path(sha256)
+        if not bookfile.exists():
+            part = bookfile.with_suffix(".part")
+            part.write_bytes(data)
+            os.replace(part, bookfile)
+        if Path(fileloc).resolve() != bookfile.resolve():
+            os.remove(fileloc)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?)",
+                            (location, sha256, bl3(data).hexdigest(), len(data), time.time(),
+                             bookfile.stat().st_mtime_ns))
+            self.evict()
+        return str(bookfile)
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used books until the files kept total no more than max_bytes, the most recently
+        used book is always kept.
+        """
+        books = self.db.execute("SELECT sha256, size, MAX(last_used) AS used FROM books GROUP BY sha256 "
+                                "ORDER BY used").fetchall()
+        total = sum(size for _, size, _ in books)
+        for sha256, size, _ in books[:-1]:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM books WHERE sha256 = ?", (sha256,))
+            for path in [self.path(sha256), key_index_path(self.path(sha256))]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def stats(self) -> dict:
+        """
+        :return: Dict; Number of locations and of book files, and the total size of the book files
+        """
+        with self.lock:
+            locations, books, size = self.db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256), (SELECT COALESCE(SUM(size), 0) FROM "
+                "(SELECT DISTINCT sha256, size FROM books)) FROM books").fetchone()
+        return {'locations': locations, 'books': books, 'bytes': size}
+
+
+_KEY_STORES = {}
+
+
+def key_store(directory: str) -> KeyStore:
+    """
+    :param directory: Str; Folder of the store, see Config.key_store
+    :return: KeyStore; The store shared by the whole run for that folder
+    """
+    if directory not in _KEY_STORES:
+        _KEY_STORES[directory] = KeyStore(directory)
+    return _KEY_STORES[directory]
+
+
+def stored_key(config: Config or None, link: str) -> str or None:
+    """
+    :param config: Config obj or None; The key_store config option is used when given
+    :param link: Str; book.cgi link
+    :return: Str or None; Path of the stored key book of the link, None if it isn't stored
+    """
+    if config is None or config.key_store is None or babel_location(link) is None:
+        return None
+    import sqlite3
+    try:
+        fileloc = key_store(config.key_store).get(babel_location(link))
+    except (sqlite3.Error, OSError):
+        return None
+    if fileloc is not None:
+        print("Key file found in the key store: " + fileloc)
+    return fileloc
+
+
+class KeyIndex:
+    """
+    Order-statistic index over a newline-stripped key, either a str or a MappedKey. The key itself is never copied or
+    sliced while encrypting, instead each deleted character is recorded in Fenwick trees so that positions in the
+    shrinking key (the positions written into the encrypted message) can be found in O(log n).
+
+    key: the newline-stripped key, str or MappedKey, left untouched.
+    alive: Fenwick tree over every key offset.
+    positions: dict of symbol -> sorted list of the key offsets holding that symbol, shared by fresh copies.
+    trees: dict of symbol -> Fenwick tree over that symbol's positions with nothing removed, shared by fresh copies.
+    symbols: dict of symbol -> Fenwick tree over that symbol's positions, with this index's removals.
+    deleted: key offsets removed so far, in the order they were removed.
+    complete: whether positions holds every symbol of the key, a symbol it doesn't hold isn't in the key.
+    lock: held while adding to positions and trees, shared by fresh copies, which daemon threads extend at once.
+
+    A message only ever uses a few dozen symbols of a key which may be millions of characters long, so symbols are
+    indexed on first use, one pass over the key for each (see symbol_tree), and kept for later messages. Keys opened
+    from an index sidecar (see read_key_index) come with the positions of every symbol encrypted with before.
+
+    Decryption only ever looks characters up by position, so it builds the index with indexed=False, which skips the
+    per-symbol trees and keeps nothing but the key and a single Fenwick tree.
+    """
+    def __init__(self, key: str, indexed: bool = True):
+        self.key = key
+        self.alive = Fenwick(len(key))
+        self.indexed = indexed
+        self.complete = indexed and not isinstance(key, str) and key.complete
+        mapped = indexed and not isinstance(key, str) and key.index is not None
+        self.positions = dict(key.index) if mapped else {}  # Mapped from the sidecar, see read_key_index
+        self.lock = threading.Lock()
+        self.trees = {}
+        self.symbols = {}
+        self.deleted = []
+
+    def __len__(self) -> int:
+        return self.alive.count
+
+    def fresh(self, indexed: bool = True) -> 'KeyIndex':
+        """
+        Copies this index without its removals, sharing the positions lists and trees indexed so far, which are most
+        of the work of indexing a large key. Used to reuse one loaded key across several messages.
+        :param indexed: Bool; False drops the per-symbol trees, as decryption doesn't need them
+        :return: KeyIndex; Index over the same key with nothing removed yet, this index must have nothing removed either
+        """
+        index = KeyIndex.__new__(KeyIndex)
+        index.key = self.key
+        index.alive = self.alive.copy()
+        index.indexed = indexed
+        index.complete = self.complete and indexed
+        index.positions = self.positions if indexed else {}
+        index.lock = self.lock
+        index.trees = self.trees if indexed else {}
+        index.symbols = {}
+        index.deleted = []
+        return index
+
+    def scan(self, ch: str) -> list:
+        """
+        :param ch: Str; single character
+        :return: List; Ascending offsets of ch in the key, found in one pass over the key
+        """
+        if isinstance(self.key, str):
+            return [m.start() for m in re.finditer(re.escape(ch), self.key)]
+        return self.key.positions(ch)
+
+    def symbol_tree(self, ch: str) -> Fenwick or None:
+        """
+        Indexes a symbol the first time it's used, scanning the key for it unless a copy of this index already has,
+        and replaying the removals of this index which took that symbol.
+        :param ch: Str; single character
+        :return: Fenwick or None; Tree over the positions of ch, None if ch isn't in the key or indexed is False
+        """
+        tree = self.symbols.get(ch)
+        if tree is not None or not self.indexed:
+            return tree
+        if ch not in self.trees:
+            if ch not in self.positions:
+                if self.complete:
+                    return None
+                with span("index_symbol"):
+                    found = self.scan(ch)
+                with self.lock:
+                    self.positions.setdefault(ch, found)
+            with self.lock:
+                self.trees.setdefault(ch, Fenwick(len(self.positions[ch])))
+        tree = self.symbols[ch] = self.trees[ch].copy()
+        for offset in self.deleted:
+            if self.key[offset] == ch:
+                tree.delete(bisect_left(self.positions[ch], offset))
+        return tree
+
+    def index_all(self) -> dict:
+        """
+        Indexes every symbol of the key not indexed yet, for what needs all of them at once (share_key).
+        :return: Dict; positions, now holding every symbol of the key
+        """
+        if self.indexed and not self.complete:
+            for ch in (set(self.key) if isinstance(self.key, str) else self.key.symbols()):
+                if ch not in self.positions:
+                    found = self.scan(ch)
+                    with self.lock:
+                        self.positions.setdefault(ch, found)
+            self.complete = True
+        return self.positions
+
+    def __contains__(self, ch: str) -> bool:
+        tree = self.symbol_tree(ch)
+        return tree is not None and tree.count > 0
+
+    def occurrences(self, ch: str) -> int:
+        """
+        :param ch: Str; single character
+        :return: NonNegInteger; Number of occurrences of ch left in the shrinking key
+        """
+        tree = self.symbol_tree(ch)
+        return 0 if tree is None else tree.count
+
+    def _remove(self, offset: int) -> None:
+        ch = self.key[offset]
+        self.alive.delete(offset)
+        if ch in self.symbols:  # Symbols not indexed yet replay this removal once they are, see symbol_tree
+            self.symbols[ch].delete(bisect_left(self.positions[ch], offset))
+        self.deleted.append(offset)
+
+    def take_char(self, ch: str, k: int) -> int:
+        """
+        Removes the k-th remaining occurrence of ch from the shrinking key.
+        :param ch: Str; single character present in the key
+        :param k: NonNegInteger; which remaining occurrence to use, less than occurrences(ch)
+        :return: NonNegInteger; Position the occurrence had in the shrinking key before removal
+        """
+        offset = self.positions[ch][self.symbol_tree(ch).select(k)]
+        position = self.alive.rank(offset)
+        self._remove(offset)
+        return position
+
+    def char_at(self, position: int) -> str:
+        """
+        :param position: NonNegInteger; position in the shrinking key
+        :return: Str; The character currently found at that position, left in place
+        """
+        return self.key[self.alive.select(position)]
+
+    def delete_at(self, position: int) -> None:
+        """
+        Removes the character found at a position of the shrinking key.
+        :param position: NonNegInteger; position in the shrinking key
+        """
+        self._remove(self.alive.select(position))
+
+    def take_at(self, position: int) -> str:
+        """
+        Removes the character found at a position of the shrinking key.
+        :param position: NonNegInteger; position in the shrinking key
+        :return: Str; The character which was removed
+        """
+        offset = self.alive.select(position)
+        ch = self.key[offset]
+        self._remove(offset)
+        return ch
+
+    def remaining(self) -> str:
+        """
+        :return: Str; The shrinking key as it currently stands, equal to slicing out every deleted character
+        """
+        parts = []
+        prev = 0
+        for offset in sorted(self.deleted):
+            parts.append(self.key[prev:offset])
+            prev = offset + 1
+        parts.append(self.key[prev:len(self.key)])
+        return ''.join(parts)
+
+    def remaining_hash(self, stop: int = None) -> str:
+        """
+        Hashes the shrinking key piece by piece, without ever building it as a single string.
+        :param stop: NonNegInteger; Optional, only hashes what remains of the first stop characters of the key
+        :return: Str; Hex sha256 of the shrinking key encoded as UTF-8, the same as hashing remaining()
+        """
+        if stop is None:
+            stop = len(self.key)
+        hasher = h.sha256()
+        np = numpy_module() if len(self.deleted) >= BATCH_DECODE else None
+        if np is not None:  # Masks out every removed character at once, see key_array
+            buffer, raw = key_array(np, self.key)
+            alive = np.ones(len(buffer), bool)
+            if not isinstance(self.key, str):
+                alive[np.frombuffer(self.key.newlines, np.int64)] = False
+            alive[raw(np.array(self.deleted, np.int64))] = False
+            end = len(buffer) if stop >= len(self.key) else int(raw(np.array([stop], np.int64))[0])
+            remaining = buffer[:end][alive[:end]]
+            if remaining.dtype == np.uint32:
+                hasher.update(remaining.tobytes().decode('utf-32-le').encode('utf-8'))
+            else:
+                hasher.update(remaining.tobytes())
+            return hasher.hexdigest()
+        prev = 0
+        for offset in [d for d in sorted(self.deleted) if d < stop] + [stop]:
+            if offset > prev:
+                if isinstance(self.key, str):
+                    hasher.update(self.key[prev:offset].encode('utf-8'))
+                else:  # Copied a chunk at a time rather than a line at a time, see MappedKey.stripped
+                    for start in range(prev, offset, MAP_CHUNK):
+                        hasher.update(self.key.stripped(start, min(offset, start + MAP_CHUNK)))
+            prev = offset + 1
+        return hasher.hexdigest()
+
+
+class KeyTree:
+    """
+    Merkle tree fingerprint of a newline-stripped key, the 'merkle' key hash. The whole key is cut into leaves of
+    KEY_TREE_LEAF characters, and each leaf hashes what remains of its own characters, so removing characters only
+    changes their leaves and the O(log n) nodes above them. The final key hash of a message is found by rehashing the
+    leaves it used, never the whole remaining key. Leaves are hashed over several threads for large keys.
+
+    Leaves are blake3(b"\x00" + UTF-8 of the characters left), nodes blake3(b"\x01" + left + right) with a lone last
+    node carried up as is, and the key hash is blake3(b"\x02" + key length as 8 bytes little-endian + root), printed
+    after MERKLE_PREFIX.
+
+    key: the newline-stripped key, str or MappedKey, left untouched.
+    levels: list of the levels of the tree over the whole key, leaves first, each a list of 32 byte digests.
+    """
+    def __init__(self, key, workers: int = None):
+        self.key = key
+        count = max(1, -(-len(key) // KEY_TREE_LEAF))
+        workers = min(workers or os.cpu_count() or 1, count // KEY_TREE_PARALLEL)
+        if workers > 1:
+            step = -(-count // workers)
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(workers) as pool:
+                parts = pool.map(lambda first: [self._leaf(i) for i in range(first, min(first + step, count))],
+                                 range(0, count, step))
+                leaves = [digest for part in parts for digest in part]
+        else:
+            leaves = [self._leaf(i) for i in range(count)]
+        self.levels = [leaves]
+        while len(self.levels[-1]) > 1:
+            below = self.levels[-1]
+            self.levels.append([self._node(below, i, {}) for i in range((len(below) + 1) // 2)])
+
+    def _leaf(self, i: int, deleted: list = ()) -> bytes:
+        """
+        :param i: NonNegInteger; Leaf number
+        :param deleted: List; Ascending key offsets removed from the leaf
+        :return: Bytes; Digest of the leaf
+        """
+        start = i * KEY_TREE_LEAF
+        stop = min(start + KEY_TREE_LEAF, len(self.key))
+        chars = self.key[start:stop] if isinstance(self.key, str) else self.key.stripped(start, stop)
+        if deleted:
+            pieces = []
+            prev = 0
+            for offset in deleted:
+                pieces.append(chars[prev:offset - start])
+                prev = offset - start + 1
+            pieces.append(chars[prev:])
+            chars = chars[:0].join(pieces)
+        hasher = bl3(b"\x00")
+        hasher.update(chars.encode('utf-8') if isinstance(chars, str) else chars)
+        return hasher.digest()
+
+    @staticmethod
+    def _node(below: list, i: int, changed: dict) -> bytes:
+        """
+        :param below: List; Digests of the level below
+        :param i: NonNegInteger; Node number
+        :param changed: Dict; Node number -> digest of the nodes of the level below which differ from below
+        :return: Bytes; Digest of the node
+        """
+        left = changed.get(2 * i, below[2 * i])
+        if 2 * i + 1 == len(below):
+            return left
+        return bl3(b"\x01" + left + changed.get(2 * i + 1, below[2 * i + 1])).digest()
+
+    def hash(self, deleted: list = ()) -> str:
+        """
+        :param deleted: List; Key offsets removed, in any order, such as KeyIndex.deleted
+        :return: Str; MERKLE_PREFIX and the hex key hash of what remains of the key
+        """
+        leaves = {}
+        for offset in deleted:
+            leaves.setdefault(offset // KEY_TREE_LEAF, []).append(offset)
+        changed = {i: self._leaf(i, sorted(offsets)) for i, offsets in leaves.items()}
+        for below in self.levels[:-1]:
+            changed = {i: self._node(below, i, changed) for i in {j // 2 for j in changed}}
+        root = changed.get(0, self.levels[-1][0])
+        return MERKLE_PREFIX + bl3(b"\x02" + len(self.key).to_bytes(8, 'little') + root).hexdigest()
+
+
+class ApocError(Exception):
+    """
+    Error carrying one of the codes documented in errorcodes.md, raised by the parts of Apocrypha which don't prompt
+    the user themselves, such as encode_message, decode_message, and the batch runner.
+
+    code: Str; Error code without brackets, such as "II.E2"
+    """
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+    def __str__(self) -> str:
+        return "Error [" + self.code + "]: " + super().__str__()
+
+    def __reduce__(self):
+        return type(self), (self.code, super().__str__())
+
+
+class KeySourceError(ApocError):
+    """
+    A key couldn't be loaded, such as a missing key file, a blank passphrase, or a book that couldn't be downloaded.
+    """
+
+
+class EncryptionError(ApocError):
+    """
+    A message couldn't be encrypted with its key, the II.E# codes.
+    """
+
+
+class DecryptionError(ApocError):
+    """
+    An encrypted message couldn't be decrypted with its key, the III.D# codes.
+    """
+
+
+class MessageFormatError(ApocError):
+    """
+    An encrypted message or a batch job couldn't be read, such as a damaged .apoc file.
+    """
+
+
+class Sampler:
+    """
+    Uniformly random integers for picking key positions. 8 byte words are drawn from a CSPRNG (os.urandom, which
+    secrets uses too) SAMPLER_BATCH at a time, and brought below a bound by rejection sampling, so that no integer
+    is more likely than another.
+
+    Given a seed, the words come from a blake3 XOF of the seed instead, the same seed and batch always giving the same
+    integers, for reproducible benchmarks and test vectors. Seeded samplers are predictable, never encrypt real
+    messages with one. Any other source of random bytes can be given instead.
+
+    source: callable of a number of bytes -> that many random bytes.
+    seed: Str seed of the XOF, None if the sampler isn't seeded.
+    words: list of the 8 byte words drawn and not used yet, used from the end.
+    drawn: bytes drawn from the source so far.
+    """
+    def __init__(self, seed: str or int = None, source=None, batch: int = SAMPLER_BATCH):
+        self.seed = None if seed is None else str(seed)
+        self.source = source or (os.urandom if seed is None else self.seeded)
+        self.batch = batch
+        self.words = []
+        self.drawn = 0
+
+    def seeded(self, size: int) -> bytes:
+        """
+        :param size: NonNegInteger; Number of bytes
+        :return: Bytes; The next bytes of the XOF of the seed
+        """
+        return bl3(b"apoc-sampler\x00" + self.seed.encode('utf-8')).digest(size, seek=self.drawn)
+
+    def below(self, n: int) -> int:
+        """
+        :param n: PosInteger; Bound, less than 2 ** 64
+        :return: NonNegInteger; Uniformly random integer from 0 to n - 1, raises ValueError if n isn't positive
+        """
+        if n <= 0:
+            raise ValueError("Empty range for Sampler.below")
+        words = self.words
+        while True:
+            if not words:
+                drawn = array('Q', self.source(8 * self.batch))
+                if sys.byteorder == "big":  # Read as little-endian, so seeded samplers give the same integers anywhere
+                    drawn.byteswap()
+                words = self.words = drawn.tolist()
+                self.drawn += 8 * self.batch
+            word = words.pop()
+            # Words from 2 ** 64 - 2 ** 64 % n up would make the lowest integers more likely, the first test nearly
+            # always settles it without working out the modulo
+            if word < _WORD_SPACE - n or word < _WORD_SPACE - _WORD_SPACE % n:
+                return word % n
+
+
+def encode_message(strfile: KeyIndex, message: str, sampler: Sampler = None) -> list:
+    """
+    Encrypts a message against a key index, removing one key character for every message character.
+    Characters not found in the key are written as a negative location followed by the product of both characters.
+    :param strfile: KeyIndex; Index of the newline-stripped key, nothing removed from it yet
+    :param message: Str; Message to encrypt
+    :param sampler: Sampler; Optional, picks the key positions used, a new one drawing from os.urandom if not, unless
+        a benchmark has set SAMPLER_SEED
+    :return: List; Integer locations making up the encrypted message, hash it with strfile.remaining_hash()
+    """
+    sampler = sampler or Sampler(SAMPLER_SEED)
+    messagefinal = []
+    for ch in message:
+        if ch in strfile:
+            messagefinal.append(strfile.take_char(ch, sampler.below(strfile.occurrences(ch))))
+            continue
+        try:
+            # Position 0 is never used here, as -0 can't be told apart from a regular position
+            basecharused = (sampler.below(len(strfile) - 1) + 1) * -1
+            charused = ord(strfile.take_at(-1 * basecharused)) * ord(ch)
+        except (ValueError, IndexError):
+            if ch in ["$", "^"]:
+                raise EncryptionError("II.E4", "Couldn't encrypt message. Couldn't encrypt '$' or '^' character.")
+            raise EncryptionError("II.E2", "Couldn't encrypt message. "
+                                           "Exception thrown encrypting character not found in key.")
+        messagefinal.append(basecharused)
+        messagefinal.append(charused)
+    return messagefinal
+
+
+def decode_message(strfile: KeyIndex, locations: list, hashed: bool = True) -> tuple:
+    """
+    Decrypts the locations of an encrypted message against a key index, removing each key character used. An empty
+    message has no locations, so no locations only decrypts (to an empty message) when a key hash came with them.
+    :param strfile: KeyIndex; Index of the newline-stripped key (indexed=False is enough), nothing removed from it yet
+    :param locations: List; Integer locations, from tokenize_message or unpack_message
+    :param hashed: Bool; Whether the encrypted message came with a key hash, only changes the error codes used
+    :return: Tuple; (Str decrypted message, List of codes for characters not found in the key which failed to resolve)
+    """
+    finalmessage = []
+    warnings = []
+    try:
+        if len(locations) == 0 and not hashed:
+            raise IndexError("No locations found in the encrypted message")
+        i = 0
+        while i < len(locations):
+            location = locations[i]
+            if location < 0:
+                basech = strfile.char_at(abs(location))
+                try:
+                    finalmessage.append(chr(locations[i + 1] // ord(basech)))
+                except (IndexError, ValueError, OverflowError):
+                    if i + 2 < len(locations):
+                        warnings.append("III.9C" if hashed else "III.9A")
+                    else:
+                        warnings.append("III.9D" if hashed else "III.9B")
+                i += 2
+            else:
+                finalmessage.append(strfile.char_at(location))
+                i += 1
+            strfile.delete_at(abs(location))
+    except IndexError:
+        if hashed:
+            raise DecryptionError("III.D2", "Unable to decrypt message. "
+                                            "Probable Cause: Incorrect/Too Small of a key file.")
+        raise DecryptionError("III.D1", "Unable to decrypt message.\n"
+                                        "Probable Cause: Incorrect/Too Small of a key file.")
+    return "".join(finalmessage), warnings
+
+
+_NUMPY = []  # NumPy once numpy_module has tried to import it, None if it isn't installed
+
+
+def numpy_module():
+    """
+    :return: Module or None; NumPy, only imported on first use as few runs need it, None if it isn't installed
+    """
+    if not _NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _NUMPY.append(numpy)
+    return _NUMPY[0]
+
+
+def key_array(np, key) -> tuple:
+    """
+    :param np: Module; NumPy
+    :param key: Str or MappedKey; Newline-stripped key
+    :return: Tuple; (NumPy array of the character codes of the key, uint8 for ASCII keys and uint32 otherwise,
+        function of a NumPy array of key offsets -> their indices in that array). Mapped keys aren't copied, their
+        array is the whole mapped file, newlines included.
+    """
+    if isinstance(key, str):
+        if key.isascii():
+            return np.frombuffer(key.encode('ascii'), np.uint8), lambda offsets: offsets
+        return np.frombuffer(key.encode('utf-32-le'), np.uint32), lambda offsets: offsets
+    shifted = np.frombuffer(key.shifted, np.int64)
+    return np.frombuffer(key.data, np.uint8), lambda offsets: offsets + np.searchsorted(shifted, offsets, 'right')
+
+
+def removed_offsets(np, positions, size: int):
+    """
+    Finds the key offsets a run of removals took, each removal given as a position in the key left by the ones before
+    it. Rather than one Fenwick tree select per removal, pairs of neighbouring blocks of removals are merged, level
+    by level: every position of the second block is moved past the removals of the first one, which is a single
+    searchsorted of all the blocks at once, given the first blocks' offsets sorted.
+    :param np: Module; NumPy
+    :param positions: NumPy int64 array; Position of each removal in the key as it was then, each one valid
+    :param size: NonNegInteger; Length of the key before any removal
+    :return: NumPy int64 array; Offset of each removal in the whole key
+    """
+    count = len(positions)
+    total = 1 << max(0, count - 1).bit_length()
+    values = np.zeros(total, np.int64)  # Padded with removals of the first character left, after every real one
+    values[:count] = positions
+    ordered = values.copy()
+    space = size + total  # Greater than any offset, even of the padding, so each pair gets a range of its own
+    block = 1
+    while block < total:
+        pairs = total // (2 * block)
+        values = values.reshape(pairs, 2, block)
+        ordered = ordered.reshape(pairs, 2, block)
+        base = (np.arange(pairs, dtype=np.int64) * space)[:, None]
+        # Offset o of the second block is o + #{first block offsets f, j-th smallest: f - j <= o}, see MappedKey.raw
+        shifted = (ordered[:, 0, :] - np.arange(block, dtype=np.int64) + base).ravel()
+        rows = (np.arange(pairs, dtype=np.int64) * block)[:, None]
+        for second in [values[:, 1, :], ordered[:, 1, :]]:  # Moving offsets keeps their order, ordered stays sorted
+            second += np.searchsorted(shifted, (second + base).ravel(), 'right').reshape(pairs, block) - rows
+        ordered = np.sort(ordered.reshape(pairs, 2 * block), axis=1, kind='stable')  # Two sorted runs, merged
+        values = values.reshape(pairs, 2 * block)
+        block *= 2
+    return values.reshape(total)[:count]
+
+
+def decode_batch(strfile: KeyIndex, locations: list, hashed: bool = True) -> tuple or None:
+    """
+    decode_message with NumPy, resolving every location at once instead of one after another. The key offsets the
+    locations took are found with removed_offsets, the characters at them gathered in one go, and the removals
+    applied to strfile all at once (see Fenwick.from_flags), ending in the same state as decode_message.
+    :param strfile: KeyIndex; Index of the newline-stripped key built with indexed=False, nothing removed from it yet
+    :param locations: List; Integer locations, from tokenize_message or unpack_message
+    :param hashed: Bool; Whether the encrypted message came with a key hash, only changes the error codes used
+    :return: Tuple or None; As decode_message, None if NumPy isn't installed or the locations are too malformed for
+        anything but decode_message, which then gives the same result
+    """
+    np = numpy_module()
+    if np is None or len(locations) == 0 or strfile.indexed:
+        return None
+    try:
+        tokens = np.array(locations, np.int64)
+    except (OverflowError, ValueError, TypeError):
+        return None
+    negative = tokens < 0
+    if (negative[1:] & negative[:-1]).any():  # Whether a negative location is a product depends on the ones before
+        return None
+    product = np.zeros(len(tokens), bool)
+    product[1:] = negative[:-1]
+    indices = np.flatnonzero(~product)
+    positions = np.abs(tokens[indices])
+    size = len(strfile.key)
+    if (positions >= size - np.arange(len(positions), dtype=np.int64)).any():
+        if hashed:
+            raise DecryptionError("III.D2", "Unable to decrypt message. "
+                                            "Probable Cause: Incorrect/Too Small of a key file.")
+        raise DecryptionError("III.D1", "Unable to decrypt message.\n"
+                                        "Probable Cause: Incorrect/Too Small of a key file.")
+    offsets = removed_offsets(np, positions, size)
+    buffer, raw = key_array(np, strfile.key)
+    codes = buffer[raw(offsets)].astype(np.int64)
+    fallback = np.flatnonzero(negative[indices])  # Locations of characters not found in the key
+    if (codes[fallback] == 0).any():
+        return None
+    warnings = []
+    if len(fallback):
+        after = indices[fallback] + 1
+        given = after < len(tokens)
+        found = np.full(len(fallback), -1, np.int64)
+        found[given] = tokens[after[given]] // codes[fallback[given]]
+        failed = (found < 0) | (found > 0x10FFFF)
+        codes[fallback] = found
+        late = indices[fallback[failed]] + 2 >= len(tokens)
+        warnings = np.where(late, "III.9D" if hashed else "III.9B", "III.9C" if hashed else "III.9A").tolist()
+        codes = np.delete(codes, fallback[failed])
+    alive = np.ones(size, bool)
+    alive[offsets] = False
+    strfile.alive = Fenwick.from_flags(alive)
+    strfile.deleted = offsets.tolist()
+    return codes.astype('<u4').tobytes().decode('utf-32-le', 'surrogatepass'), warnings
+
+
+def message_length(locations: list) -> int:
+    """
+    :param locations: List; Integer locations of an encrypted message
+    :return: NonNegInteger; Number of characters the encrypted message decrypts to
+    """
+    return len(locations) - len([loc for loc in locations if loc < 0])
+
+
+def check_key_hash(strfile: KeyIndex, msgkeyhash: str or None, legacylength: int = None) -> tuple:
+    """
+    Final key hash of a decrypted message. 'msg' keys from before 1.9.5 were sized by their passphrase, so given the
+    length such a key would have had, it is also checked against the message key hash.
+    :param strfile: KeyIndex; Index the message was decrypted against
+    :param msgkeyhash: Str or None; Key hash given with the encrypted message
+    :param legacylength: NonNegInteger; Optional, length of the passphrase sized 'msg' key
+    :return: Tuple; (Str hex sha256 of what remains of the key, NonNegInteger length of the key that was hashed)
+    """
+    finalkeyhash = strfile.remaining_hash()
+    if legacylength is not None and msgkeyhash not in [None, finalkeyhash] and legacylength < len(strfile.key):
+        if strfile.remaining_hash(legacylength) == msgkeyhash:
+            return msgkeyhash, legacylength
+    return finalkeyhash, len(strfile.key)
+
+
+_SHARED_KEY = None  # KeyIndex a worker of encrypt_many copies for every message, attached by _attach_shared_key
+
+
+def share_key(strfile: KeyIndex) -> tuple or None:
+    """
+    Copies a newline-stripped ASCII key and its per-symbol positions into one block of shared memory, positions first
+    as 8 byte integers grouped by symbol, then the key as one byte per character.
+    :param strfile: KeyIndex; Index of the key with nothing removed yet
+    :return: Tuple or None; (SharedMemory, Dict of symbol -> (start, stop) of its positions), None for non-ASCII keys
+    """
+    size = len(strfile.key)
+    if isinstance(strfile.key, str) and not strfile.key.isascii():
+        return None
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(create=True, size=max(1, 9 * size))
+    spans = {}
+    start = 0
+    for ch, positions in list(strfile.index_all().items()):
+        if not isinstance(positions, memoryview):  # Positions mapped from an index sidecar are already 8 byte integers
+            positions = array('q', positions)
+        block.buf[8 * start:8 * (start + len(positions))] = positions.tobytes()
+        spans[ch] = (start, start + len(positions))
+        start += len(positions)
+    if isinstance(strfile.key, str):
+        block.buf[8 * size:9 * size] = strfile.key.encode('ascii')
+    else:
+        offset = 8 * size
+        for segment in strfile.key.segments(0, size):
+            block.buf[offset:offset + len(segment)] = segment
+            offset += len(segment)
+    return block, spans
+
+
+def _attach_shared_key(name: str, spans: dict, size: int, levels: list = None) -> None:
+    """
+    Process pool initializer of encrypt_many, attaching to the key made by share_key. Nothing of the key is copied,
+    only the Fenwick trees, which hold the key characters this worker has removed, are private to the worker.
+    Given the levels of a KeyTree, messages are hashed with the 'merkle' key hash.
+    """
+    global _SHARED_KEY
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(name)
+    positions = block.buf[:8 * size].cast('q')
+    strfile = KeyIndex(MappedKey(block.buf[8 * size:9 * size].toreadonly()))
+    strfile.positions = {ch: positions[start:stop] for ch, (start, stop) in spans.items()}
+    strfile.complete = True
+    tree = None
+    if levels is not None:
+        tree = KeyTree.__new__(KeyTree)
+        tree.key, tree.levels = strfile.key, levels
+    _SHARED_KEY = (block, strfile, tree)
+
+
+def _encrypt_shared(message: str, seed: str = None) -> list or ApocError:
+    return encrypt_one(_SHARED_KEY[1].fresh(), message, _SHARED_KEY[2], None if seed is None else Sampler(seed))
+
+
+def encrypt_one(strfile: KeyIndex, message: str, tree: KeyTree = None, sampler: Sampler = None) -> list or ApocError:
+    """
+    :param strfile: KeyIndex; Index of the key with nothing removed yet, removed from while encrypting
+    :param message: Str; Message to encrypt
+    :param tree: KeyTree; Optional, tree of the same key, for the 'merkle' key hash instead of sha256
+    :param sampler: Sampler; Optional, picks the key positions used, see encode_message
+    :return: List or ApocError; [locations, Str final key hash], or the error the message failed with
+    """
+    if len(strfile) < len(message):
+        return EncryptionError("II.E1", "Key file is not large enough to encrypt for your message.")
+    try:
+        with span("encode"):
+            locations = encode_message(strfile, message, sampler)
+    except ApocError as e:
+        return e
+    with span("final_hash"):
+        return [locations, strfile.remaining_hash() if tree is None else tree.hash(strfile.deleted)]
+
+
+def encrypt_many(strfile: KeyIndex, messages: list, workers: int = None, tree: KeyTree = None,
+                 seed: str or int = None) -> list:
+    """
+    Encrypts every message against the same key, each message starting from the whole key as if encrypted alone.
+
+    The key and its positions are loaded once into shared memory (see share_key) and a pool of processes attaches to
+    it, so the key isn't copied once per process. Non-ASCII keys, few messages, or a single worker encrypt in this
+    process instead.
+    :param strfile: KeyIndex; Index of the key with nothing removed yet, left untouched
+    :param messages: List; Str messages to encrypt
+    :param workers: PosInteger; Optional, number of processes, defaults to the number of CPUs
+    :param tree: KeyTree; Optional, tree of the same key, for the 'merkle' key hash instead of sha256
+    :param seed: Str or Integer; Optional, for reproducible benchmarks only, seeds the Sampler of the i-th message
+        with '<seed>:<i>', so every message draws its own stream whichever worker encrypts it. Defaults to
+        SAMPLER_SEED, unseeded messages each draw from os.urandom.
+    :return: List; [locations, key hash] per message in order, or the ApocError a message failed with
+    """
+    seed = SAMPLER_SEED if seed is None else seed
+    seeds = [None if seed is None else "{}:{}".format(seed, i) for i in range(len(messages))]
+    workers = min(workers or os.cpu_count() or 1, len(messages))
+    shared = share_key(strfile) if workers > 1 and len(messages) >= BULK_MESSAGES else None
+    if shared is None:
+        return [encrypt_one(strfile.fresh(), message, tree, None if each is None else Sampler(each))
+                for message, each in zip(messages, seeds)]
+    block, spans = shared
+    from concurrent.futures import ProcessPoolExecutor
+    try:
+        with ProcessPoolExecutor(workers, initializer=_attach_shared_key,
+                                 initargs=(block.name, spans, len(strfile.key),
+                                           None if tree is None else tree.levels)) as pool:
+            return list(pool.map(_encrypt_shared, messages, seeds,
+                                 chunksize=max(1, len(messages) // (workers * 4))))
+    finally:
+        block.close()
+        block.unlink()
+
+
+class KeySource:
+    """
+    Where the key of encrypt and decrypt comes from.
+
+    kind: 'file', 'msg', 'local', or 'link'.
+    value: the path of a key file, a passphrase expanded with expanding_hash, a location expanded with local_book,
+        or a book.cgi link whose book is downloaded or found in the key store, respectively.
+    """
+    KINDS = ["file", "msg", "local", "link"]
+
+    def __init__(self, kind: str, value: str):
+        if kind not in self.KINDS:
+            raise ValueError("Unknown key source kind: " + str(kind))
+        self.kind = kind
+        self.value = value
+
+    @classmethod
+    def parse(cls, key) -> 'KeySource':
+        """
+        Reads a key the way the rest of Apocrypha passes keys around.
+        :param key: KeySource, Str, or Path; a passphrase with an appended '.msg', a link, or the path of a key file
+        :return: KeySource
+        """
+        if isinstance(key, KeySource):
+            return key
+        key = str(key)
+        if key[-4:] == ".msg":
+            return cls("msg", key[:-4])
+        if key[:7] == "http://" or key[:8] == "https://":
+            return cls("link", key)
+        return cls("file", key)
+
+    def __repr__(self) -> str:
+        return "KeySource(" + repr(self.kind) + ", " + repr(self.value) + ")"
+
+
+class Ciphertext:
+    """
+    Encrypted message, as returned by encrypt.
+
+    locations: list of integer locations, each negative location followed by the product of both characters.
+    keyhash: key hash of what remained of the key after encrypting, hex sha256 or MERKLE_PREFIX and the hex 'merkle'
+        key hash (see KeyTree), None when the message came without one.
+    """
+    def __init__(self, locations: list, keyhash: str = None):
+        self.locations = locations
+        self.keyhash = keyhash
+
+    def __str__(self) -> str:
+        return str([self.locations] if self.keyhash is None else [self.locations, self.keyhash])
+
+    @classmethod
+    def parse(cls, encryptedmessage: str) -> 'Ciphertext':
+        """
+        :param encryptedmessage: Str; Encrypted message as printed, see tokenize_message
+        :return: Ciphertext
+        """
+        return cls(*tokenize_message(encryptedmessage))
+
+    @classmethod
+    def from_apoc(cls, data: bytes) -> 'Ciphertext':
+        """
+        :param data: Bytes-like; Contents of an .apoc file, see unpack_message
+        :return: Ciphertext
+        """
+        try:
+            return cls(*unpack_message(data))
+        except ValueError:
+            raise MessageFormatError("III.A1", "Invalid .apoc file, it may be damaged or from a newer version.")
+
+    def to_apoc(self) -> bytes:
+        """
+        :return: Bytes; Contents of an .apoc file, see pack_message
+        """
+        return pack_message(self.locations, self.keyhash)
+
+
+class SegmentedCiphertext:
+    """
+    Encrypted message split into segments, each encrypted against a key of its own, as returned by encrypt_segmented.
+    Printed as "['segmented', <size>, [[<locations>], '<key hash>'], ...]", one [locations, key hash] per segment.
+
+    segments: list of the Ciphertext of each segment, in order.
+    size: message characters in each segment, the last one may have fewer.
+    """
+    def __init__(self, segments: list, size: int = SEGMENT_CHARS):
+        self.segments = segments
+        self.size = size
+
+    def __str__(self) -> str:
+        return str([SEGMENTED_TAG, self.size] + [[segment.locations, segment.keyhash] for segment in self.segments])
+
+    @property
+    def keyhash(self) -> str:
+        """
+        :return: Str; The key hashes of every segment combined, see segments_hash
+        """
+        return segments_hash([segment.keyhash for segment in self.segments])
+
+    @classmethod
+    def parse(cls, encryptedmessage: str) -> 'SegmentedCiphertext':
+        """
+        :param encryptedmessage: Str; Segmented message as printed, see tokenize_segments
+        :return: SegmentedCiphertext
+        """
+        try:
+            size, segments = tokenize_segments(encryptedmessage)
+        except ValueError:
+            raise MessageFormatError("III.A2", "Invalid segmented message, a segment is missing its key hash.")
+        return cls([Ciphertext(*segment) for segment in segments], size)
+
+    @classmethod
+    def from_apoc(cls, data: bytes) -> 'SegmentedCiphertext':
+        """
+        :param data: Bytes-like; Contents of a segmented .apoc file, see unpack_segments
+        :return: SegmentedCiphertext
+        """
+        try:
+            size, segments = unpack_segments(data)
+        except ValueError:
+            raise MessageFormatError("III.A1", "Invalid .apoc file, it may be damaged or from a newer version.")
+        return cls([Ciphertext(*segment) for segment in segments], size)
+
+    def to_apoc(self) -> bytes:
+        """
+        :return: Bytes; Contents of a segmented .apoc file, see pack_segments
+        """
+        return pack_segments(self.size, [(segment.locations, segment.keyhash) for segment in self.segments])
+
+
+def is_segmented(ciphertext) -> bool:
+    """
+    :param ciphertext: Str or Bytes-like; Encrypted message as printed, or the contents of an .apoc file
+    :return: Bool; Whether it's a segmented message, see SegmentedCiphertext
+    """
+    if isinstance(ciphertext, str):
+        return ciphertext.lstrip()[:len(SEGMENTED_TAG) + 3] in ["['" + SEGMENTED_TAG + "'", '["' + SEGMENTED_TAG + '"']
+    if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+        view = memoryview(ciphertext)
+        return len(view) > len(APOC_MAGIC) and view[:len(APOC_MAGIC)] == APOC_MAGIC and view[4] == APOC_SEGMENTED
+    return False
+
+
+def segments_hash(hashes: list) -> str or None:
+    """
+    :param hashes: List; Key hash of each segment, in order
+    :return: Str or None; Hex sha256 of the key hashes one per line, which only matches if every one of them does,
+        None if a segment has no key hash
+    """
+    if any(keyhash is None for keyhash in hashes):
+        return None
+    return h.sha256("\n".join(hashes).encode('utf-8')).hexdigest()
+
+
+class Plaintext:
+    """
+    Decrypted message, as returned by decrypt.
+
+    message: the decrypted message.
+    final_key_hash: key hash of what remained of the key after decrypting, of the same kind as message_key_hash.
+    message_key_hash: key hash the encrypted message came with, None if it had none.
+    initial_key_hash: key hash of the key before decrypting, of the same kind as final_key_hash.
+    warnings: list of III.9# error codes of characters not found in the key which couldn't be resolved.
+    segments: list of the Plaintext of each segment of a segmented message, None for other messages. The key hashes
+        of a segmented message combine those of its segments, see segments_hash.
+    """
+    def __init__(self, message: str, final_key_hash: str, message_key_hash: str or None, initial_key_hash: str,
+                 warnings: list, segments: list = None):
+        self.message = message
+        self.final_key_hash = final_key_hash
+        self.message_key_hash = message_key_hash
+        self.initial_key_hash = initial_key_hash
+        self.warnings = warnings
+        self.segments = segments
+
+    def __str__(self) -> str:
+        return self.message
+
+    @property
+    def key_hash_match(self) -> bool or None:
+        """
+        :return: Bool or None; Whether the final key hash matches the message key hash, None if the message had none
+        """
+        return None if self.message_key_hash is None else self.final_key_hash == self.message_key_hash
+
+    @property
+    def mismatched_segments(self) -> list:
+        """
+        :return: List; Integer indices of the segments whose final key hash doesn't match, empty if not segmented
+        """
+        return [i for i, segment in enumerate(self.segments or []) if segment.key_hash_match is False]
+
+
+def load_key(source: KeySource, config: Config, keys: dict = None, length: int = None,
+             decrypting: bool = False) -> list:
+    """
+    Loads a key, or reuses the one an earlier call loaded into keys for the same key. 'msg' and 'local' keys are kept
+    in keys under the salted fingerprint of their passphrase or location (see ExpandingHashCache.fingerprint), never
+    the passphrase or location itself, as keys may be kept for as long as a daemon runs.
+    :param source: KeySource; Key to load
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param keys: Dict; Optional, keys loaded so far, filled in by this function
+    :param length: NonNegInteger; Length of the 'msg' key to derive, unused for other kinds of key
+    :param decrypting: Bool; Only changes the error codes raised, II.## when encrypting and III.## when decrypting
+    :return: List; [newline-stripped key, Str hex sha256 of the key, Dict of unused KeyIndex templates by indexed]
+    """
+    section = "III" if decrypting else "II"
+    keys = {} if keys is None else keys
+    value = hash_cache(config.hash_cache).fingerprint(source.value) if source.kind in ["msg", "local"] else source.value
+    name = (source.kind, value, length if source.kind == "msg" else None)
+    if name not in keys:
+        with span("key_acquisition"):
+            if source.kind == "link":
+                import sqlite3
+                import requests
+                try:
+                    origstrfile, keyhash = open_key(fetch_key(source.value, config), config.key_index)
+                except (requests.RequestException, ValueError, OSError, sqlite3.Error):
+                    raise KeySourceError(section + ".H1", "Couldn't download the key file, it will have to be "
+                                                          "downloaded manually.")
+            elif source.kind == "file":
+                if source.value[-4:] != ".txt" and source.value[-5:] not in [".json", ".apoc"]:
+                    raise KeySourceError(section + ".F1", "File must be a .txt, .json, or .apoc file")
+                if not Path(source.value).is_file():
+                    raise KeySourceError(section + ".P1", "Incorrect filepath.")
+                origstrfile, keyhash = open_key(source.value, config.key_index)
+            elif source.kind == "local":
+                origstrfile = local_book(source.value)
+                keyhash = h.sha256(origstrfile.encode('utf-8')).hexdigest()
+            else:
+                if source.value == "":
+                    raise KeySourceError(section + ".K1", "Invalid key. Likely blank key entered.")
+                origstrfile = hash_cache(config.hash_cache).get(source.value, length)
+                keyhash = h.sha256(origstrfile.encode('utf-8')).hexdigest()
+        keys[name] = [origstrfile, keyhash, {}]
+    return keys[name]
+
+
+def key_index(entry: list, indexed: bool) -> KeyIndex:
+    """
+    :param entry: List; Loaded key, as returned by load_key
+    :param indexed: Bool; Whether the per-symbol trees are needed, only encryption needs them
+    :return: KeyIndex; Index of the key with nothing removed yet, copied from one kept with the loaded key. Symbols
+        it indexes are kept with that one too, and written to the key's index sidecar by save_key_index.
+    """
+    templates = entry[2]
+    if indexed not in templates:
+        with span("index_build"):
+            templates.setdefault(indexed, KeyIndex(entry[0], indexed))  # Daemon threads may get here at once
+    with span("index_copy"):
+        return templates[indexed].fresh(indexed)
+
+
+def save_key_index(entry: list) -> None:
+    """
+    Writes the index sidecar of a key file opened with one kept (see open_key) once encrypting with it has indexed
+    symbols the sidecar doesn't hold yet. Only the symbols indexed so far are written, the key is never scanned for
+    the rest just to write them, those are added to the sidecar by later runs encrypting with them. Best effort, a
+    sidecar that can't be written is left as it was.
+    :param entry: List; Loaded key, as returned by load_key
+    """
+    key, template = entry[0], entry[2].get(True)
+    if isinstance(key, str) or key.path is None or template is None:
+        return
+    if len(template.positions) == len(key.index or ()) and template.complete == key.complete:
+        return
+    try:
+        with span("index_write"):
+            with template.lock:  # Other daemon threads may be adding symbols to it, see KeyIndex.symbol_tree
+                positions = dict(template.positions)
+            if write_key_index(key, entry[1], positions, template.complete):
+                key.index, key.complete = positions, template.complete
+    except Exception:  # The message is already encrypted, a sidecar is only ever a head start for later runs
+        pass
+
+
+def key_tree(entry: list) -> KeyTree:
+    """
+    :param entry: List; Loaded key, as returned by load_key
+    :return: KeyTree; Tree of the key for the 'merkle' key hash, built once and kept with the loaded key
+    """
+    templates = entry[2]
+    if 'tree' not in templates:
+        with span("key_tree"):
+            templates['tree'] = KeyTree(entry[0])
+    return templates['tree']
+
+
+def count_message(message: str, locations: list, keylength: int, counter: str) -> None:
+    """
+    Counts a message encrypted or decrypted while metrics are enabled, see Metrics.counters.
+    :param message: Str; The message
+    :param locations: List; Integer locations of the encrypted message
+    :param keylength: NonNegInteger; Length of the newline-stripped key used
+    :param counter: Str; 'messages_encrypted' or 'messages_decrypted'
+    """
+    _METRICS.count(counter)
+    _METRICS.count('message_chars', len(message))
+    _METRICS.count('fallback_chars', len([loc for loc in locations if loc < 0]))
+    _METRICS.count('special_chars', message.count(".") + message.count("$") + message.count("^"))
+    _METRICS.count('key_chars', keylength)
+
+
+def encrypt(message: str, key_source, config: Config = None, keys: dict = None, sampler: Sampler = None) -> Ciphertext:
+    """
+    Encrypts a message, returning the result rather than printing it or prompting for anything.
+    :param message: Str; Message to encrypt
+    :param key_source: KeySource or Str; Key to encrypt with, a Str is read with KeySource.parse
+    :param config: Config obj; Optional, for the hash_cache, key_store, and key_hash config options
+    :param keys: Dict; Optional, keys loaded by earlier calls, reused by calls with the same key
+    :param sampler: Sampler; Optional, picks the key positions used, Sampler(seed) gives reproducible test vectors
+    :return: Ciphertext; Raises KeySourceError or EncryptionError with the matching II.## error code
+    """
+    config = config or Config(False, "print")
+    source = KeySource.parse(key_source)
+    length = msg_key_length(source.value, len(message)) if source.kind == "msg" else None
+    return encrypt_entry(load_key(source, config, keys, length), message, config, sampler)
+
+
+def encrypt_entry(entry: list, message: str, config: Config, sampler: Sampler = None) -> Ciphertext:
+    """
+    Encrypts a message against a key already loaded, see encrypt.
+    :param entry: List; Loaded key, as returned by load_key
+    :param message: Str; Message to encrypt
+    :param config: Config obj; For the key_hash config option
+    :param sampler: Sampler; Optional, picks the key positions used
+    :return: Ciphertext; Raises EncryptionError with the matching II.E# error code
+    """
+    tree = key_tree(entry) if config.key_hash == "merkle" else None
+    encrypted = encrypt_one(key_index(entry, True), message, tree, sampler)
+    save_key_index(entry)
+    if isinstance(encrypted, ApocError):
+        raise encrypted
+    ciphertext = Ciphertext(*encrypted)
+    if _METRICS is not None:
+        count_message(message, ciphertext.locations, len(entry[0]), "messages_encrypted")
+        _METRICS.count('ciphertext_bytes', len(str(ciphertext).encode('utf-8')))
+    return ciphertext
+
+
+def decrypt(ciphertext, key_source, config: Config = None, keys: dict = None) -> Plaintext:
+    """
+    Decrypts a message, returning the result rather than printing it or prompting for anything.
+    'msg' keys also match the key hash of messages encrypted before 1.9.5, see check_key_hash. Segmented messages are
+    decrypted with decrypt_segmented.
+    :param ciphertext: Ciphertext, Str, or Bytes; Encrypted message, a Str as printed or the Bytes of an .apoc file
+    :param key_source: KeySource or Str; Key to decrypt with, a Str is read with KeySource.parse
+    :param config: Config obj; Optional, for the hash_cache and key_store config options
+    :param keys: Dict; Optional, keys loaded by earlier calls, reused by calls with the same key
+    :return: Plaintext; Raises KeySourceError, DecryptionError, or MessageFormatError with the matching error code
+    """
+    config = config or Config(False, "print")
+    if isinstance(ciphertext, SegmentedCiphertext) or is_segmented(ciphertext):
+        return decrypt_segmented(ciphertext, key_source, config)
+    if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+        ciphertext = Ciphertext.from_apoc(ciphertext)
+    elif not isinstance(ciphertext, Ciphertext):
+        ciphertext = Ciphertext.parse(ciphertext)
+    source = KeySource.parse(key_source)
+    length = legacylength = None
+    if source.kind == "msg":
+        length = msg_key_length(source.value, message_length(ciphertext.locations))
+        if source.value != "":  # Length of the passphrase sized keys from before 1.9.5
+            legacylength = len(hash_cache(config.hash_cache).get(source.value, max(1, len(source.value))))
+    return decrypt_entry(load_key(source, config, keys, length, True), ciphertext, legacylength)
+
+
+def decrypt_entry(entry: list, ciphertext: Ciphertext, legacylength: int = None) -> Plaintext:
+    """
+    Decrypts a message against a key already loaded, see decrypt.
+    :param entry: List; Loaded key, as returned by load_key
+    :param ciphertext: Ciphertext; Encrypted message
+    :param legacylength: NonNegInteger; Optional, length of the passphrase sized 'msg' key, see check_key_hash
+    :return: Plaintext; Raises DecryptionError with the matching III.D# error code
+    """
+    strfile = key_index(entry, False)
+    with span("decode"):
+        decoded = None
+        if len(ciphertext.locations) >= BATCH_DECODE:
+            decoded = decode_batch(strfile, ciphertext.locations, ciphertext.keyhash is not None)
+        message, warnings = decoded or decode_message(strfile, ciphertext.locations, ciphertext.keyhash is not None)
+    merkle = ciphertext.keyhash is not None and ciphertext.keyhash[:len(MERKLE_PREFIX)] == MERKLE_PREFIX
+    with span("final_hash"):
+        if merkle:
+            finalkeyhash, keylength = key_tree(entry).hash(strfile.deleted), len(entry[0])
+        else:
+            finalkeyhash, keylength = check_key_hash(strfile, ciphertext.keyhash, legacylength)
+    if _METRICS is not None:
+        count_message(message, ciphertext.locations, len(entry[0]), "messages_decrypted")
+    keyhash = key_tree(entry).hash() if merkle else entry[1]
+    if keylength < len(entry[0]):  # Matched an older, passphrase sized, 'msg' key
+        keyhash = h.sha256(entry[0][:keylength].encode('utf-8')).hexdigest()
+    return Plaintext(message, finalkeyhash, ciphertext.keyhash, keyhash, warnings)
+
+
+def segment_keys(source: KeySource, config: Config, count: int, decrypting: bool = False) -> list:
+    """
+    Derives the independent key of every segment of a segmented message, see encrypt_segmented.
+    A 'msg' key derives one key per segment with expanding_hash, from the passphrase and the segment's number. Any
+    other key is loaded once and split into count disjoint regions of equal length, one per segment in order.
+    :param source: KeySource; Key of the whole message
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param count: PosInteger; Number of segments
+    :param decrypting: Bool; Only changes the error codes raised, II.## when encrypting and III.## when decrypting
+    :return: List; KeySource of every 'msg' segment, or Str region of the key of every other segment
+    """
+    if source.kind == "msg":
+        return [KeySource("msg", source.value + "\x00" + str(i) if source.value != "" else "") for i in range(count)]
+    key = load_key(source, config, None, None, decrypting)[0]
+    region = len(key) // count
+    return [key[i * region:(i + 1) * region] for i in range(count)]
+
+
+def _encrypt_segment(job: tuple) -> Ciphertext or ApocError:
+    """
+    :param job: Tuple; (Str segment, KeySource or Str region key, Config obj), see encrypt_segmented
+    :return: Ciphertext or ApocError; Encrypted segment, or the error it failed with
+    """
+    segment, key, config = job
+    try:
+        if isinstance(key, KeySource):
+            return encrypt(segment, key, config)
+        return encrypt_entry([key, h.sha256(key.encode('utf-8')).hexdigest(), {}], segment, config)
+    except ApocError as e:
+        return e
+
+
+def _decrypt_segment(job: tuple) -> Plaintext or ApocError:
+    """
+    :param job: Tuple; (Ciphertext segment, KeySource or Str region key, Config obj), see decrypt_segmented
+    :return: Plaintext or ApocError; Decrypted segment, or the error it failed with
+    """
+    segment, key, config = job
+    try:
+        if isinstance(key, KeySource):
+            return decrypt(segment, key, config)
+        return decrypt_entry([key, h.sha256(key.encode('utf-8')).hexdigest(), {}], segment)
+    except ApocError as e:
+        return e
+
+
+def run_segments(func, jobs: list, workers: int = None) -> list:
+    """
+    :param func: _encrypt_segment or _decrypt_segment
+    :param jobs: List; Tuple job of every segment
+    :param workers: PosInteger; Optional, number of processes, defaults to the number of CPUs
+    :return: List; Result of every job in order, raises the first ApocError a segment failed with
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        results = [func(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(func, jobs))
+    for result in results:
+        if isinstance(result, ApocError):
+            raise result
+    return results
+
+
+def encrypt_segmented(message: str, key_source, config: Config = None, size: int = SEGMENT_CHARS,
+                      workers: int = None) -> SegmentedCiphertext:
+    """
+    Encrypts a message as a segmented message, split into segments of size characters which are each encrypted
+    against a key of their own (see segment_keys) across a pool of processes, so a long message isn't held to a single
+    core. Each segment keeps its own key hash, so decrypt_segmented can tell which segments don't match.
+    Key files must be at least as many times longer than a segment as there are segments.
+    :param message: Str; Message to encrypt
+    :param key_source: KeySource or Str; Key to encrypt with, a Str is read with KeySource.parse
+    :param config: Config obj; Optional, for the hash_cache, key_store, and key_hash config options
+    :param size: PosInteger; Message characters in each segment, defaults to SEGMENT_CHARS
+    :param workers: PosInteger; Optional, number of processes, defaults to the number of CPUs
+    :return: SegmentedCiphertext; Raises KeySourceError or EncryptionError with the matching II.## error code
+    """
+    config = config or Config(False, "print")
+    if size < 1:
+        raise ValueError("Segment size must be positive")
+    segments = [message[i:i + size] for i in range(0, max(len(message), 1), size)]
+    keys = segment_keys(KeySource.parse(key_source), config, len(segments))
+    if any(len(key) < len(segment) for key, segment in zip(keys, segments) if not isinstance(key, KeySource)):
+        raise EncryptionError("II.E1", "Key file is not large enough to encrypt for your message, each segment needs "
+                                       "a region of the key at least as long as the segment.")
+    return SegmentedCiphertext(run_segments(_encrypt_segment, [(segment, key, config) for segment, key in
+                                                               zip(segments, keys)], workers), size)
+
+
+def decrypt_segmented(ciphertext, key_source, config: Config = None, workers: int = None) -> Plaintext:
+    """
+    Decrypts a segmented message, every segment across a pool of processes, see encrypt_segmented.
+    :param ciphertext: SegmentedCiphertext, Str, or Bytes; Segmented message, a Str as printed or the Bytes of an
+        .apoc file
+    :param key_source: KeySource or Str; Key to decrypt with, a Str is read with KeySource.parse
+    :param config: Config obj; Optional, for the hash_cache and key_store config options
+    :param workers: PosInteger; Optional, number of processes, defaults to the number of CPUs
+    :return: Plaintext; Key hashes combined over every segment with segments_hash, the Plaintext of each segment in
+        segments. Raises KeySourceError, DecryptionError, or MessageFormatError with the matching error code
+    """
+    config = config or Config(False, "print")
+    if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+        ciphertext = SegmentedCiphertext.from_apoc(ciphertext)
+    elif not isinstance(ciphertext, SegmentedCiphertext):
+        ciphertext = SegmentedCiphertext.parse(ciphertext)
+    keys = segment_keys(KeySource.parse(key_source), config, len(ciphertext.segments), True)
+    plaintexts = run_segments(_decrypt_segment, [(segment, key, config) for segment, key in
+                                                 zip(ciphertext.segments, keys)], workers)
+    return Plaintext(''.join(p.message for p in plaintexts), segments_hash([p.final_key_hash for p in plaintexts]),
+                     ciphertext.keyhash, segments_hash([p.initial_key_hash for p in plaintexts]),
+                     [warning for p in plaintexts for warning in p.warnings], plaintexts)
+
+
+def pause(prompt: str) -> None:
+    """
+    Waits for enter before the program closes, unless stdin has already ended, as when the prompts are piped in.
+    :param prompt: Str; Prompt to show
+    """
+    try:
+        input(prompt)
+    except EOFError:
+        pass
+
+
+def Aencode1(config: Config) -> str or None:
+    """
+    Generates and returns a key to be used for encryption in Aencode2.
+    :param config: Config obj; Config object which allows for config options to be utilized.
+    :return: str (valid link or custom key), KeySource (local book location), or None (indicative of txt, json, or
+        apoc file)
+    """
+    import secrets as s
+    gentype = input("eA_gen.type[<python{INT};local{INT};apocrypha;custom{full;param};file;msg>]: ").lower().strip()
+    if gentype[:6] == "python":
+        try:
+            pynum = int(gentype[6:].strip())
+            eAhex = s.token_hex(pynum // 2)
+        except:
+            print("Error [II.N1]: Invalid Input, using python64 generation method")
+            eAhex = s.token_hex(32)
+        eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+            random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+        eAlink = BABEL_URL + "/book.cgi?" + eAloc
+        print(eAlink)
+        return eAlink
+    elif gentype[:5] == "local":
+        try:
+            eAhex = s.token_hex(int(gentype[5:].strip()) // 2)
+        except ValueError:
+            eAhex = s.token_hex(32)
+        eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+            random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+        print("Local book location (needed to decrypt): " + eAloc)
+        return KeySource("local", eAloc)
+    elif gentype == "apocrypha":
+        eAlink = key_fetcher().random_link()
+        print(eAlink)
+        return eAlink
+    elif gentype == "customfull":
+        keyreq = input("eA_k.full = ")
+        if key_fetcher().check(keyreq):
+            print("Success")
+            return keyreq
+        else:
+            print("Error [II.L1]: Link did not have a status code of 200, using python64 generation method")
+            eAhex = s.token_hex(32)
+            eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+                random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+            eAlink = BABEL_URL + "/book.cgi?" + eAloc
+            print(eAlink)
+            return eAlink
+    elif gentype == "customparam":
+        keyparam = input("eA_k.param = ")
+        if keyparam[0] == "?":
+            keyrequrl = BABEL_URL + "/book.cgi" + keyparam
+            if key_fetcher().check(keyrequrl):
+                print("Success")
+                return keyrequrl
+            else:
+                print("Error [II.L2]: Link did not have a status code of 200, using python64 generation method")
+                eAhex = s.token_hex(32)
+                eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+                    random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+                eAlink = BABEL_URL + "/book.cgi?" + eAloc
+                print(eAlink)
+                return eAlink
+        else:
+            keyrequrl = BABEL_URL + "/book.cgi?" + keyparam
+            if key_fetcher().check(keyrequrl):
+                print("Success")
+                return keyrequrl
+            else:
+                print("Error [II.L3]: Link did not have a status code of 200, using python64 generation method")
+                eAhex = s.token_hex(32)
+                eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+                    random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+                eAlink = BABEL_URL + "/book.cgi?" + eAloc
+                print(eAlink)
+                return eAlink
+    elif gentype == "file":
+        print("WARNING: If you use a non-Apocrypha text file, it may not be as secure.")
+        return None
+    elif gentype == "msg":
+        eAkey = input("eA_key = ") + ".msg"
+        return eAkey
+    else:
+        print("Error [II.N2]: Invalid input, generating python64 location")
+        eAhex = s.token_hex(32)
+        eAloc = eAhex + "-w" + str(random.randint(1, 4)) + "-s" + str(random.randint(1, 5)) + "-v" + str(
+            random.randint(1, 32)) + ":" + str(random.randint(1, 410))
+        eAlink = BABEL_URL + "/book.cgi?" + eAloc
+        print(eAlink)
+        return eAlink
+
+
+def Aencode2(config: Config, key: str or KeySource or None) -> None:
+    """
+    Given a key of either a valid link, custom key, or a NoneType, processes to encrypt and print the output.
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param key: str, KeySource, or None; str is indicative of a valid link or custom key, KeySource of a local book
+        made in memory by load_key, None is indicative of a file being used
+    """
+    if isinstance(key, KeySource):
+        fileloc = ''
+    elif key is not None and key[-4:] not in [".txt", ".msg"] and key[-5:] not in [".json", ".apoc"]:
+        fileloc = download_key(key, "II.H1", config)
+        if fileloc is None:
+            print("The link to the key will now open, when you have downloaded the file, press enter")
+            try:
+                import webbrowser
+                webbrowser.open(key)
+            except:
+                print("Error [II.W1]: unable to open the key link in a web browser, please open manually. Link: " + key)
+            fileloc = input("eA_filepath = ")
+    elif key is not None:
+        if key[-4:] in [".txt", ".msg"] or key[-5:] in [".json", ".apoc"]:
+            fileloc = key
+        else:
+            fileloc = ''
+    else:
+        fileloc = input("eA_filepath = ")
+        key = fileloc
+    if isinstance(key, KeySource) or (Path(fileloc).exists() and fileloc != '') or key[-4:] == ".msg":
+        if isinstance(key, KeySource) or fileloc[-4:] in [".txt", ".msg"] or fileloc[-5:] in [".json", ".apoc"]:
+            pass
+        else:
+            print("Error [II.F1]: File must be a .txt, .json, or .apoc file\nNOTE: Only .txt is supported currently.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Aencode2(config, None)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+        message = input("Message: ")
+        if isinstance(key, KeySource):
+            source = key
+        elif key is not None and key[-4:] == ".msg":
+            source = KeySource("msg", key[:-4])
+        else:
+            source = KeySource("file", fileloc)
+        t0 = time.time()
+        try:
+            ciphertext = encrypt(message, source, config)
+        except KeySourceError as e:
+            print(e)
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Aencode2(config, input("eA_key = ") + ".msg" if e.code == "II.K1" else None)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+        except ApocError as e:
+            print(e)
+            try:
+                if input("Retry with a new key (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Aencode2(config, None)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+        except:
+            print("Error [II.E3]: Couldn't encrypt message. Character not found in key.")
+            try:
+                if input("Retry with a new key (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Aencode2(config, None)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+        t1 = time.time()
+        print("\nTime: ", t1 - t0)
+        if config.output == ".apoc":
+            default = ciphertext.keyhash.replace(MERKLE_PREFIX, "", 1)[:16] + ".apoc"  # ':' can't be in Windows names
+            outpath = input("eA_outpath (default: " + default + ") = ").strip()
+            if outpath == "":
+                outpath = default
+            try:
+                with open(outpath, 'wb') as file:
+                    file.write(ciphertext.to_apoc())
+                print("\nEncrypted Message written to: " + outpath)
+            except OSError:
+                print("Error [II.O1]: Couldn't write the encrypted message to " + outpath)
+                print("\nEncrypted Message:\n")
+                print(ciphertext)
+        else:
+            print("\nEncrypted Message:\n")
+            print(ciphertext)
+        if _METRICS is not None:
+            _METRICS.write()
+        pause("\nPress enter when done: ")
+        os._exit(0)
+    else:
+        print("Error [II.P1]: Incorrect filepath.")
+        try:
+            if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                Aencode2(config, None)
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+
+
+"""
+IDEAS:
+Future iterations of encrypting characters not found in the key could perhaps implement primes in calculations?
+
+Add config option to allow for more input methods, such as reading files as an input message, etc.
+
+Reorder so the unhandled/unused characters are used first so only one [m.start()] list comp. is executed.
+Increases efficiency, and very well could fix some of the oddities below. UPDATE: Above comment works best in theory,
+still best to attempt to only use one instance of list comprehension per character to increase efficiency.
+"""
+
+'''Concept List:
+  1. Get the user to DL the .txt file of the book [X]
+  2. Have the user input the file location of the .txt file under a drive [X]
+  3. Check to see if the file location is correct, if not, close the program [X]
+  4. Create a list from the message via iter each ch and choose a random index of given ch, then remove. [X]
+  5. Create hashes of the final key to validate encryption [X]
+  6. Rework the decryption method to function again [X]
+  7. If a hash does not exist with the message, work around to decode anyways [X]
+  8. Ensure the file going to be opened is a .txt file [X]
+  9. Prevent build if file length is shorter than the message to be encrypted [X]
+  10. Clean up python gentype with any length of token [X]
+  11. Add recursion functionality to retry failed/errored out parts of the program [X]
+  12. Clean up the code base [while True: WIP]
+  13. Create different versions of this program with certain restrictions [[Trashed, Admin vs Stable]]
+    a. Public Dist: Require a hash that matches after decryption to display message [T]
+    b. Private Dist: Only show final hash of the key and given, if not matching, display hashes, not the message [T]
+    c. Admin Dist: Latest developer version, no restrictions, updated first for new features [X]
+    d. Stable Dist: Current proven version with bug testing and absent of major errors [X]
+  14. Create failsafe if ch is not found, end program, prompt for retry with a new key [X]
+  15. Create administrative documentation and changelog for posterity [while True: WIP]
+  16. Implement a function which simply uses any key to securely use with current method [X]
+  17. Implement changing of unused characters in key for any character accepted as valid [X]
+  18. Rework <C> option for <A_func> prompt for current config handling not being persistent [X]
+  19. Implement whole base program command line functionality [WIP]
+        Flag: [-rf <filepath>] with file with command line arguments on each line, see batch_main. [X]
+  20. Introduce dynamic hashing of key to increase size as necessary [X]
+  21. Rewrite for Apocrypha 2.0 to implement complete command line functionality [ ]
+  ??. Implement custom config path persistence securely [ ]
+  99. Create a new version which simply uses any key to securely use with no fail state. (Similar to AES) [ ]
+'''
+
+
+def tokenize_message(encryptedmessage: str) -> tuple:
+    """
+    Turns a printed encrypted message, such as "[[12, -40, 9894, 7], '<sha256>']", into its locations in one scan.
+    Negative locations are kept as is and followed by their product, exactly as Aencode2 writes them.
+    :param encryptedmessage: Str; Encrypted message as printed by Aencode2, with or without the trailing key hash
+    :return: Tuple; (List of integer locations, Str message key hash or None if the message has no key hash)
+    """
+    locations = []
+    msgkeyhash = None
+    for m in _MESSAGE_TOKEN.finditer(encryptedmessage):
+        if m.group(1) is not None:
+            msgkeyhash = m.group(1)
+        else:
+            locations.append(int(m.group(2)))
+    return locations, msgkeyhash
+
+
+def pack_message(locations: list, keyhash: str or None) -> bytes:
+    """
+    Packs an encrypted message into the binary .apoc container.
+
+    Layout: b"APOC", format version (1 byte), hash algorithm id from APOC_HASHES (1 byte), hash length (1 byte),
+    the raw key hash bytes, then the count of locations followed by every location, each as a zigzag varint.
+    :param locations: List; Integer locations as produced by Aencode2, fallback pairs included
+    :param keyhash: Str or None; Final key hash, hex sha256 or a 'merkle' key hash, None to leave the message unhashed
+    :return: Bytes; The .apoc file contents
+    """
+    out = bytearray(APOC_MAGIC)
+    if keyhash is None:
+        out += bytes((APOC_VERSION, 0, 0))
+    elif keyhash[:len(MERKLE_PREFIX)] == MERKLE_PREFIX:
+        digest = bytes.fromhex(keyhash[len(MERKLE_PREFIX):])
+        out += bytes((APOC_VERSION, 2, len(digest)))
+        out += digest
+    else:
+        digest = bytes.fromhex(keyhash)
+        out += bytes((APOC_VERSION, 1, len(digest)))
+        out += digest
+    for value in [len(locations)] + locations:
+        value = (value << 1) if value >= 0 else ((-value) << 1) - 1  # Zigzag, keeps small negatives small
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def unpack_message(data: bytes) -> tuple:
+    """
+    Reads a binary .apoc container written by pack_message. The data is only ever walked through a memoryview.
+    :param data: Bytes-like; The .apoc file contents
+    :return: Tuple; (List of integer locations, Str message key hash or None if the message has no key hash)
+    """
+    view = memoryview(data)
+    if len(view) < 7 or view[:4] != APOC_MAGIC:
+        raise ValueError("Not an .apoc file")
+    if view[4] != APOC_VERSION or view[5] not in APOC_HASHES:
+        raise ValueError("Unsupported .apoc version or hash algorithm")
+    pos = 7 + view[6]
+    msgkeyhash = view[7:pos].hex() if view[5] != 0 else None
+    if view[5] == 2:
+        msgkeyhash = MERKLE_PREFIX + msgkeyhash
+    values = []
+    value = shift = 0
+    for byte in view[pos:]:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append((value >> 1) if not value & 1 else -((value + 1) >> 1))
+            value = shift = 0
+    if shift or not values or values[0] < 0 or values[0] != len(values) - 1:
+        raise ValueError("Truncated .apoc file")
+    return values[1:], msgkeyhash
+
+
+def tokenize_segments(encryptedmessage: str) -> tuple:
+    """
+    Turns a printed segmented message into the locations and key hash of each segment, see SegmentedCiphertext.
+    :param encryptedmessage: Str; Segmented message as printed
+    :return: Tuple; (PosInteger segment size, List of (List of integer locations, Str key hash) per segment), raises
+        ValueError if it isn't a segmented message or a segment has no key hash
+    """
+    tokens = _MESSAGE_TOKEN.finditer(encryptedmessage)
+    tag, size = next(tokens, None), next(tokens, None)
+    if tag is None or tag.group(1) != SEGMENTED_TAG or size is None or size.group(2) is None or int(size.group(2)) < 1:
+        raise ValueError("Not a segmented message")
+    segments = []
+    locations = []
+    for m in tokens:
+        if m.group(1) is not None:
+            segments.append((locations, m.group(1)))
+            locations = []
+        else:
+            locations.append(int(m.group(2)))
+    if locations or not segments:
+        raise ValueError("Segment without a key hash")
+    return int(size.group(2)), segments
+
+
+def pack_segments(size: int, segments: list) -> bytes:
+    """
+    Packs a segmented message into a segmented .apoc container.
+
+    Layout: b"APOC", APOC_SEGMENTED (1 byte), then as zigzag varints the segment size, the number of segments, and
+    the byte length of each segment, the segment table, followed by every segment as a whole .apoc file of its own
+    (see pack_message). The table lets each segment be sliced out without reading the ones before it.
+    :param size: PosInteger; Message characters in each segment
+    :param segments: List; (List of integer locations, Str key hash) of each segment
+    :return: Bytes; The .apoc file contents
+    """
+    packed = [pack_message(locations, keyhash) for locations, keyhash in segments]
+    out = bytearray(APOC_MAGIC)
+    out.append(APOC_SEGMENTED)
+    for value in [size, len(packed)] + [len(segment) for segment in packed]:
+        value <<= 1  # Zigzag of a non-negative value, as pack_message writes them
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+    for segment in packed:
+        out += segment
+    return bytes(out)
+
+
+def unpack_segments(data: bytes) -> tuple:
+    """
+    Reads a segmented .apoc container written by pack_segments.
+    :param data: Bytes-like; The .apoc file contents
+    :return: Tuple; (PosInteger segment size, List of (List of integer locations, Str key hash or None) per segment)
+    """
+    view = memoryview(data)
+    if not is_segmented(view):
+        raise ValueError("Not a segmented .apoc file")
+    values = []
+    pos = 5
+    value = shift = 0
+    while len(values) < 2 or len(values) < 2 + values[1]:  # The segment size, count, then the table
+        if pos == len(view):
+            raise ValueError("Truncated segment table")
+        byte = view[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value >> 1)
+            value = shift = 0
+    if values[0] < 1 or values[1] < 1 or pos + sum(values[2:]) != len(view):
+        raise ValueError("Truncated .apoc file")
+    segments = []
+    for length in values[2:]:
+        segments.append(unpack_message(view[pos:pos + length]))
+        pos += length
+    return values[0], segments
+
+
+def Adecode2(config: Config, fileloc: str or KeySource) -> None:
+    """
+    Given a valid file location or custom key, prompts for an encrypted message to decrypt and print the results.
+    :param config: Config obj; Config object which allows for config options to be utilized.
+    :param fileloc: Str or KeySource; valid Path where the file is a .txt file or a custom key passed through with
+        appended '.msg', or the KeySource of a local book made in memory by load_key
+    :return: None; Final function using the Adecode1 helper function, prints to console.
+    """
+    try:
+        if isinstance(fileloc, KeySource) or fileloc[-5:] in [".apoc", ".json"] or fileloc[-4:] in [".txt", ".msg"]:
+            if not isinstance(fileloc, KeySource) and fileloc[-4:] not in [".txt", ".msg", "apoc", "json"]:
+                print("Error [III.F1]: File must be a .txt, .apoc, or .json file"
+                      "NOTE: Only .txt files are supported as of now")
+                try:
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode2(config, Adecode1(config))
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+            if fileloc is None:
+                try:
+                    print("Error [III.F2]: NoneType passed for fileloc.")
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode2(config, input("dA_key = ") + ".msg")
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+            elif fileloc == ".msg":
+                try:
+                    print("Error [III.K1]: Invalid key. Likely blank key entered.")
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode2(config, input("dA_key = ") + ".msg")
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+            encryptedmessage = input("dA_eM: ")
+            try:
+                if encryptedmessage.strip()[-5:] == ".apoc" and Path(encryptedmessage.strip()).exists():
+                    with open(encryptedmessage.strip(), 'rb') as file:
+                        ciphertext = file.read()
+                else:
+                    ciphertext = encryptedmessage
+                plaintext = decrypt(ciphertext, KeySource.parse(fileloc), config)
+            except MessageFormatError as e:
+                print(e)
+                try:
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode2(config, fileloc)
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+            except ApocError as e:
+                print(e)
+                try:
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode2(config, Adecode1(config))
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+            for code in plaintext.warnings:
+                print("Error [" + code + "]: Could not resolve character not found in key")
+            print("Decrypted Message:\n")
+            print(plaintext.message)
+            if plaintext.message_key_hash is None:
+                print("\nKey Hash Match: Unknown, missing message hash.")
+                print("\nCurrent Final Key Hash: " + plaintext.final_key_hash)
+            else:
+                if not plaintext.key_hash_match:
+                    print("\nWARNING: Key Hash Matching Fail. Message is likely incorrect.")
+                    if plaintext.segments is not None:
+                        print("Mismatched Segments: " + ", ".join(str(i) for i in plaintext.mismatched_segments))
+                print("\nKey Hash Match: " + str(plaintext.key_hash_match))
+                print("\nMessage Final Key Hash: " + plaintext.message_key_hash)
+                print("Current Final Key Hash: " + plaintext.final_key_hash)
+            print("Start Initial Key Hash: " + plaintext.initial_key_hash)
+            if _METRICS is not None:
+                _METRICS.write()
+            pause("\nPress enter to close the program.")
+            os._exit(0)
+        else:
+            print("Error [III.F2]: Incorrect file type.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Adecode2(config, Adecode1(config))
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+    except:
+        print("Error [III.U1]: Unexpected error. Likely NoneType given for file location")
+        try:
+            if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                Adecode1(config)
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+
+
+def Adecode1(config: Config) -> str or KeySource:
+    """
+    Helper function which starts the decryption process and prompts the user to return the path
+    of a valid file path (.txt required in Adecode2) or input a custom key.
+    :param config: Config obj; Config object which allows for config options to be utilized.
+    :return: Str or KeySource; File path or key with appended '.msg' string to be processed by Adecode2, or the
+        KeySource of a local book location
+    """
+    keyformat = input("dA_k.format[<link{full;param};local;file;msg>]: ").lower().strip()
+    if keyformat == "linkparam":
+        locreq = input("dA_param = ")
+        if locreq[0] == '?':
+            baseurl = BABEL_URL + "/book.cgi"
+            print(baseurl + locreq)
+            fileloc = stored_key(config, baseurl + locreq)
+            if fileloc is not None:
+                return fileloc
+            if key_fetcher().check(baseurl + locreq):
+                fileloc = download_key(baseurl + locreq, "III.H1", config)
+                if fileloc is not None:
+                    return fileloc
+                print("Download the key file. It will open momentarily.")
+                time.sleep(1)
+                try:
+                    import webbrowser
+                    webbrowser.open(baseurl + locreq)
+                except:
+                    print("Error [III.W1]: Failed to open key link, please open manually. Link: " + baseurl + locreq)
+                fileloc = input("dA_filepath = ")
+                return fileloc
+            else:
+                print("Error [III.L1]: Link did not have a status code of 200.")
+                try:
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode1(config)
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+        else:
+            baseurl = BABEL_URL + "/book.cgi?"
+            print(baseurl + locreq)
+            fileloc = stored_key(config, baseurl + locreq)
+            if fileloc is not None:
+                return fileloc
+            if key_fetcher().check(baseurl + locreq):
+                fileloc = download_key(baseurl + locreq, "III.H1", config)
+                if fileloc is not None:
+                    return fileloc
+                print("Download the key file. It will open momentarily.")
+                time.sleep(1)
+                try:
+                    import webbrowser
+                    webbrowser.open(baseurl + locreq)
+                except:
+                    print("Error [III.W2]: Failed to open key link, please open manually. Link: " + baseurl + locreq)
+                fileloc = input("dA_filepath = ")
+                return fileloc
+            else:
+                print("Error [III.L2]: Link did not have a status code of 200.")
+                try:
+                    if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                        Adecode1(config)
+                    else:
+                        os._exit(0)
+                except IndexError:
+                    os._exit(0)
+    elif keyformat == "linkfull":
+        locreq = input("dA_loc = ")
+        print(locreq)
+        fileloc = stored_key(config, locreq)
+        if fileloc is not None:
+            return fileloc
+        if key_fetcher().check(locreq):
+            fileloc = download_key(locreq, "III.H1", config)
+            if fileloc is not None:
+                return fileloc
+            print("Download the key file. It will open momentarily.")
+            time.sleep(1)
+            try:
+                import webbrowser
+                webbrowser.open(locreq)
+            except:
+                print("Error [III.W3]: Failed to open key link, please open manually. Link: " + locreq)
+            fileloc = input("dA_filepath = ")
+            return fileloc
+        else:
+            print("Error [III.L3]: Link did not have a status code of 200.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    Adecode1(config)
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+    elif keyformat == "local":
+        return KeySource("local", input("dA_loc = "))
+    elif keyformat == "file":
+        fileloc = input("dA_filepath = ")
+        return fileloc
+    elif keyformat == "msg":
+        fileloc = input("dA_key = ") + ".msg"
+        return fileloc
+    else:
+        print("Error [III.N1]: Invalid Option.")
+        try:
+            if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                Adecode1(config)
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+
+
+def parse_job(line: str) -> dict:
+    """
+    Reads one line of a job file, either a JSON object or the command line order of arguments:
+    '<E;D> <file;msg;local;link> <key/filepath> <message>', where the message is the rest of the line.
+    :param line: Str; Line of the job file without its newline
+    :return: Dict; Job with 'op', 'keytype' (see KeySource), 'key', and 'message', plus 'id' and 'out' if given as JSON
+    """
+    if line.lstrip()[:1] == "{":
+        try:
+            job = json.loads(line)
+        except ValueError:
+            raise MessageFormatError("IV.B1", "Invalid job. Line is not a valid JSON object.")
+    else:
+        fields = line.split(None, 3)
+        if len(fields) < 4:
+            raise MessageFormatError("IV.B1", "Invalid job. Expected '<E;D> <file;msg;local;link> <key/filepath> "
+                                              "<message>'.")
+        job = {'op': fields[0], 'keytype': fields[1], 'key': fields[2], 'message': fields[3]}
+    if not isinstance(job, dict) or str(job.get('op', '')).lower()[:1] not in ["e", "d"] or \
+            str(job.get('keytype', 'file')).lower() not in KeySource.KINDS or \
+            not isinstance(job.get('key'), str) or not isinstance(job.get('message'), str):
+        raise MessageFormatError("IV.B1", "Invalid job. Needs an 'op' of E or D, a 'keytype' of file, msg, local, "
+                                          "or link, a 'key', and a 'message'.")
+    job['op'] = str(job['op']).lower()[0]
+    job['keytype'] = str(job.get('keytype', 'file')).lower()
+    return job
+
+
+def batch_bulk(config: Config, keys: dict, jobs: list) -> dict:
+    """
+    Encrypts ahead of time, with encrypt_many, the messages of every key file used by at least BULK_MESSAGES
+    encryption jobs of a batch.
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param keys: Dict; Keys loaded so far in the batch, see load_key
+    :param jobs: List; (line number, job from parse_job or the ApocError the line failed with) per job
+    :return: Dict; Line number -> Ciphertext or ApocError, for each job encrypted ahead of time
+    """
+    groups = {}
+    for lineno, job in jobs:
+        if isinstance(job, dict) and job['op'] == "e" and job['keytype'] == "file":
+            groups.setdefault(job['key'], []).append((lineno, job['message']))
+    encrypted = {}
+    for key, group in groups.items():
+        if len(group) < BULK_MESSAGES:
+            continue
+        try:
+            entry = load_key(KeySource("file", key), config, keys)
+        except ApocError:
+            continue  # Left for run_job to record against every job using the key
+        strfile = key_index(entry, True)
+        tree = key_tree(entry) if config.key_hash == "merkle" else None
+        for (lineno, _), outcome in zip(group, encrypt_many(strfile, [message for _, message in group], tree=tree)):
+            encrypted[lineno] = outcome if isinstance(outcome, ApocError) else Ciphertext(*outcome)
+        save_key_index(entry)
+    return encrypted
+
+
+def run_job(config: Config, keys: dict, job: dict, encrypted: Ciphertext or ApocError = None) -> dict:
+    """
+    Encrypts or decrypts the message of a single batch job with encrypt or decrypt.
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param keys: Dict; Keys loaded so far in the batch, see load_key
+    :param job: Dict; Job as returned by parse_job
+    :param encrypted: Ciphertext or ApocError; Optional, outcome of encrypting the message ahead of time, see batch_bulk
+    :return: Dict; Result of the job, raises ApocError if the job fails
+    """
+    source = KeySource(job['keytype'], job['key'])
+    if job['op'] == "e":
+        if encrypted is None:
+            encrypted = encrypt(job['message'], source, config, keys)
+        if isinstance(encrypted, ApocError):
+            raise encrypted
+        if job.get('out'):
+            try:
+                with open(job['out'], 'wb') as file:
+                    file.write(encrypted.to_apoc())
+            except OSError:
+                raise ApocError("II.O1", "Couldn't write the encrypted message to " + str(job['out']))
+            return {'op': "e", 'out': job['out'], 'final_key_hash': encrypted.keyhash}
+        return {'op': "e", 'encrypted': str(encrypted), 'final_key_hash': encrypted.keyhash}
+    ciphertext = job['message'].strip()
+    if ciphertext[-5:] == ".apoc":
+        try:
+            with open(ciphertext, 'rb') as file:
+                ciphertext = file.read()
+        except OSError:
+            raise MessageFormatError("III.A1", "Invalid .apoc file, it may be damaged or from a newer version.")
+    plaintext = decrypt(ciphertext, source, config, keys)
+    return {'op': "d", 'message': plaintext.message, 'key_hash_match': plaintext.key_hash_match,
+            'final_key_hash': plaintext.final_key_hash, 'warnings': plaintext.warnings}
+
+
+def job_record(config: Config, keys: dict, job: dict or ApocError, encrypted: Ciphertext or ApocError = None) -> dict:
+    """
+    Runs a single job with run_job, recording its failure rather than raising it.
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param keys: Dict; Keys loaded so far, see load_key
+    :param job: Dict or ApocError; Job as returned by parse_job, or the ApocError parse_job raised for it
+    :param encrypted: Ciphertext or ApocError; Optional, outcome of encrypting the message ahead of time, see batch_bulk
+    :return: Dict; 'ok' and the result of the job, or 'ok', 'error' code, and 'detail' of its failure
+    """
+    record = {}
+    try:
+        if isinstance(job, ApocError):
+            raise job
+        if 'id' in job:
+            record['id'] = job['id']
+        result = run_job(config, keys, job, encrypted)
+        record['ok'] = True
+        record.update(result)
+    except ApocError as e:
+        record.update({'ok': False, 'error': e.code, 'detail': str(e)})
+    except Exception as e:
+        record.update({'ok': False, 'error': "IV.B3",
+                       'detail': "Error [IV.B3]: Unexpected error running job. " + type(e).__name__})
+    return record
+
+
+def batch_main(config: Config, jobfile: str) -> str or None:
+    """
+    Runs every job of a job file, one job per line, see parse_job. Blank lines and lines starting with '#' are skipped.
+    Jobs sharing a key only load it once, many encryptions with the same key file are spread over a pool of processes
+    (see batch_bulk), and a job which fails is recorded in the results file with its error code rather than ending
+    the batch.
+    :param config: Config obj; Config object which allows for config options to be utilized
+    :param jobfile: Str; Path of the job file
+    :return: Str or None; Path of the results file, '<job file name>_results.jsonl' next to the job file
+    """
+    jobpath = Path(jobfile.strip())
+    if not jobpath.is_file():
+        print("Error [IV.B4]: Job file not found.")
+        try:
+            if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                return batch_main(config, input("mA_filepath = "))
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+    resultpath = jobpath.with_name(jobpath.stem + "_results.jsonl")
+    keys = {}
+    jobs = []
+    total = failed = 0
+    t0 = time.time()
+    try:
+        with open(jobpath, encoding='utf-8') as file:
+            for lineno, line in enumerate(file, 1):
+                line = line.rstrip("\r\n")
+                if line.strip() == "" or line.lstrip()[0] == "#":
+                    continue
+                try:
+                    jobs.append((lineno, parse_job(line)))
+                except ApocError as e:
+                    jobs.append((lineno, e))
+        encrypted = batch_bulk(config, keys, jobs)
+        with open(resultpath, 'w', encoding='utf-8') as results:
+            for lineno, job in jobs:
+                record = {'line': lineno}
+                record.update(job_record(config, keys, job, encrypted.get(lineno)))
+                results.write(json.dumps(record) + "\n")
+                total += 1
+                failed += not record['ok']
+    except OSError:
+        print("Error [IV.B5]: Couldn't write the results file " + str(resultpath))
+        return None
+    print("\nTime: ", time.time() - t0)
+    print("Jobs: " + str(total) + ", Failed: " + str(failed))
+    print("Results written to: " + str(resultpath))
+    if _METRICS is not None:
+        _METRICS.write()
+    return str(resultpath)
+
+
+def daemon_address(address: str) -> tuple:
+    """
+    :param address: Str; Unix socket path, or 'host:port' of a TCP port on this machine
+    :return: Tuple; (Str socket path, None) or (Str host, Integer port), raises ApocError V.D2 for a host that isn't
+        a loopback address
+    """
+    match = re.fullmatch(r"\[?([^\[\]/]+?)]?:(\d{1,5})", address.strip())
+    if match is None:
+        return address, None
+    host = match.group(1)
+    if host != "localhost" and host != "::1" and not host.startswith("127."):
+        raise ApocError("V.D2", "The daemon only listens on this machine, use localhost, 127.0.0.1, or ::1.")
+    return host, int(match.group(2))
+
+
+class DaemonHandler:
+    """
+    One connection to a daemon. Requests are read one per line, either a job (see parse_job) or one of the commands
+    'ping', 'stats', 'metrics', 'metrics prom', and 'shutdown', and each is answered with one line of JSON before the
+    next is read. Served mixed into socketserver.StreamRequestHandler by ApocDaemon.serve, so that socketserver is only
+    imported by a daemon. Over TCP, the first line must be the daemon's token (see ApocDaemon.token), a connection
+    sending anything else is answered with V.D6 and closed.
+    """
+    timeout = DAEMON_IDLE
+
+    def handle(self) -> None:
+        daemon = self.server.apoc
+        if not daemon.track(self.connection, True):
+            return
+        try:
+            if daemon.token is not None:
+                import hmac
+                if not hmac.compare_digest(self.rfile.readline().strip(), daemon.token.encode('ascii')):
+                    error = ApocError("V.D6", "The daemon refused the connection, its token is missing or wrong.")
+                    self.wfile.write((json.dumps({'ok': False, 'error': error.code, 'detail': str(error)}) +
+                                      "\n").encode('utf-8'))
+                    return
+            for line in self.rfile:
+                line = line.decode('utf-8', 'replace').rstrip("\r\n")
+                if line.strip() == "":
+                    continue
+                self.wfile.write((json.dumps(daemon.respond(line)) + "\n").encode('utf-8'))
+                self.wfile.flush()
+        except OSError:  # Idle past DAEMON_IDLE, or the client went away
+            pass
+        finally:
+            daemon.track(self.connection, False)
+
+
+class ApocDaemon:
+    """
+    Long-running server of encryption and decryption requests. Keys it has loaded, and the indexes made of them (see
+    load_key and key_index), are kept for as long as it runs, so requests with a key it has already seen skip reading,
+    stripping, and indexing it again. A key file changed since it was loaded is loaded again.
+
+    Only the user running the daemon can connect: a Unix socket is made readable and writable by that user alone, and
+    a TCP port, which any user of the machine can connect to, asks for a token first. The token is made anew by every
+    TCP daemon and written to token_file, which only that user can read.
+
+    config: Config the requests are run with.
+    address: Unix socket path, or 'host:port' of a loopback TCP port, see daemon_address.
+    max_jobs: requests run at once, further requests wait for one to finish.
+    max_keys: keys kept loaded before the least recently loaded are dropped.
+    token_file: file the token of a TCP daemon is written to, see daemon_request.
+    token: hex token TCP connections must send first, None for a Unix socket.
+    """
+    def __init__(self, config: Config, address: str = DAEMON_ADDRESS, max_jobs: int = DAEMON_JOBS,
+                 max_keys: int = DAEMON_KEYS, token_file: str = DAEMON_TOKEN):
+        self.config = config
+        self.address = address
+        self.max_jobs = max_jobs
+        self.max_keys = max_keys
+        self.token_file = token_file
+        self.token = None
+        self.keys = {}
+        self.stamps = {}  # key file -> (size, mtime) when it was last used
+        self.slots = threading.BoundedSemaphore(max_jobs)
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.closing = False
+        self.running = self.served = self.failed = 0
+        self.started = time.time()
+        self.server = None
+
+    def track(self, connection: "socket.socket", opened: bool) -> bool:
+        """
+        :param connection: Socket; Connection of a DaemonHandler
+        :param opened: Bool; Whether the connection was opened or closed
+        :return: Bool; False if the connection was opened while shutting down and should be closed
+        """
+        with self.lock:
+            if not opened:
+                self.connections.discard(connection)
+                return True
+            if self.closing:
+                return False
+            self.connections.add(connection)
+            return True
+
+    def refresh(self, job: dict) -> None:
+        """
+        Drops a loaded key file which has changed on disk since it was last used.
+        :param job: Dict; Job as returned by parse_job
+        """
+        if job['keytype'] != "file":
+            return
+        try:
+            stat = os.stat(job['key'])
+        except OSError:
+            return
+        stamp = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if self.stamps.get(job['key'], stamp) != stamp:
+                self.keys.pop(("file", job['key'], None), None)
+            self.stamps[job['key']] = stamp
+
+    def respond(self, line: str) -> dict:
+        """
+        :param line: Str; Request without its newline
+        :return: Dict; Answer, a job is answered as in the results file of a batch, see job_record
+        """
+        command = line.strip().lower()
+        if command == "ping":
+            return {'ok': True, 'op': "ping"}
+        if command == "stats":
+            return dict({'ok': True, 'op': "stats"}, **self.stats())
+        if command == "shutdown":
+            threading.Thread(target=self.shutdown).start()
+            return {'ok': True, 'op': "shutdown"}
+        if command in ["metrics", "metrics prom"]:
+            if _METRICS is None:
+                return {'ok': False, 'error': "V.D5", 'detail': "Error [V.D5]: Metrics are disabled, start the daemon "
+                                                                "with APOCRYPHA_METRICS set."}
+            if command == "metrics prom":
+                return {'ok': True, 'op': "metrics", 'prometheus': _METRICS.to_prometheus()}
+            return dict({'ok': True, 'op': "metrics"}, **_METRICS.as_dict())
+        try:
+            job = parse_job(line)
+        except ApocError as e:
+            job = e
+        with self.slots:
+            with self.lock:
+                self.running += 1
+            if isinstance(job, dict):
+                self.refresh(job)
+            record = job_record(self.config, self.keys, job)
+        with self.lock:
+            self.running -= 1
+            self.served += 1
+            self.failed += not record['ok']
+            while len(self.keys) > self.max_keys:
+                self.keys.pop(list(self.keys)[0])
+        return record
+
+    def stats(self) -> dict:
+        """
+        :return: Dict; Seconds running, requests running and served, failed requests, and keys loaded
+        """
+        with self.lock:
+            return {'uptime': round(time.time() - self.started, 3), 'running': self.running, 'served': self.served,
+                    'failed': self.failed, 'keys': len(self.keys), 'max_jobs': self.max_jobs}
+
+    def serve(self) -> None:
+        """
+        Serves requests until shutdown is called, by a 'shutdown' request, SIGINT, or SIGTERM. Raises ApocError V.D1 if
+        the address can't be listened on, such as when another daemon is already using it.
+        """
+        import signal
+        import socketserver
+
+        class Handler(DaemonHandler, socketserver.StreamRequestHandler):
+            pass
+
+        class TCPServer(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+
+        host, port = daemon_address(self.address)
+        try:
+            if port is None:
+                if Path(host).exists():
+                    try:
+                        daemon_request("ping", self.address, 1)
+                        raise ApocError("V.D1", "A daemon is already running at " + self.address)
+                    except OSError:
+                        os.remove(host)  # Left behind by a daemon which didn't shut down
+                umask = os.umask(0o077)  # Only the user running the daemon can connect
+                try:
+                    self.server = socketserver.ThreadingUnixStreamServer(host, Handler)
+                finally:
+                    os.umask(umask)
+            else:
+                self.server = TCPServer((host, port), Handler)
+                import secrets
+                self.token = secrets.token_hex(32)
+                tokenfd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(tokenfd, 'w') as file:
+                    if os.name == "posix":
+                        os.fchmod(tokenfd, 0o600)  # Also when the file was already there
+                    file.write(self.token + "\n")
+        except OSError as e:
+            raise ApocError("V.D1", "Couldn't listen at " + self.address + ". " + str(e))
+        self.server.apoc = self
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda signum, frame: threading.Thread(target=self.shutdown).start())
+        print("Apocrypha daemon listening at " + self.address)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()  # Waits for the requests still running
+            try:
+                os.remove(host if port is None else self.token_file)
+            except OSError:
+                pass
+            print("Apocrypha daemon stopped, requests served: " + str(self.served))
+            if _METRICS is not None:
+                _METRICS.write()
+
+    def shutdown(self) -> None:
+        """
+        Stops accepting connections, lets the requests already running finish and be answered, then closes every
+        connection.
+        """
+        import socket
+        with self.lock:
+            self.closing = True
+            connections = list(self.connections)
+        if self.server is not None:
+            self.server.shutdown()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RD)  # Ends the handler's wait for its next request
+            except OSError:
+                pass
+
+
+def daemon_request(request, address: str = DAEMON_ADDRESS, timeout: float = None,
+                   token_file: str = DAEMON_TOKEN) -> dict:
+    """
+    Sends one request to a running daemon, raises OSError if there's no daemon at the address.
+    :param request: Str or Dict; Command ('ping', 'stats', 'metrics', 'metrics prom', or 'shutdown'), or a job as
+        taken by parse_job
+    :param address: Str; Address of the daemon, see daemon_address
+    :param timeout: Float; Optional, seconds to wait for the daemon
+    :param token_file: Str; File holding the token of a TCP daemon, see ApocDaemon, raises ApocError V.D6 if it can't
+        be read
+    :return: Dict; The daemon's answer
+    """
+    import socket
+    host, port = daemon_address(address)
+    token = None
+    if port is not None:
+        try:
+            token = Path(token_file).read_text().strip()
+        except OSError:
+            raise ApocError("V.D6", "Couldn't read the daemon token from " + token_file + ", is the daemon running "
+                                    "as this user?")
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(host)
+        except OSError:
+            sock.close()
+            raise
+    else:
+        sock = socket.create_connection((host, port), timeout)
+    line = json.dumps(request) if isinstance(request, dict) else request.replace("\n", " ")
+    with sock, sock.makefile('rwb') as stream:
+        stream.write(((token + "\n" if token is not None else "") + line + "\n").encode('utf-8'))
+        stream.flush()
+        answer = stream.readline()
+    if not answer:
+        raise ConnectionError("The daemon closed the connection without answering.")
+    return json.loads(answer)
+
+
+def serve_main(argvs: list) -> None:
+    """
+    Runs a daemon, see ApocDaemon.
+    :param argvs: List; Command line arguments after 'serve': [-a ADDRESS] [-j JOBS]
+    """
+    address = argvs[argvs.index("-a") + 1] if "-a" in argvs[:-1] else DAEMON_ADDRESS
+    try:
+        jobs = int(argvs[argvs.index("-j") + 1]) if "-j" in argvs[:-1] else DAEMON_JOBS
+        if jobs < 1:
+            raise ValueError
+    except ValueError:
+        print("Error [V.D4]: -j must be followed by a positive whole number of jobs.")
+        sys.exit(exit_status("V.D4"))
+    try:
+        ApocDaemon(config_handler(), address, jobs).serve()
+    except ApocError as e:
+        print(e)
+        sys.exit(exit_status(e.code))
+
+
+def client_main(argvs: list) -> None:
+    """
+    Sends one request to a running daemon and prints its answer.
+    :param argvs: List; Command line arguments after 'client':
+        [-a ADDRESS] <ping;stats;metrics [prom];shutdown>
+        or [-a ADDRESS] <E;D> <file;msg;local;link> <key/filepath> <message>
+    """
+    address = DAEMON_ADDRESS
+    if "-a" in argvs[:-1]:
+        address = argvs[argvs.index("-a") + 1]
+        argvs = argvs[:argvs.index("-a")] + argvs[argvs.index("-a") + 2:]
+    if " ".join(argvs).lower() in ["ping", "stats", "metrics", "metrics prom", "shutdown"]:
+        request = " ".join(argvs).lower()
+    elif len(argvs) >= 4:
+        request = {'op': argvs[0], 'keytype': argvs[1], 'key': argvs[2], 'message': " ".join(argvs[3:])}
+        if request['keytype'].lower() == "file":  # The daemon may be running from another folder
+            request['key'] = os.path.abspath(request['key'])
+        if request['op'].lower()[:1] == "d" and request['message'].strip()[-5:] == ".apoc":
+            request['message'] = os.path.abspath(request['message'].strip())
+    else:
+        print("Usage: python3 Apocrypha.py client [-a ADDRESS] <ping;stats;metrics [prom];shutdown>\n"
+              "       python3 Apocrypha.py client [-a ADDRESS] <E;D> <file;msg;local;link> <key/filepath> <message>")
+        sys.exit(exit_status("I.A7"))
+    try:
+        answer = daemon_request(request, address)
+    except ApocError as e:
+        print(e)
+        sys.exit(exit_status(e.code))
+    except (OSError, ValueError):
+        print("Error [V.D3]: Couldn't reach a daemon at " + address + ", start one with: python3 Apocrypha.py serve")
+        sys.exit(exit_status("V.D3"))
+    if not answer.get('ok'):
+        print(answer.get('detail', answer))
+        sys.exit(exit_status(answer.get('error', "")))
+    elif answer['op'] == "e":
+        print(answer.get('encrypted', "Encrypted message written to " + str(answer.get('out'))))
+        print("\nFinal Key Hash:\n" + str(answer['final_key_hash']))
+    elif answer['op'] == "d":
+        for warning in answer['warnings']:
+            print(warning)
+        print(answer['message'])
+        print("\nKey hash match: " + str(answer['key_hash_match']))
+    elif 'prometheus' in answer:
+        print(answer['prometheus'], end="")
+    else:
+        print(json.dumps(answer, indent=4))
+
+
+_EXIT_STATUSES = [  # (Error codes, exit status) of command line runs, the first match counts, see errorcodes.md
+    (re.compile(r"I\.A\d"), 2),  # Command line
+    (re.compile(r"I\.C\d"), 3),  # Config file
+    (re.compile(r"III?\.[KFPHL]\d"), 4),  # Key couldn't be loaded
+    (re.compile(r"II\.E\d"), 5),  # Message couldn't be encrypted
+    (re.compile(r"III\.D\d"), 6),  # Message couldn't be decrypted
+    (re.compile(r"III\.A\d|IV\.B1"), 7),  # Encrypted message or job couldn't be read
+    (re.compile(r"III\.M\d"), 8),  # Key hash mismatch
+    (re.compile(r"III\.9[A-D]"), 9),  # Characters not found in the key which couldn't be resolved
+    (re.compile(r"I{1,3}\.[IO]\d"), 10),  # Input or output couldn't be read or written
+    (re.compile(r"V\.D\d"), 11),  # Daemon
+]
+_GENERATED_KEY = re.compile(r"python(\d*)|local(\d+)|apocrypha")  # Gen types of a headless encryption, see Aencode1
+
+
+def exit_status(code: str) -> int:
+    """
+    :param code: Str; Error code without brackets, such as "II.E2"
+    :return: PosInteger; Exit status of a command line run which failed with the code, 1 for unexpected errors
+    """
+    for pattern, status in _EXIT_STATUSES:
+        if pattern.fullmatch(code):
+            return status
+    return 1
+
+
+def read_config(fileloc: str = "config.json") -> Config:
+    """
+    Reads a config file like config_handler, without prompting or writing one. Raises ApocError I.C1 if it's invalid.
+    :param fileloc: Str; Path of the config file, the default config is used if there isn't one
+    :return: Config object
+    """
+    if not Path(fileloc).exists():
+        return Config(False, "print")
+    try:
+        with open(fileloc) as file:
+            cc = json.load(file)
+        return Config(cc['multi_in'], cc['output'], cc.get('hash_cache'), cc.get('key_store', "keys"),
+                      cc.get('key_hash', "sha256"), cc.get('key_index', True))
+    except (OSError, ValueError, KeyError, TypeError):
+        raise ApocError("I.C1", "Invalid config file, fix or delete " + fileloc + ".")
+
+
+def headless_args(argvs: list) -> dict or None:
+    """
+    Reads a command line which can run without prompting:
+    '<E;D> <file;msg;local;link> <key/filepath> [<message>] [-i FILE] [-o FILE] [-s SIZE]', or to encrypt with a
+    generated key, 'E <python{INT};local{INT};apocrypha> [<message>] [-i FILE] [-o FILE] [-s SIZE]'. The message is the
+    rest of the command line, or read from the -i file, a message or -i of '-' being read from stdin. -s encrypts a
+    segmented message of SIZE characters per segment, see encrypt_segmented. Raises ApocError I.A7 if it's invalid.
+    :param argvs: List; Command line arguments sans "Apocrypha.py"
+    :return: Dict or None; 'op', 'keytype', 'key', 'message' (None to read it from 'input'), 'input', 'output'
+        (None for stdout), and 'segment' (None unless -s), None if there's no message or -i, so the message is
+        prompted for as before
+    """
+    argvs = list(argvs)
+    options = {}
+    for flag in ["-i", "-o", "-s"]:
+        if flag in argvs:
+            at = argvs.index(flag)
+            if at + 1 == len(argvs):
+                raise ApocError("I.A7", flag + " must be followed by " + ("a segment size." if flag == "-s" else
+                                "a file path, or - for std" + ("in." if flag == "-i" else "out.")))
+            options[flag] = argvs[at + 1]
+            del argvs[at:at + 2]
+    usage = "Expected '<E;D> <file;msg;local;link> <key/filepath> [<message>] [-i FILE] [-o FILE] [-s SIZE]'."
+    if len(argvs) < 2 or argvs[0].lower()[:1] not in ["e", "d"]:
+        if options:
+            raise ApocError("I.A7", usage)
+        return None
+    op, keytype = argvs[0].lower()[0], argvs[1].lower()
+    generated = op == "e" and _GENERATED_KEY.fullmatch(keytype) is not None
+    if not generated and (len(argvs) < 3 or keytype not in KeySource.KINDS):
+        if options or len(argvs) > 3:
+            raise ApocError("I.A7", usage)
+        return None
+    rest = argvs[2:] if generated else argvs[3:]
+    message = " ".join(rest) if rest else None
+    if message is None and "-i" not in options:
+        return None
+    if message is not None and "-i" in options:
+        raise ApocError("I.A7", "Give the message either on the command line or with -i, not both.")
+    if message == "-":
+        message, options["-i"] = None, "-"
+    segment = None
+    if "-s" in options:
+        if op != "e" or not options["-s"].isdigit() or int(options["-s"]) < 1:
+            raise ApocError("I.A7", "-s must be followed by a positive segment size, and only when encrypting.")
+        segment = int(options["-s"])
+    return {'op': op, 'keytype': keytype, 'key': None if generated else argvs[2], 'message': message,
+            'input': options.get("-i"), 'output': None if options.get("-o") in [None, "-"] else options["-o"],
+            'segment': segment}
+
+
+def read_input(fileloc: str) -> bytes:
+    """
+    :param fileloc: Str; Path of the file to read, '-' for stdin
+    :return: Bytes; Everything in it, raises ApocError I.I1 if it can't be read
+    """
+    try:
+        if fileloc == "-":
+            return sys.stdin.buffer.read()
+        with open(fileloc, 'rb') as file:
+            return file.read()
+    except OSError:
+        raise ApocError("I.I1", "Couldn't read " + ("stdin" if fileloc == "-" else fileloc) + ".")
+
+
+def write_output(fileloc: str or None, data: bytes, code: str) -> None:
+    """
+    :param fileloc: Str or None; Path of the file to write, None for stdout
+    :param data: Bytes; Everything to write
+    :param code: Str; Error code raised as an ApocError if it can't be written, II.O1 or III.O1
+    """
+    try:
+        if fileloc is None:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            with open(fileloc, 'wb') as file:
+                file.write(data)
+    except OSError:
+        raise ApocError(code, "Couldn't write the " + ("en" if code == "II.O1" else "de") + "crypted message to " +
+                        ("stdout" if fileloc is None else fileloc))
+
+
+def generated_key(keytype: str) -> KeySource:
+    """
+    Makes a key of a gen type, printing to stderr what's needed to decrypt with it.
+    :param keytype: Str; 'python{INT}', 'local{INT}', or 'apocrypha', see Aencode1
+    :return: KeySource; 'link' or 'local' key, raises KeySourceError II.H1 if a random book can't be found
+    """
+    m = _GENERATED_KEY.fullmatch(keytype)
+    if m.group(2) is not None:
+        location = random_location(int(m.group(2)))
+        print("Local book location (needed to decrypt): " + location, file=sys.stderr)
+        return KeySource("local", location)
+    if m.group(1) is not None:
+        link = BABEL_URL + "/book.cgi?" + random_location(int(m.group(1) or 64))
+    else:
+        import requests
+        try:
+            link = key_fetcher().random_link()
+        except requests.RequestException:
+            raise KeySourceError("II.H1", "Couldn't find a random book, check your connection.")
+    print("Key: " + link, file=sys.stderr)
+    return KeySource("link", link)
+
+
+def headless_main(job: dict) -> int:
+    """
+    Encrypts or decrypts one message without prompting, for scripts and shell pipelines. Only the result is written
+    to stdout (or the -o file): the encrypted message as printed, or an .apoc file if the -o file ends in '.apoc',
+    or the decrypted message. Errors, warnings, and generated keys are written to stderr. Segmented messages are
+    encrypted with -s and decrypted like any other.
+    :param job: Dict; Command line as returned by headless_args
+    :return: Integer; Exit status, 0 on success, otherwise that of the error (see exit_status)
+    """
+    try:
+        config = read_config()
+        data = job['message'].encode('utf-8') if job['message'] is not None else read_input(job['input'])
+        if job['op'] == "e":
+            source = generated_key(job['keytype']) if job['key'] is None else KeySource(job['keytype'], job['key'])
+            try:
+                message = data.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ApocError("I.I1", "The message isn't UTF-8 text.")
+            if message[-1:] == "\n":  # As left by echo and most editors
+                message = message[:-2] if message[-2:] == "\r\n" else message[:-1]
+            if job.get('segment') is None:
+                ciphertext = encrypt(message, source, config)
+            else:
+                ciphertext = encrypt_segmented(message, source, config, job['segment'])
+            if job['output'] is not None and job['output'][-5:] == ".apoc":
+                write_output(job['output'], ciphertext.to_apoc(), "II.O1")
+            else:
+                write_output(job['output'], (str(ciphertext) + "\n").encode('utf-8'), "II.O1")
+            status = 0
+        else:
+            if data[:len(APOC_MAGIC)] != APOC_MAGIC:
+                data = data.decode('utf-8', 'replace').strip()
+                if data[-5:] == ".apoc":
+                    data = read_input(data)
+            plaintext = decrypt(data, KeySource(job['keytype'], job['key']), config)
+            for code in plaintext.warnings:
+                print("Error [" + code + "]: Could not resolve character not found in key", file=sys.stderr)
+            write_output(job['output'], (plaintext.message + "\n").encode('utf-8'), "III.O1")
+            status = exit_status(plaintext.warnings[0]) if plaintext.warnings else 0
+            if plaintext.key_hash_match is False:
+                print(ApocError("III.M1", "Key hash mismatch, the message is likely incorrect."), file=sys.stderr)
+                if plaintext.segments is not None:
+                    print("Mismatched segments: " + ", ".join(str(i) for i in plaintext.mismatched_segments),
+                          file=sys.stderr)
+                status = exit_status("III.M1")
+    except ApocError as e:
+        print(e, file=sys.stderr)
+        status = exit_status(e.code)
+    except Exception as e:
+        print("Error: Unexpected error. " + type(e).__name__ + ": " + str(e), file=sys.stderr)
+        status = 1
+    if _METRICS is not None:
+        _METRICS.write()
+    return status
+
+
+def main():
+    print("A_version: 1.9.5")
+    EncOrDec = input("A_func<E;D;C>: ").lower()
+    try:
+        if EncOrDec[0] in ['e', 'd']:
+            config = config_handler()
+            if config.multi_in:
+                batch_main(config, input("mA_filepath = "))
+            elif EncOrDec[0] == 'e':
+                k = Aencode1(config)
+                Aencode2(config, k)
+            else:
+                Adecode2(config, Adecode1(config))
+        elif EncOrDec[0] == 'c':
+            print("NOTE: Only a 'config.json' file in the same directory as Apocrypha.py will be accepted currently")
+            # config_fileloc = input("cA_filepath: ")
+            config_handler("config.json", True)
+            _ = os.system('cls' if os.sys.platform == 'win32' else 'clear')
+            os.execl(sys.executable, sys.executable, *sys.argv)
+        else:
+            print("Error [I.M1]: Invalid input.")
+            try:
+                if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                    main()
+                else:
+                    os._exit(0)
+            except IndexError:
+                os._exit(0)
+    except IndexError:
+        print("Error [I.M2]: Invalid input.")
+        try:
+            if input("Retry (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                main()
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+
+
+def cmd_ln(args: list) -> dict:
+    """
+    Given a list of arguments from the command line, returns a dictionary of the program procedure and their values.
+    :param args: List; Command Line Arguments sans "Apocrypha.py"
+    :return: Dict; Procedure of the program with values for each prompt.
+    """
+    # flags = [f for f in args if "-" in f[0] or "--" in f[:2]]
+    def err() -> None:
+        print("Usage: python3 Apocrypha.py [--globals] [<function> <key gen/type> <key/filepath> <message>] [-rf FILE]")
+        try:
+            if input("Run main (default: No)? [Y]es/[N]o: ").lower().strip()[0] == "y":
+                main()
+            else:
+                os._exit(0)
+        except IndexError:
+            os._exit(0)
+    procedure = {
+        "A_func": None,  # in ["e", "d", None]
+        "eA_gen.type": None,  # in ["file", "msg", None] for 1st iteration
+        "dA.k_format": None,  # in ["file", "msg", None] for 1st iteration
+        "eA_filepath": None,
+        "eA_key": None,
+        "Message": None,
+        "dA_filepath": None,
+        "dA_key": None,
+        "Encrypted Message": None
+    }
+    global_flags = [gf for gf in args if "--" in gf[:2]]
+    arg_flags = [af for af in args if "-" in af[0]]
+    if "--help" in global_flags or "--usage" in global_flags:
+        print("Usage: python3 Apocrypha.py [--globals] [<E;D;C>] [<key gen/type>] [<key/filepath>] [<message>] [-rf "
+              "<filepath>]\n"
+              "       python3 Apocrypha.py <E;D> <file;msg;local;link> <key/filepath> <message;-> [-o FILE] [-s SIZE]\n"
+              "       python3 Apocrypha.py <E;D> <file;msg;local;link> <key/filepath> -i FILE [-o FILE] [-s SIZE]\n"
+              "       python3 Apocrypha.py E <python{INT};local{INT};apocrypha> <message;-> [-o FILE] [-s SIZE]\n"
+              "       python3 Apocrypha.py serve [-a ADDRESS] [-j JOBS]\n"
+              "       python3 Apocrypha.py client [-a ADDRESS] <ping;stats;metrics [prom];shutdown>\n"
+              "       python3 Apocrypha.py client [-a ADDRESS] <E;D> <file;msg;local;link> <key/filepath> <message>")
+    for argg in args:
+        if argg in global_flags:
+            args.remove(argg)
+    for arg in args:
+        if [procedure['Encrypted Message'], procedure['Message']] == [None, None] and \
+                ([procedure['eA_key'], procedure['dA_key']] != [None, None] or
+                 [procedure['eA_filepath'], procedure['dA_filepath']] != [None, None]):
+            try:
+                if arg != "":
+                    if procedure['eA_key'] is not None or procedure['eA_filepath'] is not None:
+                        procedure['Message'] = arg
+                    elif procedure['dA_key'] is not None or procedure['dA_filepath'] is not None:
+                        procedure['Encrypted Message'] = arg
+                    else:
+                        raise Exception
+            except:
+                print("Error [I.A5]: Command line message input error.")
+                err()
+        elif ([procedure['eA_key'], procedure['dA_key']] == [None, None] or
+                [procedure['eA_filepath'], procedure['dA_filepath']] == [None, None]) and \
+                [procedure['dA.k_format'], procedure['eA_gen.type']] != [None, None]:
+            try:
+                if arg != "":
+                    if procedure['eA_gen.type'] is not None:
+                        if procedure['eA_gen.type'] == "file":
+                            procedure['eA_filepath'] = arg
+                        elif procedure['eA_gen.type'] == "msg":
+                            procedure['eA_key'] = arg
+                        else:
+                            raise Exception
+                    elif procedure['dA.k_format'] is not None:
+                        if procedure['dA.k_format'] == "file":
+                            procedure['dA_filepath'] = arg
+                        elif procedure['dA.k_format'] == "msg":
+                            procedure['dA_key'] = arg
+                        else:
+                            raise Exception
+                    else:
+                        raise Exception
+            except:
+                print("Error [I.A4]: Command line key or filepath error.")
+                err()
+        elif [procedure['dA.k_format'], procedure['eA_gen.type']] == [None, None] and procedure['A_func'] is not None:
+            try:
+                if procedure['A_func'] == "e":
+                    procedure['eA_gen.type'] = arg
+                elif procedure['A_func'] == "d":
+                    procedure['dA.k_format'] = arg
+                else:
+                    raise Exception
+            except:
+                print("Error [I.A3]: Command line key format or generation error.")
+                err()
+        elif procedure['A_func'] is None:
+            try:
+                if arg.lower()[0] in ["e", "d"]:
+                    if arg.lower()[0] == "e":
+                        procedure['A_func'] = "e"
+                    elif arg.lower()[0] == "d":
+                        procedure['A_func'] = "d"
+                    else:
+                        raise IndexError
+            except IndexError:
+                print("Error [I.A2]: A_func command line processing error.")
+                err()
+        else:
+            print("Error [I.A1]: Else condition met in cmd_ln() function.")
+            err()
+    return procedure
+
+
+def cmd_main(argvs: list) -> None:
+    """
+    The main program for the command line.
+    :param argvs: List; Command line arguments sans given "Apocrypha.py"
+    :return: None; Calls other functions to carry out functionality as necessary.
+    """
+    if argvs[0].lower() in ["serve", "client"]:
+        (serve_main if argvs[0].lower() == "serve" else client_main)(argvs[1:])
+        return
+    try:
+        job = headless_args(argvs)
+    except ApocError as e:
+        print(e, file=sys.stderr)
+        sys.exit(exit_status(e.code))
+    if job is not None:
+        sys.exit(headless_main(job))
+    print("Command Line Usage: python3 Apocrypha.py [--help;--usage]\n"
+          "Limited Command Line functionality has been implemented.\n")
+    if "-rf" in argvs:
+        if argvs.index("-rf") + 1 < len(argvs):
+            batch_main(config_handler(), argvs[argvs.index("-rf") + 1])
+            return
+        print("Error [I.A6]: Missing job file after the -rf flag.")
+        print("Usage: python3 Apocrypha.py -rf <filepath>")
+        os._exit(0)
+    prog = cmd_ln(argvs)
+    config = config_handler()
+    if prog['A_func'] is None:
+        main()
+    elif prog['A_func'] is not None and [prog['eA_gen.type'], prog['dA.k_format']] == [None, None]:
+        if prog['A_func'] == "e":
+            k = Aencode1(config)
+            Aencode2(config, k)
+        elif prog['A_func'] == "d":
+            Adecode2(config, Adecode1(config))
+        else:
+            print("Error [I.P1]: Program command line processing error in A_func logic.\nRunning main")
+            main()
+    elif prog['eA_gen.type'] == "file" and prog['eA_filepath'] is None:
+        Aencode2(config, None)
+    elif prog['eA_gen.type'] == "msg" and prog['eA_key'] is not None and prog['Message'] is None:
+        Aencode2(config, prog['eA_key'] + ".msg")
+    elif prog['dA_key'] is not None and prog['Encrypted Message'] is None:
+        Adecode2(config, prog['dA_key'] + ".msg")
+    elif prog['dA_filepath'] is not None and prog['Encrypted Message'] is None:
+        Adecode2(config, prog['dA_filepath'])
+    else:
+        print("Unimplemented command line case, running main program")
+        main()
+
+
+def cli(args: list) -> None:
+    """
+    Runs the program as started from the command line, see Apocrypha.py.
+    :param args: List; Command Line Arguments sans "Apocrypha.py", the main menu is run if there are none
+    """
+    try:
+        if len(args) == 0:
+            main()
+        else:
+            cmd_main(args)
+    except EOFError:
+        print("\nError [I.A8]: Input ended while waiting at a prompt, give the message on the command line or with -i "
+              "to run without prompting.", file=sys.stderr)
+        sys.exit(exit_status("I.A8"))
+
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
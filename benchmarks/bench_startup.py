@@ -0,0 +1,137 @@
+"""
+Startup benchmark of Apocrypha.py, what a one-off 'msg' encryption or decryption pays before and after its work.
+
+Usage: python3 benchmarks/bench_startup.py [--repeat 20] [--budget 50] [--importtime] [--passphrase Hermaeus]
+
+Each run is timed as a new process, as a shell pipeline starts it without prompts, and reported as its median wall
+time and its startup, the median less that of a bare interpreter ('python3 -c pass'), which Apocrypha can't make any
+faster. Both 'python3 -m Apocrypha' and 'python3 Apocrypha.py' are held to --budget: Apocrypha.py is only a shim,
+the program (Apocrypha_core.py) comes from the bytecode cached in __pycache__ either way.
+
+The network (requests, urllib3), browser (webbrowser), key store (sqlite3), daemon (socket, socketserver, signal),
+process pool (multiprocessing, concurrent.futures), batch decode (numpy), and hash cache folder (cryptography)
+subsystems are only imported on the paths which use them, and importing Apocrypha must not load any of them.
+--importtime prints the modules Apocrypha imports, slowest first, from 'python3 -X importtime'.
+
+The exit status is 1 when a run starts slower than --budget milliseconds, or a lazy subsystem is imported.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+LAZY = ["requests", "urllib3", "webbrowser", "sqlite3", "socket", "socketserver", "signal", "hmac", "html", "secrets",
+        "multiprocessing", "concurrent.futures", "numpy", "cryptography"]
+MESSAGE = "The Doors of Oblivion"
+
+
+def environment() -> dict:
+    """
+    :return: Dict; os.environ without the settings which change what a run does or where its bytecode comes from
+    """
+    env = dict(os.environ)
+    for name in ["APOCRYPHA_METRICS", "PYTHONDONTWRITEBYTECODE", "PYTHONPYCACHEPREFIX", "PYTHONPROFILEIMPORTTIME"]:
+        env.pop(name, None)
+    return env
+
+
+def run(command: list, stdin: str = "") -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + command, input=stdin.encode('utf-8'), capture_output=True, cwd=ROOT,
+                          env=environment(), timeout=60)
+
+
+def timed(command: list, stdin: str, repeat: int) -> float:
+    """
+    :return: Float; Median wall time of the command in milliseconds, after one untimed run to warm the caches
+    """
+    run(command, stdin)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = run(command, stdin)
+        times.append((time.perf_counter() - t0) * 1000)
+        if proc.returncode != 0:
+            print(proc.stdout.decode('utf-8', 'replace') + proc.stderr.decode('utf-8', 'replace'))
+            sys.exit("Failed: " + " ".join(command))
+    return statistics.median(times)
+
+
+def lazy_imported() -> list:
+    """
+    :return: List; The LAZY subsystems which importing Apocrypha loads, and which weren't already loaded by site
+    """
+    code = ("import sys, json; before = set(sys.modules); import Apocrypha; "
+            "print(json.dumps(sorted(set(sys.modules) - before)))")
+    loaded = set(json.loads(run(["-c", code]).stdout))
+    return [name for name in LAZY if name in loaded]
+
+
+def import_times() -> list:
+    """
+    :return: List; (Integer cumulative microseconds, Str module) of every module imported by Apocrypha, slowest first
+    """
+    lines = run(["-X", "importtime", "-c", "import Apocrypha"]).stderr.decode('utf-8').splitlines()
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):  # A top level import, the ones listed before belong to it
+            if name.strip() == "Apocrypha":
+                return sorted(rows + [(int(cumulative), "Apocrypha")], reverse=True)
+            rows = []
+            continue
+        rows.append((int(cumulative), name.rstrip()))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=50, help="Milliseconds of startup allowed past the interpreter")
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--passphrase", default="Hermaeus")
+    args = parser.parse_args()
+    if args.importtime:
+        print("{:>10}  {}".format("cum. (ms)", "module"))
+        for cumulative, name in import_times():
+            print("{:>10.2f}  {}".format(cumulative / 1000, name))
+        print()
+    encrypted = run(["-m", "Apocrypha", "e", "msg", args.passphrase, MESSAGE])
+    if encrypted.returncode != 0:
+        sys.exit("Couldn't encrypt a message:\n" + encrypted.stderr.decode('utf-8', 'replace'))
+    ciphertext = encrypted.stdout.decode('utf-8')
+    runs = [
+        ("import Apocrypha", ["-c", "import Apocrypha"], ""),
+        ("-m Apocrypha e msg", ["-m", "Apocrypha", "e", "msg", args.passphrase, MESSAGE], ""),
+        ("-m Apocrypha d msg", ["-m", "Apocrypha", "d", "msg", args.passphrase, "-"], ciphertext),
+        ("Apocrypha.py e msg", ["Apocrypha.py", "e", "msg", args.passphrase, MESSAGE], ""),
+        ("Apocrypha.py d msg", ["Apocrypha.py", "d", "msg", args.passphrase, "-"], ciphertext),
+    ]
+    interpreter = timed(["-c", "pass"], "", args.repeat)
+    print("Python " + sys.version.split()[0] + ", interpreter alone: {:.1f} ms, budget: {:.0f} ms".format(
+        interpreter, args.budget))
+    print("{:<22} {:>10} {:>13}".format("run", "wall (ms)", "startup (ms)"))
+    over = []
+    for name, command, stdin in runs:
+        wall = timed(command, stdin, args.repeat)
+        startup = wall - interpreter
+        print("{:<22} {:>10.1f} {:>13.1f}".format(name, wall, startup))
+        if startup > args.budget:
+            over.append(name)
+    lazy = lazy_imported()
+    if lazy:
+        print("Imported by Apocrypha, but should only be imported when used: " + ", ".join(lazy))
+    if over:
+        print("Over the startup budget: " + ", ".join(over))
+    if lazy or over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Benchmark suite of expanding_hash, Aencode2, and Adecode2 for Apocrypha.py and Apocrypha_stable.py.
+
+Usage: python3 benchmarks/bench_suite.py [--impls apocrypha,stable] [--messages 10,1000,100000,1000000]
+           [--keys 5000,100000,1000000,10000000,100000000] [--hash-lengths 5000,50000,500000] [--repeat 7]
+           [--seed 1] [--quick] [--out bench_results.json] [--baseline FILE] [--tolerance 0.15]
+
+Keys are synthetic Library of Babel books, lines of 80 characters of the Babel alphabet, and messages mostly the same
+alphabet with a few characters the keys don't have; both are made from --seed, as are the key positions each
+implementation picks (see Apocrypha.Sampler), so every run uses the same inputs.
+Keys are generated once into --data and reused by later runs.
+
+Every case runs in its own process, driving Aencode2 and Adecode2 through their prompts as a user would, so the
+peak memory of a case is that process's alone. A case runs once untimed, then up to --repeat times, fewer once it has
+taken more than --max-seconds. The key index sidecars (see Apocrypha.write_key_index) left in --data are deleted before
+every case, so the untimed run writes them again and every timed run reads them, as later runs of a key do.
+Apocrypha_stable.py scans the whole key for every character, so its cases are skipped past --stable-work (message
+characters times key characters).
+
+Results, ops/s, latency percentiles, and peak memory per case, are written to --out as JSON. Given --baseline, an
+earlier results file, cases whose fastest run or peak memory is above the baseline's by more than --tolerance are
+listed and the exit status is 1. A slower fastest run only counts once the middle halves of the two runs' latencies
+no longer overlap, as back to back runs of the same code differ by more than --tolerance on a busy machine.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import builtins
+import tempfile
+import contextlib
+import subprocess
+import importlib.util
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPLS = {'apocrypha': ROOT / "Apocrypha_core.py", 'stable': ROOT / "Apocrypha_stable.py"}  # Apocrypha.py is a shim
+BABEL_ALPHABET = "abcdefghijklmnopqrstuvwxyz ,."
+MESSAGE_ALPHABET = BABEL_ALPHABET * 8 + "THE0123!?"  # About 4% of message characters aren't in the keys
+KEY_TABLE = bytes(ord(BABEL_ALPHABET[b % 29]) for b in range(256))
+KEY_LINE = 80
+
+
+class Exit(Exception):
+    pass
+
+
+def key_file(data: Path, chars: int, seed: int) -> Path:
+    """
+    :return: Path; Synthetic key of chars characters (newlines not counted), generated if not already in data
+    """
+    path = data / ("key_{}_{}.txt".format(chars, seed))
+    if not path.exists():
+        text = random.Random(seed * 1000003 + chars).randbytes(chars).translate(KEY_TABLE)
+        part = path.with_suffix(".part")
+        with open(part, 'wb') as file:
+            for start in range(0, chars, KEY_LINE * 4096):
+                block = text[start:start + KEY_LINE * 4096]
+                file.write(b"\n".join(block[i:i + KEY_LINE] for i in range(0, len(block), KEY_LINE)) + b"\n")
+        os.replace(part, path)
+    return path
+
+
+def message(chars: int, seed: int) -> str:
+    """
+    :return: Str; Synthetic message of chars characters
+    """
+    return "".join(random.Random(seed * 1000033 + chars).choices(MESSAGE_ALPHABET, k=chars))
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    :return: Float; Value at fraction of the sorted values, interpolated between the nearest two
+    """
+    values = sorted(values)
+    pos = (len(values) - 1) * fraction
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def peak_rss() -> int or None:
+    """
+    :return: Integer or None; Peak resident memory of this process in bytes, None where it can't be read
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def drive(func, inputs: list, *args) -> str:
+    """
+    Calls one of the prompting functions with inputs answering its prompts, stopping it at os._exit.
+    :return: Str; Everything it printed
+    """
+    answers = iter(inputs)
+    old_input, old_exit = builtins.input, os._exit
+    builtins.input = lambda prompt='': next(answers, '')
+
+    def stop(code=0):
+        raise Exit(code)
+    os._exit = stop
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            try:
+                func(*args)
+            except Exit:
+                pass
+    finally:
+        builtins.input, os._exit = old_input, old_exit
+    return out.getvalue()
+
+
+def worker(spec: dict) -> dict:
+    """
+    Runs one case in this process, see main.
+    :param spec: Dict; The case, with 'impl', 'bench' (hash, encrypt, or decrypt), and its sizes
+    :return: Dict; Latencies of each run and the peak memory of the process
+    """
+    loader = importlib.util.spec_from_file_location("apoc_bench_" + spec['impl'], str(IMPLS[spec['impl']]))
+    apoc = importlib.util.module_from_spec(loader)
+    loader.loader.exec_module(apoc)
+    if hasattr(apoc, "SAMPLER_SEED"):
+        apoc.SAMPLER_SEED = spec['seed']  # The locations Apocrypha.py picks, see Sampler
+    random.seed(spec['seed'])  # The locations Apocrypha_stable.py picks
+    config = apoc.Config(False, "print")
+    latencies = []
+    ok = True
+    t_end = time.perf_counter() + spec['max_seconds']
+    if spec['bench'] != "hash":
+        text = message(spec['message'], spec['seed'])
+        keyfile = spec['key_file']
+        cipherfile = Path(spec['cipher_file'])
+    for run in range(spec['repeat'] + 1):  # The first run is untimed, it only warms up
+        if spec['bench'] == "hash":
+            if hasattr(apoc, "cursed_num"):
+                apoc.cursed_num.cache_clear()  # Every run of the program starts with an empty cache
+            t0 = time.perf_counter()
+            apoc.expanding_hash("Hermaeus Mora", spec['length'])
+            elapsed = time.perf_counter() - t0
+        elif spec['bench'] == "encrypt":
+            t0 = time.perf_counter()
+            out = drive(apoc.Aencode2, [text], config, keyfile)
+            elapsed = time.perf_counter() - t0
+            if "Encrypted Message:\n\n" not in out:
+                ok = False
+                break
+            if not cipherfile.exists():
+                cipherfile.write_text(out.split("Encrypted Message:\n\n")[1].splitlines()[0])
+        else:
+            ciphertext = cipherfile.read_text()
+            t0 = time.perf_counter()
+            out = drive(apoc.Adecode2, [ciphertext], config, keyfile)
+            elapsed = time.perf_counter() - t0
+            ok = ok and out.split("Decrypted Message:\n\n", 1)[-1][:len(text) + 1] == text + "\n"
+        if run:
+            latencies.append(elapsed)
+        if time.perf_counter() > t_end:
+            break
+    return {'latencies': latencies, 'ok': ok, 'peak_rss_bytes': peak_rss()}
+
+
+def run_case(case: dict, timeout: float) -> dict:
+    """
+    :param case: Dict; Case as made by cases, plus the 'repeat', 'seed', and 'max_seconds' of the run
+    :param timeout: Float; Seconds before the case's process is killed
+    :return: Dict; The case with its results
+    """
+    result = {k: case[k] for k in ['id', 'impl', 'bench', 'message', 'key', 'length'] if case.get(k) is not None}
+    try:
+        proc = subprocess.run([sys.executable, __file__, "--worker", json.dumps(case)], capture_output=True,
+                              text=True, timeout=timeout)
+        measured = json.loads(proc.stdout.strip().splitlines()[-1])
+    except subprocess.TimeoutExpired:
+        result.update({'ok': False, 'skipped': "timed out after " + str(timeout) + " s"})
+        return result
+    except (ValueError, IndexError):
+        result.update({'ok': False, 'skipped': "worker failed: " + proc.stderr.strip()[-300:]})
+        return result
+    latencies = measured['latencies']
+    result.update({
+        'ok': measured['ok'] and len(latencies) > 0,
+        'ops': len(latencies),
+        'ops_per_sec': len(latencies) / sum(latencies) if sum(latencies) > 0 else None,
+        'latency_s': {'min': min(latencies), 'p25': percentile(latencies, 0.25), 'p50': percentile(latencies, 0.5),
+                      'p75': percentile(latencies, 0.75), 'p90': percentile(latencies, 0.9),
+                      'p99': percentile(latencies, 0.99), 'max': max(latencies),
+                      'mean': sum(latencies) / len(latencies)} if latencies else None,
+        'peak_rss_bytes': measured['peak_rss_bytes']})
+    return result
+
+
+def cases(args, data: Path) -> list:
+    """
+    :return: List; Dict per case of the run, cases which won't be run have 'skipped' set
+    """
+    found = []
+    for impl in args.impls:
+        for length in args.hash_lengths:
+            found.append({'id': "{}/hash/l{}".format(impl, length), 'impl': impl, 'bench': "hash", 'length': length})
+        for keychars in args.keys:
+            for msgchars in args.messages:
+                for bench in ["encrypt", "decrypt"]:
+                    case = {'id': "{}/{}/m{}/k{}".format(impl, bench, msgchars, keychars), 'impl': impl,
+                            'bench': bench, 'message': msgchars, 'key': keychars,
+                            'cipher_file': str(data / "cipher_{}_{}_{}_{}.txt".format(impl, msgchars, keychars,
+                                                                                      args.seed))}
+                    if msgchars > keychars:
+                        case['skipped'] = "message longer than the key"
+                    elif impl == "stable" and msgchars * keychars > args.stable_work:
+                        case['skipped'] = "past --stable-work"
+                    found.append(case)
+    return found
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """
+    :return: List; Str per case whose fastest run or peak memory is above the baseline's by more than tolerance, a
+        slower fastest run only counting once the interquartile ranges of the two cases' latencies don't overlap
+    """
+    base = {r['id']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        old = base.get(r['id'])
+        if old is None or not r.get('latency_s') or not old.get('latency_s'):
+            continue
+        new, was = r['latency_s'], old['latency_s']
+        apart = new.get('p25', new['min']) > was.get('p75', was['p50'])  # Noise alone rarely moves the whole middle
+        if new['min'] > was['min'] * (1 + tolerance) and apart:  # The fastest run is the one least hit by noise
+            regressions.append("{}: min {:.4g} s (p25 {:.4g} s), baseline min {:.4g} s (p75 {:.4g} s)".format(
+                r['id'], new['min'], new.get('p25', new['min']), was['min'], was.get('p75', was['p50'])))
+        if r.get('peak_rss_bytes') and old.get('peak_rss_bytes') and \
+                r['peak_rss_bytes'] > old['peak_rss_bytes'] * (1 + tolerance):
+            regressions.append("{}: peak {:.1f} MB, baseline {:.1f} MB".format(
+                r['id'], r['peak_rss_bytes'] / 2 ** 20, old['peak_rss_bytes'] / 2 ** 20))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sizes = lambda text: [int(float(x)) for x in text.split(",") if x.strip()]
+    parser.add_argument("--impls", default="apocrypha,stable", type=lambda text: text.split(","))
+    parser.add_argument("--messages", default="10,1000,100000,1000000", type=sizes)
+    parser.add_argument("--keys", default="5000,100000,1000000,10000000,100000000", type=sizes)
+    parser.add_argument("--hash-lengths", default="5000,50000,500000", type=sizes)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--max-seconds", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=3600.0)
+    parser.add_argument("--stable-work", type=float, default=2e8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="only messages up to 1000 and keys up to 1000000")
+    parser.add_argument("--data", default=str(Path(tempfile.gettempdir()) / "apocrypha-bench"))
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        print(json.dumps(worker(json.loads(args.worker))))
+        return
+    unknown = [impl for impl in args.impls if impl not in IMPLS]
+    if unknown:
+        parser.error("unknown --impls " + ",".join(unknown) + ", choose from " + ",".join(IMPLS))
+    if args.quick:
+        args.messages = [m for m in args.messages if m <= 1000]
+        args.keys = [k for k in args.keys if k <= 1000000]
+        args.hash_lengths = [n for n in args.hash_lengths if n <= 50000]
+    data = Path(args.data)
+    data.mkdir(parents=True, exist_ok=True)
+    for stale in data.glob("cipher_*.txt"):
+        stale.unlink()
+    results = []
+    print("{:<36} {:>5} {:>12} {:>10} {:>10} {:>10} {:>10}".format("case", "ops", "ops/s", "p50 (s)", "p90 (s)",
+                                                                  "p99 (s)", "peak MB"))
+    for case in cases(args, data):
+        if 'skipped' not in case:
+            if case['bench'] != "hash":
+                case['key_file'] = str(key_file(data, case['key'], args.seed))
+            case.update({'repeat': args.repeat, 'seed': args.seed, 'max_seconds': args.max_seconds})
+            for stale in data.glob("*.apocidx"):  # Left by earlier cases or runs, see the module docstring
+                stale.unlink()
+            result = run_case(case, args.timeout)
+        else:
+            result = {k: case[k] for k in ['id', 'impl', 'bench', 'message', 'key', 'skipped']}
+            result['ok'] = False
+        results.append(result)
+        if result.get('latency_s') is None:
+            print("{:<36} skipped: {}".format(result['id'], result.get('skipped', "failed")))
+            continue
+        lat = result['latency_s']
+        peak = result['peak_rss_bytes'] / 2 ** 20 if result['peak_rss_bytes'] else float('nan')
+        print("{:<36} {:>5} {:>12.4g} {:>10.4g} {:>10.4g} {:>10.4g} {:>10.1f}{}".format(
+            result['id'], result['ops'], result['ops_per_sec'], lat['p50'], lat['p90'], lat['p99'], peak,
+            "" if result['ok'] else "  WRONG OUTPUT"))
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                       'cpus': os.cpu_count(), 'seed': args.seed, 'repeat': args.repeat,
+                       'time': time.strftime("%Y-%m-%dT%H:%M:%S")},
+              'results': results}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            report['regressions'] = compare(results, json.load(file), args.tolerance)
+    with open(args.out, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4)
+    print("\nResults written to: " + args.out)
+    if args.baseline:
+        if report['regressions']:
+            print("\nRegressions against " + args.baseline + ":")
+            for line in report['regressions']:
+                print("  " + line)
+            sys.exit(1)
+        print("No regressions against " + args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+KEY_ALPHABET = "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ.,"
+
+
+@pytest.fixture
+def keyfile(tmp_path):
+    rng = random.Random(7)
+    lines = ["".join(rng.choices(KEY_ALPHABET, k=rng.randint(20, 80))) for _ in range(400)]
+    path = tmp_path / "key.txt"
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.fixture
+def run_cli(tmp_path):
+    """
+    Runs 'python3 Apocrypha.py <args>' in tmp_path, as a shell pipeline would, returning the CompletedProcess.
+    """
+    script = Path(__file__).resolve().parents[1] / "Apocrypha.py"
+
+    def run(*args, stdin=""):
+        env = {name: value for name, value in os.environ.items() if not name.startswith("APOCRYPHA_")}
+        return subprocess.run([sys.executable, str(script)] + [str(arg) for arg in args], input=stdin, cwd=tmp_path,
+                              env=env, capture_output=True, text=True, timeout=120)
+    return run
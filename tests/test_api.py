@@ -0,0 +1,60 @@
+import pickle
+
+import pytest
+
+import Apocrypha as apoc
+
+
+def test_empty_message_round_trip(keyfile):
+    for key in (str(keyfile), "hunter2.msg", apoc.KeySource("local", "3f9a1c-w2-s4-v17:201")):
+        ciphertext = apoc.encrypt("", key)
+        assert ciphertext.locations == []
+        plaintext = apoc.decrypt(str(ciphertext), key)
+        assert plaintext.message == "" and plaintext.key_hash_match
+
+
+def test_key_source_parse():
+    assert repr(apoc.KeySource.parse("hunter2.msg")) == "KeySource('msg', 'hunter2')"
+    assert apoc.KeySource.parse("https://example.com/book.cgi?x").kind == "link"
+    assert apoc.KeySource.parse("key.txt").kind == "file"
+    source = apoc.KeySource("local", "3f9a1c-w2-s4-v17:201")
+    assert apoc.KeySource.parse(source) is source
+
+
+def test_loaded_keys_are_reused(keyfile):
+    keys = {}
+    ciphertext = apoc.encrypt("reuse me", str(keyfile), keys=keys)
+    assert len(keys) == 1
+    assert apoc.decrypt(ciphertext, str(keyfile), keys=keys).message == "reuse me"
+    assert len(keys) == 1
+
+
+@pytest.mark.parametrize("key, error, code", [
+    ("missing.txt", apoc.KeySourceError, "II.P1"),
+    ("key.pdf", apoc.KeySourceError, "II.F1"),
+    (".msg", apoc.KeySourceError, "II.K1"),
+])
+def test_encrypt_errors(tmp_path, key, error, code):
+    (tmp_path / "key.pdf").write_text("abc")
+    with pytest.raises(error) as raised:
+        apoc.encrypt("hello", str(tmp_path / key) if key != ".msg" else key)
+    assert raised.value.code == code
+    assert str(raised.value).startswith("Error [" + code + "]: ")
+
+
+def test_decrypt_errors(keyfile, tmp_path):
+    with pytest.raises(apoc.KeySourceError) as raised:
+        apoc.decrypt("[[1, 2], None]", str(tmp_path / "missing.txt"))
+    assert raised.value.code == "III.P1"
+    with pytest.raises(apoc.DecryptionError) as raised:
+        apoc.decrypt("nonsense", str(keyfile))
+    assert raised.value.code == "III.D1"
+    with pytest.raises(apoc.MessageFormatError) as raised:
+        apoc.decrypt(b"not an apoc file", str(keyfile))
+    assert raised.value.code == "III.A1"
+
+
+def test_errors_pickle():
+    error = pickle.loads(pickle.dumps(apoc.EncryptionError("II.E1", "Key file is not large enough.")))
+    assert isinstance(error, apoc.ApocError) and error.code == "II.E1"
+    assert str(error) == "Error [II.E1]: Key file is not large enough."
@@ -0,0 +1,33 @@
+import pytest
+
+import Apocrypha as apoc
+
+
+@pytest.mark.parametrize("locations, keyhash", [
+    ([12, -40, 9894, 7, 0, 2 ** 40], "ab" * 32),
+    ([], "cd" * 32),
+    ([5, -1, 9], None),
+    ([3], apoc.MERKLE_PREFIX + "ef" * 32),
+])
+def test_pack_unpack_round_trip(locations, keyhash):
+    assert apoc.unpack_message(apoc.pack_message(locations, keyhash)) == (locations, keyhash)
+
+
+def test_unpack_rejects_bad_data():
+    packed = apoc.pack_message([1, 2, 3], "ab" * 32)
+    for data in (b"", b"NOPE" + packed[4:], packed[:-1]):
+        with pytest.raises(ValueError):
+            apoc.unpack_message(data)
+
+
+def test_damaged_apoc_file_is_a_message_format_error():
+    with pytest.raises(apoc.MessageFormatError) as error:
+        apoc.Ciphertext.from_apoc(b"APOC\x09")
+    assert error.value.code == "III.A1"
+
+
+def test_apoc_file_decrypts(keyfile):
+    data = apoc.encrypt("sealed in a container", str(keyfile)).to_apoc()
+    assert data[:4] == apoc.APOC_MAGIC
+    plaintext = apoc.decrypt(data, str(keyfile))
+    assert plaintext.message == "sealed in a container" and plaintext.key_hash_match
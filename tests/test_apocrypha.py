@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import Apocrypha as apoc
+
+
+def test_fenwick_rank_select_match_a_list():
+    rng = random.Random(1)
+    for size in (1, 2, 7, 64, 1000):
+        tree = apoc.Fenwick(size)
+        alive = list(range(size))
+        for _ in range(size // 2 + 1):
+            assert tree.count == len(alive)
+            for k in rng.sample(range(len(alive)), min(5, len(alive))):
+                assert tree.select(k) == alive[k]
+                assert tree.rank(alive[k]) == k
+            tree.delete(alive.pop(rng.randrange(len(alive))))
+            copy = tree.copy()
+            if alive:
+                assert copy.select(len(alive) - 1) == alive[-1]
+        with pytest.raises(IndexError):
+            tree.select(tree.count)
+
+
+@pytest.mark.parametrize("message", ["hello world", "Not in the key: 0123 ~ $ ^ é"])
+def test_file_key_round_trip(keyfile, message):
+    ciphertext = apoc.encrypt(message, str(keyfile))
+    plaintext = apoc.decrypt(ciphertext, str(keyfile))
+    assert plaintext.message == message
+    assert plaintext.key_hash_match
+    assert apoc.decrypt(str(ciphertext), str(keyfile)).message == message
+
+
+def test_passphrase_round_trip():
+    ciphertext = apoc.encrypt("attack at dawn", "hunter2.msg")
+    assert apoc.decrypt(ciphertext, "hunter2.msg").message == "attack at dawn"
+
+
+def test_key_too_small(tmp_path):
+    keyfile = tmp_path / "small.txt"
+    keyfile.write_text("abc\n")
+    with pytest.raises(apoc.EncryptionError) as error:
+        apoc.encrypt("abcdef", str(keyfile))
+    assert error.value.code == "II.E1"
@@ -0,0 +1,54 @@
+import json
+
+import Apocrypha as apoc
+
+
+def results(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_batch_runs_every_job_and_records_failures(keyfile, tmp_path, capsys):
+    jobs = tmp_path / "jobs.txt"
+    jobs.write_text("\n".join([
+        "# comment",
+        "e file " + str(keyfile) + " hello there",
+        json.dumps({'op': "e", 'keytype': "msg", 'key': "hunter2", 'message': "from json", 'id': "j2"}),
+        "",
+        "e file " + str(tmp_path / "missing.txt") + " no key",
+        "nonsense",
+    ]) + "\n")
+    path = apoc.batch_main(apoc.Config(False, "print"), str(jobs))
+    assert path == str(tmp_path / "jobs_results.jsonl")
+    records = results(path)
+    assert [record['line'] for record in records] == [2, 3, 5, 6]
+    assert [record['ok'] for record in records] == [True, True, False, False]
+    assert records[1]['id'] == "j2"
+    assert records[2]['error'] == "II.P1" and records[3]['error'] == "IV.B1"
+    assert "Jobs: 4, Failed: 2" in capsys.readouterr().out
+
+    again = tmp_path / "again.txt"
+    again.write_text(json.dumps({'op': "d", 'key': str(keyfile), 'message': records[0]['encrypted']}) + "\n" +
+                     json.dumps({'op': "d", 'keytype': "msg", 'key': "hunter2", 'message': records[1]['encrypted']}))
+    decrypted = results(apoc.batch_main(apoc.Config(False, "print"), str(again)))
+    assert [record['message'] for record in decrypted] == ["hello there", "from json"]
+    assert all(record['key_hash_match'] for record in decrypted)
+
+
+def test_batch_encrypts_many_jobs_of_one_key(keyfile, tmp_path):
+    messages = ["bulk message %d" % i for i in range(2 * apoc.BULK_MESSAGES)]
+    jobs = tmp_path / "bulk.txt"
+    jobs.write_text("".join("e file " + str(keyfile) + " " + message + "\n" for message in messages))
+    records = results(apoc.batch_main(apoc.Config(False, "print"), str(jobs)))
+    assert all(record['ok'] for record in records)
+    for message, record in zip(messages, records):
+        assert apoc.decrypt(record['encrypted'], str(keyfile)).message == message
+
+
+def test_rf_flag(keyfile, tmp_path, run_cli):
+    (tmp_path / "jobs.txt").write_text("e file " + str(keyfile) + " from the command line\n")
+    proc = run_cli("-rf", "jobs.txt")
+    assert proc.returncode == 0, proc.stderr
+    record, = results(tmp_path / "jobs_results.jsonl")
+    assert apoc.decrypt(record['encrypted'], str(keyfile)).message == "from the command line"
+    assert "Error [I.A6]" in run_cli("-rf").stdout
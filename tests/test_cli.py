@@ -0,0 +1,44 @@
+import Apocrypha as apoc
+
+
+def test_headless_round_trip(run_cli, keyfile):
+    encrypted = run_cli("e", "file", keyfile, "hello", "there")
+    assert encrypted.returncode == 0 and encrypted.stderr == ""
+    decrypted = run_cli("d", "file", keyfile, encrypted.stdout.strip())
+    assert (decrypted.returncode, decrypted.stdout) == (0, "hello there\n")
+
+
+def test_headless_files_and_stdin(run_cli, keyfile, tmp_path):
+    assert run_cli("e", "msg", "hunter2", "-i", "-", "-o", "out.apoc", stdin="piped in\n").returncode == 0
+    assert (tmp_path / "out.apoc").read_bytes()[:len(apoc.APOC_MAGIC)] == apoc.APOC_MAGIC
+    decrypted = run_cli("d", "msg", "hunter2", "-i", "out.apoc", "-o", "out.txt")
+    assert decrypted.returncode == 0 and decrypted.stdout == ""
+    assert (tmp_path / "out.txt").read_text() == "piped in\n"
+    assert run_cli("d", "msg", "hunter2", "-", stdin="out.apoc\n").stdout == "piped in\n"
+
+
+def test_headless_exit_statuses(run_cli, keyfile, tmp_path):
+    (tmp_path / "small.txt").write_text("abc\n")
+    (tmp_path / "bad.apoc").write_bytes(apoc.APOC_MAGIC + b"\xff")
+    ciphertext = run_cli("e", "file", keyfile, "hello").stdout.strip()
+    tampered = ciphertext[:ciphertext.rindex("'", 0, -1) + 1] + "0" * 64 + "']"
+    for args, status, code in [
+        (["e", "file", keyfile, "-i"], 2, "I.A7"),
+        (["e", "file", "missing.txt", "hello"], 4, "II.P1"),
+        (["e", "msg", "", "hello"], 4, "II.K1"),
+        (["e", "file", "small.txt", "abcdef"], 5, "II.E1"),
+        (["d", "file", keyfile, "nonsense"], 6, "III.D1"),
+        (["d", "file", keyfile, "-i", "bad.apoc"], 7, "III.A1"),
+        (["d", "file", keyfile, tampered], 8, "III.M1"),
+        (["e", "file", keyfile, "-i", "missing.txt"], 10, "I.I1"),
+    ]:
+        result = run_cli(*args)
+        assert (result.returncode, result.stderr.split("]")[0]) == (status, "Error [" + code), args
+        assert apoc.exit_status(code) == status
+
+
+def test_input_ending_at_a_prompt(run_cli):
+    result = run_cli(stdin="")
+    assert result.returncode == apoc.exit_status("I.A8") == 2
+    assert result.stderr.startswith("\nError [I.A8]")
+    assert apoc.exit_status("nonsense") == 1
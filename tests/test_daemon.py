@@ -0,0 +1,78 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import Apocrypha as apoc
+
+
+def start(address, **kwargs):
+    daemon = apoc.ApocDaemon(apoc.Config(False, "print"), address, **kwargs)
+    thread = threading.Thread(target=daemon.serve, daemon=True)
+    thread.start()
+    for _ in range(200):
+        if daemon.server is not None:
+            break
+        time.sleep(0.01)
+    return daemon, thread
+
+
+@pytest.fixture
+def unix_daemon(tmp_path):
+    address = str(tmp_path / "apoc.sock")
+    daemon, thread = start(address, max_jobs=4)
+    yield address
+    daemon.shutdown()
+    thread.join(10)
+
+
+def test_unix_socket_round_trip(unix_daemon, keyfile):
+    assert apoc.daemon_request("ping", unix_daemon)['ok']
+    assert os.stat(unix_daemon).st_mode & 0o077 == 0  # Only the user running it can connect
+    job = {'op': "e", 'keytype': "file", 'key': str(keyfile), 'message': "hello world"}
+    encrypted = apoc.daemon_request(job, unix_daemon)
+    assert encrypted['ok']
+    decrypted = apoc.daemon_request(dict(job, op="d", message=encrypted['encrypted']), unix_daemon)
+    assert decrypted['message'] == "hello world" and decrypted['key_hash_match']
+    assert not apoc.daemon_request("garbage", unix_daemon)['ok']
+
+
+def test_concurrent_first_encryptions_of_a_key(unix_daemon, keyfile):
+    messages = ["message %d %s" % (i, "abcdefghijklmnopqrstuvwxyz"[i:]) for i in range(16)]
+    answers = [None] * len(messages)
+
+    def send(i):
+        answers[i] = apoc.daemon_request({'op': "e", 'keytype': "file", 'key': str(keyfile), 'message': messages[i]},
+                                         unix_daemon)
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(messages))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(answer['ok'] for answer in answers)
+    for message, answer in zip(messages, answers):
+        assert apoc.decrypt(answer['encrypted'], str(keyfile)).message == message
+    assert apoc.daemon_request("stats", unix_daemon)['failed'] == 0
+
+
+def test_tcp_daemon_asks_for_its_token(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    address, token_file = "127.0.0.1:%d" % port, str(tmp_path / "token")
+    daemon, thread = start(address, token_file=token_file)
+    try:
+        assert os.stat(token_file).st_mode & 0o777 == 0o600
+        assert apoc.daemon_request("ping", address, 5, token_file)['ok']
+        with socket.create_connection(("127.0.0.1", port), 5) as conn:
+            conn.sendall(b"wrong\nping\n")
+            assert b"V.D6" in conn.makefile('rb').readline()
+        with pytest.raises(apoc.ApocError) as error:
+            apoc.daemon_request("ping", address, 5, str(tmp_path / "missing"))
+        assert error.value.code == "V.D6"
+    finally:
+        daemon.shutdown()
+        thread.join(10)
+    assert not os.path.exists(token_file)
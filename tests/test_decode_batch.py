@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import Apocrypha as apoc
+
+np = pytest.importorskip("numpy")
+
+
+def both(keyfile, locations, hashed=True):
+    """
+    (decode_batch, decode_message) of the locations, each against its own fresh index, and the indexes.
+    """
+    key = apoc.open_key(str(keyfile))[0]
+    batch, one = apoc.KeyIndex(key, False), apoc.KeyIndex(key, False)
+    return apoc.decode_batch(batch, locations, hashed), apoc.decode_message(one, locations, hashed), batch, one
+
+
+def test_fenwick_from_flags_matches_deletes():
+    rng = random.Random(2)
+    flags = np.array([rng.random() < 0.6 for _ in range(500)])
+    tree = apoc.Fenwick.from_flags(flags)
+    alive = [i for i, flag in enumerate(flags) if flag]
+    assert tree.count == len(alive)
+    assert [tree.select(k) for k in range(len(alive))] == alive
+    assert [tree.rank(slot) for slot in alive] == list(range(len(alive)))
+
+
+def test_decode_batch_matches_decode_message(keyfile):
+    message = "the quick brown fox jumps over the lazy dog 0123 $^~"
+    locations = apoc.encrypt(message, str(keyfile), config=apoc.Config(False, "print", key_index=False)).locations
+    batch, one, batched, single = both(keyfile, locations)
+    assert batch == one and batch[0] == message
+    assert batched.remaining_hash() == single.remaining_hash()
+    assert apoc.decode_batch(apoc.KeyIndex(batched.key, False), []) is None
+
+
+def test_decode_batch_malformed_locations(keyfile):
+    size = len(apoc.open_key(str(keyfile))[0])
+    assert both(keyfile, [-1, -2, 3])[0] is None  # Left to decode_message
+    for hashed, code in [(True, "III.D2"), (False, "III.D1")]:
+        with pytest.raises(apoc.DecryptionError) as raised:
+            both(keyfile, [1, size], hashed)
+        assert raised.value.code == code
+    for locations in ([5, -7], [5, -7, 7 * 104, 9]):  # Fallback characters missing their product, and not
+        for hashed in (True, False):
+            batch, one = both(keyfile, locations, hashed)[:2]
+            assert batch == one
+
+
+def test_large_messages_decrypt_in_one_batch(monkeypatch):
+    message = "".join(random.Random(5).choices("abcdefghij ", k=apoc.BATCH_DECODE)) + "0"
+    ciphertext = apoc.encrypt(message, "hunter2.msg")
+    assert len(ciphertext.locations) >= apoc.BATCH_DECODE
+    calls = []
+    monkeypatch.setattr(apoc, "decode_message", lambda *args: calls.append(args))
+    plaintext = apoc.decrypt(ciphertext, "hunter2.msg")
+    assert plaintext.message == message and plaintext.key_hash_match and calls == []
@@ -0,0 +1,38 @@
+import pytest
+
+import Apocrypha as apoc
+
+MESSAGES = ["message number %d, with some punctuation." % i for i in range(2 * apoc.BULK_MESSAGES)]
+
+
+def entry_of(keyfile):
+    return apoc.load_key(apoc.KeySource("file", str(keyfile)), apoc.Config(False, "print"), {})
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_every_message_decrypts_alone(keyfile, workers):
+    entry = entry_of(keyfile)
+    strfile = apoc.key_index(entry, True)
+    outcomes = apoc.encrypt_many(strfile, MESSAGES, workers=workers)
+    assert len(strfile.deleted) == 0  # Left untouched
+    for message, outcome in zip(MESSAGES, outcomes):
+        plaintext = apoc.decrypt(apoc.Ciphertext(*outcome), str(keyfile))
+        assert plaintext.message == message and plaintext.key_hash_match
+
+
+def test_errors_are_returned_per_message(keyfile):
+    entry = entry_of(keyfile)
+    too_long = "x" * (len(entry[0]) + 1)
+    outcomes = apoc.encrypt_many(apoc.key_index(entry, True), MESSAGES[:9] + [too_long], workers=2)
+    assert isinstance(outcomes[-1], apoc.EncryptionError) and outcomes[-1].code == "II.E1"
+    assert all(isinstance(outcome, list) for outcome in outcomes[:-1])
+
+
+def test_merkle_key_hash(keyfile):
+    entry = entry_of(keyfile)
+    tree = apoc.key_tree(entry)
+    outcomes = apoc.encrypt_many(apoc.key_index(entry, True), MESSAGES, workers=2, tree=tree)
+    for message, outcome in zip(MESSAGES, outcomes):
+        assert outcome[1].startswith(apoc.MERKLE_PREFIX)
+        plaintext = apoc.decrypt(apoc.Ciphertext(*outcome), str(keyfile))
+        assert plaintext.message == message and plaintext.key_hash_match
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+
+import Apocrypha as apoc
+
+requests = pytest.importorskip("requests")
+
+BOOK = ("abc def,ghi.\n" * 40 + "\n") * 5
+LOCATION = "abc123-w1-s2-v3:7"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    Library of Babel stand-in: book.cgi answers HEAD with an ETag, 'busy' links fail with 503 until their third try,
+    'slow' links answer late, and download.cgi answers with BOOK, as HTML for the 'htmlbook' room.
+    """
+    protocol_version = "HTTP/1.1"
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body=b"", ctype="text/plain", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.hits.append(("HEAD", self.path))
+        if self.path.startswith("/busy") and sum(hit == ("HEAD", self.path) for hit in self.hits) < 3:
+            return self.send(503)
+        if self.path.startswith("/slow"):
+            time.sleep(1)
+        if self.path.startswith("/nohead"):
+            return self.send(405)
+        if self.path.startswith("/random.cgi"):
+            return self.send(302, headers={'Location': "/book.cgi?" + LOCATION})
+        if self.headers.get("If-None-Match") == '"v1"':
+            return self.send(304)
+        return self.send(200, headers={'ETag': '"v1"'})
+
+    def do_GET(self):
+        self.hits.append(("GET", self.path))
+        return self.send(200, b"<html>page</html>", "text/html")
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        self.hits.append(("POST", self.path, form['hex'][0], form['volume'][0]))
+        if form['hex'][0] == "htmlbook":
+            page = "<html><pre id='textblock'>" + BOOK.replace(",", "&#44;") + "</pre></html>"
+            return self.send(200, page.encode(), "text/html")
+        return self.send(200, BOOK.encode())
+
+
+@pytest.fixture
+def stand_in():
+    StandIn.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_check_validates_with_head(stand_in):
+    fetcher = apoc.KeyFetcher(stand_in)
+    link = stand_in + "/book.cgi?" + LOCATION
+    assert fetcher.check(link)
+    assert fetcher.validators[link] == {'If-None-Match': '"v1"'}
+    assert fetcher.check(link)  # 304 Not Modified
+    assert fetcher.check(stand_in + "/nohead")  # 405 to HEAD, checked with a GET instead
+    assert [hit[0] for hit in StandIn.hits] == ["HEAD", "HEAD", "HEAD", "GET"]
+    assert fetcher.random_link() == stand_in + "/book.cgi?" + LOCATION
+
+
+def test_check_retries_busy_servers(stand_in):
+    assert apoc.KeyFetcher(stand_in).check(stand_in + "/busy")
+    assert StandIn.hits.count(("HEAD", "/busy")) == 3
+    with pytest.raises(requests.RequestException):
+        apoc.KeyFetcher(stand_in, retries=1).check(stand_in + "/busy/again")
+
+
+def test_check_times_out(stand_in):
+    fetcher = apoc.KeyFetcher(stand_in, timeout=(1, 0.2), retries=0)
+    t0 = time.perf_counter()
+    with pytest.raises(requests.RequestException):
+        fetcher.check(stand_in + "/slow")
+    assert time.perf_counter() - t0 < 1
+
+
+def test_download_writes_the_book(stand_in, tmp_path):
+    fetcher = apoc.KeyFetcher(stand_in)
+    path = Path(fetcher.download(stand_in + "/book.cgi?" + LOCATION, str(tmp_path)))
+    assert path.parent == tmp_path and path.name.startswith("babel_") and path.read_text() == BOOK
+    assert StandIn.hits == [("POST", "/download.cgi", "abc123", "03")]
+    html = Path(fetcher.download("htmlbook-w4-s5-v32:410", str(tmp_path)))
+    assert html.read_text() == BOOK.strip("\n")
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_download_key(stand_in, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(apoc._KEY_FETCHERS, apoc.BABEL_URL, apoc.KeyFetcher(stand_in))
+    path = apoc.download_key(stand_in + "/book.cgi?" + LOCATION, "II.H1")
+    assert Path(path).read_text() == BOOK and Path(path).parent.resolve() == tmp_path.resolve()
+    assert apoc.download_key("nonsense", "II.H1") is None
+    assert "Error [II.H1]" in capsys.readouterr().out
+
+
+def test_babel_url_points_the_program_at_a_stand_in(stand_in, tmp_path):
+    root = Path(apoc.__file__).resolve().parent
+    code = "import Apocrypha; print(Apocrypha.BABEL_URL); print(Apocrypha.key_fetcher().check(Apocrypha.BABEL_URL))"
+    env = dict(os.environ, APOCRYPHA_BABEL_URL=stand_in + "/", PYTHONPATH=str(root))
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=tmp_path, capture_output=True, text=True,
+                         timeout=60).stdout.split()
+    assert out == [stand_in, "True"]
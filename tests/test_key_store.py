@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import Apocrypha as apoc
+
+pytest.importorskip("sqlite3")
+
+LOCATION = "abc123-w1-s2-v3:7"
+
+
+def download(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_put_and_get(tmp_path):
+    store = apoc.KeyStore(str(tmp_path / "keys"))
+    assert store.get(LOCATION) is None
+    stored = store.put(LOCATION, download(tmp_path, "book.txt", "abc\ndef\n"))
+    assert open(stored).read() == "abcdef"
+    assert not (tmp_path / "book.txt").exists()
+    assert store.get(LOCATION) == stored
+    assert store.get(LOCATION, verify=True) == stored
+
+
+def test_pages_of_one_book_share_a_file(tmp_path):
+    store = apoc.KeyStore(str(tmp_path / "keys"))
+    first = store.put(LOCATION, download(tmp_path, "a.txt", "samebook"))
+    second = store.put("abc123-w1-s2-v3:8", download(tmp_path, "b.txt", "same\nbook"))
+    assert first == second
+    assert store.stats() == {'locations': 2, 'books': 1, 'bytes': len("samebook")}
+
+
+def test_changed_book_files_are_dropped(tmp_path):
+    store = apoc.KeyStore(str(tmp_path / "keys"))
+    stored = store.put(LOCATION, download(tmp_path, "book.txt", "abcdef"))
+    stat = os.stat(stored)
+    with open(stored, 'w') as file:
+        file.write("abcdeX")
+    os.utime(stored, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert store.get(LOCATION) == stored  # Size and modification time still match, the book isn't hashed
+    assert store.get(LOCATION, verify=True) is None
+    assert store.get(LOCATION) is None
+
+
+def test_least_recently_used_books_are_evicted(tmp_path):
+    store = apoc.KeyStore(str(tmp_path / "keys"), max_bytes=10)
+    old = store.put(LOCATION, download(tmp_path, "old.txt", "a" * 8))
+    new = store.put("def456-w1-s1-v1:1", download(tmp_path, "new.txt", "b" * 8))
+    assert not os.path.exists(old) and os.path.exists(new)
+    assert store.get(LOCATION) is None
+
+
+def test_store_is_reopened(tmp_path):
+    stored = apoc.KeyStore(str(tmp_path / "keys")).put(LOCATION, download(tmp_path, "book.txt", "abcdef"))
+    assert apoc.KeyStore(str(tmp_path / "keys")).get(LOCATION) == stored
@@ -0,0 +1,53 @@
+import random
+
+from blake3 import blake3
+
+import Apocrypha as apoc
+
+
+def reference_hash(key, deleted=()):
+    """
+    The 'merkle' key hash as described by KeyTree, built from scratch over what remains of every leaf.
+    """
+    deleted = set(deleted)
+    level = []
+    for start in range(0, max(1, len(key)), apoc.KEY_TREE_LEAF):
+        chars = "".join(ch for i, ch in enumerate(key[start:start + apoc.KEY_TREE_LEAF], start) if i not in deleted)
+        level.append(blake3(b"\x00" + chars.encode('utf-8')).digest())
+    while len(level) > 1:
+        level = [blake3(b"\x01" + level[i] + level[i + 1]).digest() if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+    return apoc.MERKLE_PREFIX + blake3(b"\x02" + len(key).to_bytes(8, 'little') + level[0]).hexdigest()
+
+
+def test_key_tree_matches_a_fresh_hash_after_deletions():
+    rng = random.Random(3)
+    for size in (0, 1, apoc.KEY_TREE_LEAF, 5 * apoc.KEY_TREE_LEAF + 17):
+        key = "".join(rng.choices("abc .é", k=size))
+        tree = apoc.KeyTree(key)
+        assert tree.hash() == reference_hash(key)
+        deleted = rng.sample(range(size), min(size, 300))
+        assert tree.hash(deleted) == reference_hash(key, deleted)
+        assert tree.hash(sorted(deleted)) == tree.hash(deleted)
+        assert tree.hash() == reference_hash(key)  # Hashing deletions leaves the tree as it was
+
+
+def test_key_tree_threads_match_one_thread():
+    key = "".join(random.Random(4).choices("abcdefgh", k=2 * apoc.KEY_TREE_PARALLEL * apoc.KEY_TREE_LEAF + 5))
+    assert apoc.KeyTree(key, workers=4).levels == apoc.KeyTree(key, workers=1).levels
+
+
+def test_merkle_round_trip(keyfile):
+    config = apoc.Config(False, "print", key_hash="merkle")
+    for key in (str(keyfile), "hunter2.msg", apoc.KeySource("local", "3f9a1c-w2-s4-v17:201")):
+        ciphertext = apoc.encrypt("merkle message", key, config=config)
+        assert ciphertext.keyhash.startswith(apoc.MERKLE_PREFIX)
+        plaintext = apoc.decrypt(str(ciphertext), key)
+        assert plaintext.message == "merkle message" and plaintext.key_hash_match
+
+
+def test_merkle_key_hash_of_a_key_file(keyfile):
+    ciphertext = apoc.encrypt("merkle message", str(keyfile), config=apoc.Config(False, "print", key_hash="merkle"))
+    used = apoc.KeyIndex(apoc.open_key(str(keyfile))[0], False)
+    apoc.decode_message(used, ciphertext.locations)
+    assert ciphertext.keyhash == reference_hash(keyfile.read_text().replace("\n", ""), used.deleted)
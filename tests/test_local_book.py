@@ -0,0 +1,33 @@
+import re
+
+import Apocrypha as apoc
+
+LOCATION = "3f9a1c-w2-s4-v17:201"
+
+
+def test_local_book_is_deterministic():
+    book = apoc.local_book(LOCATION)
+    assert len(book) == apoc.LOCAL_BOOK_CHARS
+    assert set(book) <= set(apoc.BABEL_ALPHABET) and "\n" not in book
+    assert apoc.local_book(LOCATION) == book
+    assert apoc.local_book(" 3F9A1C-w2-s4-v17:201 ") == book
+    assert apoc.local_book(apoc.BABEL_URL + "/book.cgi?" + LOCATION) == book
+    assert apoc.local_book(LOCATION, 1000) == book[:1000]
+    assert apoc.local_book("3f9a1c-w2-s4-v17:202", 1000) != book[:1000]
+
+
+def test_local_key_round_trip():
+    source = apoc.KeySource("local", LOCATION)
+    ciphertext = apoc.encrypt("hello from nowhere", source)
+    plaintext = apoc.decrypt(str(ciphertext), apoc.KeySource("local", " " + LOCATION))
+    assert plaintext.message == "hello from nowhere" and plaintext.key_hash_match
+
+
+def test_interactive_local_keys_stay_in_memory(run_cli, tmp_path):
+    encrypted = run_cli(stdin="e\nlocal\nhello local\n\n")
+    location = re.search(r"needed to decrypt\): (\S+)", encrypted.stdout).group(1)
+    ciphertext = encrypted.stdout.split("Encrypted Message:\n\n")[1].splitlines()[0]
+    decrypted = run_cli(stdin="d\nlocal\n" + location + "\n" + ciphertext + "\n\n")
+    assert "Decrypted Message:\n\nhello local\n" in decrypted.stdout
+    assert "Key Hash Match: True" in decrypted.stdout
+    assert list(tmp_path.glob("local_*.txt")) == []
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import Apocrypha as apoc
+
+
+@pytest.fixture
+def recorded(keyfile, tmp_path):
+    """
+    Metrics recorded over one encryption and one decryption, written to tmp_path/metrics.json.
+    """
+    metrics = apoc.enable_metrics(str(tmp_path / "metrics.json"))
+    try:
+        ciphertext = apoc.encrypt("hello. 0", str(keyfile), config=apoc.Config(False, "print", key_index=False))
+        apoc.decrypt(ciphertext, str(keyfile), config=apoc.Config(False, "print", key_index=False))
+    finally:
+        assert apoc.disable_metrics() is metrics
+    return metrics
+
+
+def test_disabled_metrics_record_nothing():
+    assert apoc.metrics() is None
+    assert apoc.span("encode") is apoc.span("decode")
+
+
+def test_metrics_json(recorded, tmp_path):
+    recorded.write()
+    with open(tmp_path / "metrics.json", encoding='utf-8') as file:
+        written = json.load(file)
+    counters = written['counters']
+    assert counters['messages_encrypted'] == counters['messages_decrypted'] == 1
+    assert counters['message_chars'] == 16 and counters['fallback_chars'] == 2 and counters['special_chars'] == 2
+    assert written['key_utilization'] == counters['message_chars'] / counters['key_chars']
+    assert written['spans']['encode']['count'] == written['spans']['decode']['count'] == 1
+    assert {'key_acquisition', 'final_hash'} <= set(written['spans'])
+    assert all(span['max_seconds'] <= span['seconds'] for span in written['spans'].values())
+
+
+def test_metrics_prometheus(recorded, tmp_path):
+    recorded.path = str(tmp_path / "metrics.prom")
+    recorded.write()
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+    samples = dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+    assert samples['apocrypha_messages_encrypted_total'] == "1"
+    assert samples['apocrypha_fallback_chars_total'] == "2"
+    assert samples['apocrypha_phase_seconds_count{phase="encode"}'] == "1"
+    assert float(samples['apocrypha_key_utilization']) == recorded.as_dict()['key_utilization']
+    assert "# TYPE apocrypha_phase_seconds summary" in lines
+    assert all(line.startswith(("# HELP ", "# TYPE ", "apocrypha_")) for line in lines)
@@ -0,0 +1,41 @@
+import pytest
+
+import Apocrypha as apoc
+
+MESSAGES = ["the same message"] * (2 * apoc.BULK_MESSAGES)
+
+
+def test_seeded_sampler_is_deterministic():
+    first = apoc.Sampler(seed=4, batch=3)
+    second = apoc.Sampler(seed="4", batch=3)
+    draws = [first.below(1000) for _ in range(50)]
+    assert draws == [second.below(1000) for _ in range(50)]
+    assert draws != [apoc.Sampler(seed=5).below(1000) for _ in range(50)]
+    assert all(0 <= draw < 1000 for draw in draws)
+    with pytest.raises(ValueError):
+        first.below(0)
+
+
+def test_seeded_encryption_is_reproducible(keyfile):
+    first = apoc.encrypt("hello world", str(keyfile), sampler=apoc.Sampler(seed=1))
+    second = apoc.encrypt("hello world", str(keyfile), sampler=apoc.Sampler(seed=1))
+    assert first.locations == second.locations and first.keyhash == second.keyhash
+
+
+def test_seeded_encrypt_many(keyfile, monkeypatch):
+    monkeypatch.setenv("APOCRYPHA_SEED", "1")
+    entry = apoc.load_key(apoc.KeySource("file", str(keyfile)), apoc.Config(False, "print"), {})
+    strfile = apoc.key_index(entry, True)
+    alone = apoc.encrypt_many(strfile, MESSAGES, workers=1, seed=9)
+    assert apoc.encrypt_many(strfile, MESSAGES, workers=2, seed=9) == alone  # Whichever worker encrypts each
+    assert len({str(outcome[0]) for outcome in alone}) == len(MESSAGES)  # Each message draws its own stream
+    assert alone[3][0] == apoc.encrypt(MESSAGES[3], str(keyfile), sampler=apoc.Sampler("9:3")).locations
+    unseeded = apoc.encrypt_many(strfile, MESSAGES[:2], workers=1)  # The environment no longer seeds anything
+    assert unseeded != apoc.encrypt_many(strfile, MESSAGES[:2], workers=1)
+
+
+def test_sampler_seed_seeds_encrypt_many(keyfile, monkeypatch):
+    monkeypatch.setattr(apoc, "SAMPLER_SEED", 9)
+    entry = apoc.load_key(apoc.KeySource("file", str(keyfile)), apoc.Config(False, "print"), {})
+    strfile = apoc.key_index(entry, True)
+    assert apoc.encrypt_many(strfile, MESSAGES[:4]) == apoc.encrypt_many(strfile, MESSAGES[:4], seed=9)
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import Apocrypha as apoc
+
+MESSAGE = "".join(random.Random(6).choices("abcdefghijklmnopqrstuvwxyz ,.", k=290)) + " 0123"
+
+
+@pytest.mark.parametrize("key, workers", [("file", 1), ("file", 2), ("hunter2.msg", 2)])
+def test_segmented_round_trip(keyfile, key, workers):
+    key = str(keyfile) if key == "file" else key
+    ciphertext = apoc.encrypt_segmented(MESSAGE, key, size=50, workers=workers)
+    assert len(ciphertext.segments) == 6 and ciphertext.size == 50
+    assert len({segment.keyhash for segment in ciphertext.segments}) == 6  # Every segment has a key of its own
+    for form in (ciphertext, str(ciphertext), ciphertext.to_apoc()):
+        assert apoc.is_segmented(form) or form is ciphertext
+        plaintext = apoc.decrypt(form, key)
+        assert plaintext.message == MESSAGE and plaintext.key_hash_match
+        assert [segment.message for segment in plaintext.segments] == [MESSAGE[i:i + 50] for i in range(0, 300, 50)]
+        assert plaintext.message_key_hash == ciphertext.keyhash == plaintext.final_key_hash
+
+
+def test_segmented_forms_round_trip(keyfile):
+    ciphertext = apoc.encrypt_segmented(MESSAGE, str(keyfile), size=64)
+    for again in (apoc.SegmentedCiphertext.parse(str(ciphertext)),
+                  apoc.SegmentedCiphertext.from_apoc(ciphertext.to_apoc())):
+        assert again.size == 64 and str(again) == str(ciphertext)
+    assert not apoc.is_segmented(str(apoc.encrypt("hello", str(keyfile))))
+    assert not apoc.is_segmented(apoc.encrypt("hello", str(keyfile)).to_apoc())
+
+
+def test_mismatched_segments_are_named(keyfile):
+    ciphertext = apoc.encrypt_segmented(MESSAGE, str(keyfile), size=50)
+    ciphertext.segments[2].keyhash = "0" * 64
+    plaintext = apoc.decrypt_segmented(ciphertext, str(keyfile))
+    assert plaintext.message == MESSAGE
+    assert plaintext.key_hash_match is False and plaintext.mismatched_segments == [2]
+
+
+def test_segmented_errors(keyfile):
+    with pytest.raises(apoc.EncryptionError) as raised:
+        apoc.encrypt_segmented("abc" * 10000, str(keyfile), size=100)
+    assert raised.value.code == "II.E1"
+    with pytest.raises(ValueError):
+        apoc.encrypt_segmented(MESSAGE, str(keyfile), size=0)
+    data = apoc.encrypt_segmented(MESSAGE, str(keyfile), size=50).to_apoc()
+    with pytest.raises(apoc.MessageFormatError) as raised:
+        apoc.decrypt(data[:-7], str(keyfile))
+    assert raised.value.code == "III.A1"
+    with pytest.raises(apoc.MessageFormatError) as raised:
+        apoc.decrypt("['segmented', 50, [[1, 2]]]", str(keyfile))
+    assert raised.value.code == "III.A2"
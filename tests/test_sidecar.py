@@ -0,0 +1,61 @@
+import mmap
+import os
+import threading
+
+import Apocrypha as apoc
+
+
+def read_sidecar(keyfile):
+    with open(keyfile, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return apoc.read_key_index(str(keyfile), data, os.stat(keyfile))
+
+
+def test_round_trip_through_index_sidecar(keyfile):
+    first = apoc.encrypt("hello", str(keyfile))
+    assert apoc.key_index_path(keyfile).is_file()
+    second = apoc.encrypt("world", str(keyfile))
+    assert apoc.decrypt(first, str(keyfile)).message == "hello"
+    assert apoc.decrypt(second, str(keyfile)).message == "world"
+
+
+def test_stale_sidecar_is_rebuilt(keyfile):
+    apoc.encrypt("hello abba", str(keyfile))
+    stat = keyfile.stat()
+    # Same size, but every 'a' is now a 'b' and the other way around, and the fingerprint is kept
+    keyfile.write_bytes(keyfile.read_bytes().translate(bytes.maketrans(b"ab", b"ba")))
+    os.utime(keyfile, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert read_sidecar(keyfile) is None
+    plaintext = apoc.decrypt(apoc.encrypt("abba", str(keyfile)), str(keyfile))
+    assert plaintext.message == "abba" and plaintext.key_hash_match
+
+
+def test_concurrent_writers_leave_a_whole_sidecar(keyfile):
+    key, filehash = apoc.open_key(str(keyfile), True)
+    full = {ch: key.positions(ch) for ch in key.symbols()}
+    barrier = threading.Barrier(8)
+    written = []
+
+    def write(i):
+        positions = dict(list(full.items())[i % 2::2])
+        barrier.wait()
+        written.extend(apoc.write_key_index(key, filehash, positions) for _ in range(20))
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert written == [True] * 160
+    found, _ = read_sidecar(keyfile)
+    assert found.index and all(list(found.index[ch]) == full[ch] for ch in found.index)
+    assert not list(keyfile.parent.glob("*.part"))
+
+
+def test_sidecar_holds_only_the_symbols_used(keyfile):
+    apoc.encrypt("abc", str(keyfile))
+    found, _ = read_sidecar(keyfile)
+    assert set(found.index) == {"a", "b", "c"} and not found.complete
+    apoc.encrypt("xyz", str(keyfile))
+    found, _ = read_sidecar(keyfile)
+    assert set(found.index) == set("abcxyz") and not found.complete
+    assert all(list(found.index[ch]) == found.positions(ch) for ch in found.index)
@@ -0,0 +1,17 @@
+import Apocrypha as apoc
+
+
+def test_tokenize_message():
+    assert apoc.tokenize_message("[[12, -40, 9894, 7], 'ab12']") == ([12, -40, 9894, 7], "ab12")
+    assert apoc.tokenize_message("[12, 7]") == ([12, 7], None)
+    assert apoc.tokenize_message("[[], 'ab12']") == ([], "ab12")
+
+
+def test_tokenize_message_ignores_whitespace_and_line_breaks():
+    assert apoc.tokenize_message(" [[ 1,\n -2 ,3 ], \n'cd'] \n") == ([1, -2, 3], "cd")
+
+
+def test_printed_ciphertext_parses_back():
+    ciphertext = apoc.Ciphertext([5, -10, 1164, 0], "ab" * 32)
+    parsed = apoc.Ciphertext.parse(str(ciphertext))
+    assert (parsed.locations, parsed.keyhash) == (ciphertext.locations, ciphertext.keyhash)